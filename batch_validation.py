@@ -0,0 +1,265 @@
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+import columnar_input
+import compressed_input
+
+# --- Batch validation of a directory / glob ---
+# Every matching file is validated by main.run_multi_sheet_validation in a pool of worker
+# processes, so the local work (parsing, checks) of several files runs in parallel. LLM calls
+# are bounded across all workers by one shared semaphore (llm_concurrency slots), so the
+# endpoint sees a fixed number of in-flight requests however many workers run; a worker that
+# waits for a slot does not hold up the local work of the others.
+# Each file gets its own report, at the same relative path under the output directory as the
+# file has under the batch root (so 'a/b.csv' and 'a__b.csv' never share a report), and every
+# finished file is appended to a checkpoint journal (JSON lines, fsync'ed). A re-run with the
+# same output directory skips files the journal records as done, unless they changed (size /
+# mtime) since, so a crashed run resumes where it stopped. Failed files, including files with a
+# sheet that errored, are retried on the next run. When a worker process dies, only the files
+# that had started are charged a crash; files still queued in the broken pool are simply re-queued.
+
+BATCH_EXTENSIONS = ('.csv', '.xls', '.xlsx', '.zip') + compressed_input.COMPRESSED_CSV_EXTENSIONS + columnar_input.COLUMNAR_EXTENSIONS
+JOURNAL_FILE = "batch_journal.jsonl"
+SUMMARY_FILE = "batch_summary.json"
+DEFAULT_OUTPUT_DIR = "batch_reports"
+DEFAULT_LLM_CONCURRENCY = 4
+MAX_CRASH_RETRIES = 2 # A file in flight when a worker process dies is re-queued this many times
+
+
+def discover_files(source: str) -> List[str]:
+    """All validatable files under a directory (recursive) or matching a glob pattern, sorted."""
+    if os.path.isdir(source):
+        candidates = [os.path.join(root, name) for root, _, names in os.walk(source) for name in names]
+    else:
+        candidates = glob.glob(source, recursive=True)
+    return sorted(path for path in candidates if os.path.isfile(path) and path.lower().endswith(BATCH_EXTENSIONS))
+
+
+def report_path_for(file_path: str, source_root: str, output_dir: str) -> str:
+    """Per-file report path; the subdirectories of the file under the batch root are mirrored in output_dir."""
+    relative = os.path.relpath(os.path.abspath(file_path), source_root)
+    return os.path.join(output_dir, relative + ".report.json")
+
+
+def _fingerprint(file_path: str) -> Dict[str, int]:
+    stat = os.stat(file_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class CheckpointJournal:
+    """Append-only JSON-lines record of finished files; the last entry per file wins."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue # Torn last line of a crashed run
+                    self.entries[entry["file"]] = entry
+        self._file = open(path, "a")
+
+    def is_done(self, file_path: str) -> bool:
+        entry = self.entries.get(os.path.abspath(file_path))
+        return bool(entry) and entry.get("status") == "done" and entry.get("fingerprint") == _fingerprint(file_path)
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        self.entries[entry["file"]] = entry
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def report_errors(result: Optional[Dict[str, Any]]) -> List[str]:
+    """
+    Errors of a main.run_multi_sheet_validation result; empty if every sheet was validated.
+
+    A missing report, a report without any sheet results and a sheet that errored (e.g. the LLM
+    was unreachable) all count as errors.
+    """
+    if result is None:
+        return ["Validation did not produce a report."]
+    if "sheet_validation_results" in result: # Excel workbook or zip archive
+        sheet_reports = list(result["sheet_validation_results"].values())
+    elif "schema_analysis_report" in result or "error" in result: # CSV / columnar: the sheet report is merged in
+        sheet_reports = [result]
+    else:
+        sheet_reports = []
+    if not sheet_reports:
+        return ["Validation did not produce any sheet results."]
+    return [str(r.get("error") or "Sheet did not produce a report.") for r in sheet_reports if not r or r.get("error")]
+
+
+# --- Worker process (shared with watch_folder) ---
+_validation_options: Dict[str, Any] = {}
+_started_files = None # Queue of files a worker has started, so a pool crash is charged to them only
+
+
+def init_worker(llm_slots, validation_options: Dict[str, Any], started_files=None) -> None:
+    """Process pool initializer: LLM concurrency slots, validation options and the started-files queue."""
+    global _started_files
+    import main # Imported per worker: sets up the LLM client once per process
+    main.llm_call_slots = llm_slots
+    _validation_options.update(validation_options)
+    _started_files = started_files
+
+
+def validate_file(file_path: str, report_path: str) -> Dict[str, Any]:
+    """Validates one file in a worker and returns its journal entry."""
+    import main
+    if _started_files is not None:
+        _started_files.put(file_path)
+    fingerprint = _fingerprint(file_path)
+    os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+    started = time.perf_counter()
+    result = main.run_multi_sheet_validation(file_path, report_path=report_path, print_report=False, **_validation_options)
+    errors = report_errors(result)
+    return {
+        "file": os.path.abspath(file_path),
+        "status": "failed" if errors else "done",
+        "report": report_path if result is not None else None,
+        "error": errors[0] if errors else None,
+        "fingerprint": fingerprint,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "worker_pid": os.getpid(),
+    }
+
+
+def drain_started_files(started_files) -> List[str]:
+    """Files the workers have started since the last call (non-blocking)."""
+    paths = []
+    while not started_files.empty():
+        paths.append(started_files.get())
+    return paths
+
+
+def run_batch(
+    source: str,
+    output_dir: str = DEFAULT_OUTPUT_DIR,
+    workers: Optional[int] = None,
+    llm_concurrency: int = DEFAULT_LLM_CONCURRENCY,
+    restart: bool = False,
+    **validation_options
+) -> Dict[str, Any]:
+    """
+    Validates every file of a directory or glob with a process pool, resuming from the checkpoint journal.
+
+    validation_options are passed on to main.run_multi_sheet_validation (db_url,
+    user_provided_table_name, fast, escalate, compact, memory_budget_mb, ...).
+    With restart=True the journal is ignored and every file is validated again.
+    Returns the batch summary (also written to <output_dir>/batch_summary.json).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    files = discover_files(source)
+    if os.path.isdir(source):
+        source_root = os.path.abspath(source)
+    else:
+        source_root = os.path.commonpath([os.path.dirname(os.path.abspath(f)) for f in files]) if files else os.getcwd()
+
+    journal_path = os.path.join(output_dir, JOURNAL_FILE)
+    if restart and os.path.exists(journal_path):
+        os.remove(journal_path)
+    journal = CheckpointJournal(journal_path)
+    pending = [f for f in files if not journal.is_done(f)]
+    skipped = len(files) - len(pending)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(pending) or 1))
+    logging.info(f"Batch: {len(files)} file(s) found, {skipped} already done, {len(pending)} to validate "
+                 f"with {workers} worker(s) and {llm_concurrency} concurrent LLM call(s).")
+
+    context = multiprocessing.get_context()
+    llm_slots = context.BoundedSemaphore(llm_concurrency)
+    started_files = context.SimpleQueue() # Written synchronously, so a worker that dies right after starting a file is still seen
+    started = time.perf_counter()
+    completed, failed = 0, 0
+    crashes: Dict[str, int] = {}
+    try:
+        while pending:
+            started_in_pool = set()
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker, initargs=(llm_slots, validation_options, started_files)) as pool:
+                futures = {pool.submit(validate_file, f, report_path_for(f, source_root, output_dir)): f for f in pending}
+                pending = []
+                for future in as_completed(futures):
+                    file_path = futures[future]
+                    try:
+                        entry = future.result()
+                    except BrokenProcessPool:
+                        # A worker died (e.g. out of memory). Every unfinished file is re-queued, but only the files that
+                        # had started are charged a crash (all of them if none had, i.e. the pool itself failed)
+                        started_in_pool.update(drain_started_files(started_files))
+                        if file_path not in started_in_pool and started_in_pool:
+                            pending.append(file_path)
+                            continue
+                        crashes[file_path] = crashes.get(file_path, 0) + 1
+                        if crashes[file_path] <= MAX_CRASH_RETRIES:
+                            pending.append(file_path)
+                            continue
+                        entry = {"file": os.path.abspath(file_path), "status": "failed", "error": "Worker process crashed."}
+                    except Exception as e:
+                        entry = {"file": os.path.abspath(file_path), "status": "failed", "error": str(e)}
+                    entry.setdefault("finished_at", datetime.now(timezone.utc).isoformat())
+                    journal.record(entry)
+                    completed += 1
+                    failed += entry["status"] != "done"
+                    logging.info(f"Batch [{completed + skipped}/{len(files)}] {entry['status']}: {file_path}")
+            drain_started_files(started_files) # Starts of this pool must not count against the next one
+            if pending:
+                logging.warning(f"Worker pool crashed. Restarting it for {len(pending)} file(s).")
+    finally:
+        journal.close()
+
+    summary = {
+        "source": source,
+        "output_dir": output_dir,
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "files_found": len(files),
+        "skipped_already_done": skipped,
+        "validated": completed,
+        "failed": failed,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+        "failed_files": [e["file"] for e in journal.entries.values() if e.get("status") != "done"],
+    }
+    with open(os.path.join(output_dir, SUMMARY_FILE), "w") as f:
+        json.dump(summary, f, indent=2)
+    logging.info(f"Batch complete: {completed} validated ({failed} failed), {skipped} skipped in {summary['elapsed_s']}s.")
+    return summary
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', force=True)
+    parser = argparse.ArgumentParser(description="Validate every data file of a directory or glob, resumably.")
+    parser.add_argument("source", help="Directory (searched recursively) or glob pattern, e.g. 'incoming/**/*.csv'.")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="Where per-file reports, the journal and the summary are written.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for local work (default: CPU count).")
+    parser.add_argument("--llm-concurrency", type=int, default=DEFAULT_LLM_CONCURRENCY, help="Maximum LLM calls in flight across all workers.")
+    parser.add_argument("--table", default=None, help="Target table for every file (default: matched per sheet).")
+    parser.add_argument("--db-url", default=None, help="Database URL (default: main.DB_URL).")
+    parser.add_argument("--fast", action="store_true", help="Validate a random row sample of every sheet.")
+    parser.add_argument("--escalate", action="store_true", help="With --fast: fully validate sheets whose sample fails.")
+    parser.add_argument("--compact", action="store_true", help="Load sheets with compact dtypes.")
+    parser.add_argument("--feed", default=None, help="Name of the recurring feed, to catch keys re-sent from earlier files.")
+    parser.add_argument("--memory-budget", type=int, default=None, help="Memory budget in MB for chunked key tracking (default: config.MEMORY_BUDGET_MB).")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint journal and validate every file again.")
+    args = parser.parse_args()
+
+    options = {"user_provided_table_name": args.table, "fast": args.fast, "escalate": args.escalate, "compact": args.compact,
+               "feed": args.feed, "memory_budget_mb": args.memory_budget}
+    if args.db_url:
+        options["db_url"] = args.db_url
+    summary = run_batch(args.source, args.output_dir, args.workers, args.llm_concurrency, args.restart, **options)
+    sys.exit(1 if summary["failed"] else 0)
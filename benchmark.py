@@ -0,0 +1,273 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+import synthetic_data
+
+# --- Benchmark suite for the validation stages ---
+# Generates synthetic customer_orders / products files (synthetic_data.py) with injected
+# errors and times every local stage of the pipeline on them: reading the CSV, schema
+# extraction, type validation, the data quality checks, date checks, building the three LLM
+# prompts and rendering the report (the LLM itself is answered by llm_stub, so no endpoint is
+# involved). Each case runs in a fresh process, so its peak RSS is its own; stage times are
+# the best of --repeat runs. Results (seconds, rows/s, MB/s for reads, peak RSS) are written
+# to a JSON file; with --baseline they are compared against an earlier result and any stage
+# that got slower (or a case that got bigger) beyond the tolerance is reported as a
+# regression and the run exits with status 1.
+#
+#   python benchmark.py --preset standard --output bench.json --save-baseline
+#   python benchmark.py --preset standard --baseline bench_baseline.json
+
+STAGES = ("read", "extract_schema", "validate_data_types", "run_data_quality_checks", "validate_dates", "build_prompts", "render_report")
+PRESETS: Dict[str, List[Tuple[str, int, int]]] = {
+    "smoke": [("customer_orders", 10_000, 10), ("products", 10_000, 10)],
+    "standard": [
+        ("customer_orders", 10_000, 10),
+        ("customer_orders", 100_000, 10),
+        ("customer_orders", 1_000_000, 10),
+        ("customer_orders", 100_000, 100),
+        ("customer_orders", 10_000, 1000),
+        ("products", 1_000_000, 10),
+    ],
+    "large": [
+        ("customer_orders", 10_000_000, 10),
+        ("customer_orders", 100_000_000, 10),
+        ("customer_orders", 1_000_000, 1000),
+    ],
+}
+DEFAULT_ERROR_RATES = {"null_rate": 0.01, "bad_type_rate": 0.005, "duplicate_key_rate": 0.002, "check_violation_rate": 0.005, "future_date_rate": 0.002}
+DEFAULT_DATA_DIR = "benchmark_data"
+DEFAULT_OUTPUT = "benchmark_results.json"
+DEFAULT_BASELINE = "benchmark_baseline.json"
+TARGET_DB_FILE = "benchmark_target.sqlite"
+TIME_TOLERANCE = 0.25 # A stage is a regression when it is this much slower than the baseline...
+MIN_REGRESSION_SECONDS = 0.05 # ...and slower by at least this much (ignores noise on tiny stages)
+MEMORY_TOLERANCE = 0.25
+
+
+def case_id(shape: str, rows: int, columns: int) -> str:
+    return f"{shape}-{rows}x{columns}"
+
+
+def parse_case(text: str) -> Tuple[str, int, int]:
+    """'customer_orders:100000x50' -> ('customer_orders', 100000, 50)."""
+    try:
+        shape, size = text.split(":")
+        rows, columns = size.lower().split("x")
+        return shape, int(float(rows)), int(columns)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected <shape>:<rows>x<columns>, got '{text}'")
+
+
+def _data_file(data_dir: str, shape: str, rows: int, columns: int, seed: int, error_rates: Dict[str, float]) -> str:
+    rates = "-".join(f"{error_rates.get(rate, 0):g}" for rate in synthetic_data.ERROR_RATES)
+    return os.path.join(data_dir, f"{case_id(shape, rows, columns)}-seed{seed}-{rates}.csv")
+
+
+def _prepare_target(data_dir: str, shape: str, columns: int) -> Tuple[str, str]:
+    """The SQLite target table for a shape and width (created once, empty)."""
+    import sqlite3
+    db_path = os.path.abspath(os.path.join(data_dir, TARGET_DB_FILE))
+    table_name = f"{shape}_{columns}"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(synthetic_data.create_table_sql(shape, columns, table_name))
+    return f"sqlite:///{db_path}", table_name
+
+
+# --- One case, run in its own process ---
+def run_case(shape: str, rows: int, columns: int, seed: int, error_rates: Dict[str, float], data_dir: str, repeat: int) -> Dict[str, Any]:
+    logging.basicConfig(level=logging.WARNING, force=True) # Stage logging would dominate small cases
+    import tools
+    import prompts
+    import build_md
+    import llm_stub
+    import engine_registry
+    import compressed_input
+
+    data_path = _data_file(data_dir, shape, rows, columns, seed, error_rates)
+    generate_seconds = None
+    if not os.path.exists(data_path):
+        started = time.perf_counter()
+        synthetic_data.write_csv(data_path, shape, rows, columns, seed, **error_rates)
+        generate_seconds = round(time.perf_counter() - started, 3)
+    file_bytes = os.path.getsize(data_path)
+    db_url, table_name = _prepare_target(data_dir, shape, columns)
+    engine = engine_registry.get_engine(db_url)
+    db_schema = tools.get_db_schema(engine, table_name)
+    file_name = os.path.basename(data_path)
+    state: Dict[str, Any] = {}
+
+    def build_prompts() -> None:
+        comparison = tools.compare_schemas(state["file_schema"], db_schema)
+        schema_prompt = prompts.get_schema_analysis_prompt(db_schema, state["file_schema"], comparison, table_name, file_name)
+        prompts.get_dynamic_rules_prompt(state["file_schema"])
+        file_metadata = {"file_name": file_name, "sheet_name": None, "total_rows": state["file_schema"].get("total_rows")}
+        state["final_prompt"] = prompts.get_final_report_prompt(
+            file_metadata=file_metadata, schema_analysis=json.loads(llm_stub.respond(schema_prompt)),
+            type_mismatches=state["type_violations"], dq_violations=state["dq_violations"],
+            current_file_schema=state["file_schema"], historical_schemas=[], dynamic_rules=[]
+        )
+
+    def render_report() -> None:
+        report = json.loads(llm_stub.respond(state["final_prompt"]))
+        report["data_type_mismatch"] = state["type_violations"]
+        report["data_quality_issues"] = state["dq_violations"]
+        json.dumps(report, default=str)
+        build_md.create_validation_markdown(report)
+
+    stage_functions = {
+        "read": lambda: state.update(df=compressed_input.read_csv_input(data_path)),
+        "extract_schema": lambda: state.update(file_schema=tools.extract_schema_from_df(state["df"], file_name, None)),
+        "validate_data_types": lambda: state.update(type_violations=tools.validate_data_types(state["df"], db_schema)),
+        "run_data_quality_checks": lambda: state.update(dq_violations=tools.run_data_quality_checks(state["df"], db_schema, engine, table_name)),
+        "validate_dates": lambda: state["dq_violations"].extend(tools.validate_dates(state["df"], db_schema)),
+        "build_prompts": build_prompts,
+        "render_report": render_report,
+    }
+
+    stages: Dict[str, Dict[str, Any]] = {}
+    for attempt in range(repeat):
+        state.clear()
+        # Every run starts cold: no detected date formats or referenced keys from the previous one
+        tools._datetime_format_cache.clear()
+        tools.clear_referenced_key_cache()
+        for stage in STAGES:
+            started = time.perf_counter()
+            stage_functions[stage]()
+            seconds = time.perf_counter() - started
+            peak_rss = tools.get_peak_rss_bytes()
+            result = stages.setdefault(stage, {"seconds": seconds})
+            result["seconds"] = min(result["seconds"], seconds)
+            if attempt == 0:
+                result["peak_rss_mb"] = round(peak_rss / 1e6, 1) if peak_rss else None
+    for stage, result in stages.items():
+        result["seconds"] = round(result["seconds"], 4)
+        result["rows_per_s"] = round(rows / result["seconds"]) if result["seconds"] else None
+    stages["read"]["mb_per_s"] = round(file_bytes / 1e6 / stages["read"]["seconds"], 1) if stages["read"]["seconds"] else None
+
+    # Sanity check on the generated dirt: affected rows per check, over all columns
+    data_quality: Dict[str, int] = {}
+    for v in state["dq_violations"]:
+        data_quality[v["check"]] = data_quality.get(v["check"], 0) + v.get("count", v.get("total_duplicate_records", 0))
+    peak_rss = tools.get_peak_rss_bytes()
+    return {
+        "case": case_id(shape, rows, columns),
+        "shape": shape,
+        "rows": rows,
+        "columns": columns,
+        "file_mb": round(file_bytes / 1e6, 2),
+        "generate_seconds": generate_seconds,
+        "total_seconds": round(sum(r["seconds"] for r in stages.values()), 4),
+        "peak_rss_mb": round(peak_rss / 1e6, 1) if peak_rss else None,
+        "violations_found": {
+            "type_mismatch_columns": len(state["type_violations"]),
+            "data_quality": data_quality,
+        },
+        "stages": stages,
+    }
+
+
+def run_benchmarks(cases: List[Tuple[str, int, int]], seed: int = 0, error_rates: Optional[Dict[str, float]] = None,
+                   data_dir: str = DEFAULT_DATA_DIR, repeat: int = 1) -> Dict[str, Any]:
+    """Runs every case in a fresh process and returns the results document."""
+    import pandas as pd
+    import numpy as np
+    error_rates = DEFAULT_ERROR_RATES if error_rates is None else error_rates
+    os.makedirs(data_dir, exist_ok=True)
+    results: Dict[str, Any] = {}
+    for shape, rows, columns in cases:
+        logging.info(f"Benchmark {case_id(shape, rows, columns)} ...")
+        # 'spawn' gives every case a clean interpreter, so ru_maxrss is that case's own peak
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            result = pool.submit(run_case, shape, rows, columns, seed, error_rates, data_dir, repeat).result()
+        results[result["case"]] = result
+        logging.info(f"  {result['total_seconds']}s total, peak RSS {result['peak_rss_mb']} MB: "
+                     + ", ".join(f"{stage} {r['seconds']}s" for stage, r in result["stages"].items()))
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {"python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__,
+                        "platform": platform.platform(), "cpu_count": os.cpu_count()},
+        "seed": seed,
+        "error_rates": error_rates,
+        "repeat": repeat,
+        "cases": results,
+    }
+
+
+def compare_to_baseline(current: Dict[str, Any], baseline: Dict[str, Any], time_tolerance: float = TIME_TOLERANCE,
+                        memory_tolerance: float = MEMORY_TOLERANCE, min_seconds: float = MIN_REGRESSION_SECONDS) -> List[Dict[str, Any]]:
+    """Stages that got slower, and cases whose peak RSS grew, beyond the tolerances."""
+    if current.get("seed") != baseline.get("seed") or current.get("error_rates") != baseline.get("error_rates"):
+        logging.warning("The baseline was recorded with a different seed or error rates; the comparison may not be like for like.")
+    regressions = []
+    for name, case in current["cases"].items():
+        base_case = baseline.get("cases", {}).get(name)
+        if base_case is None:
+            continue
+        for stage, result in case["stages"].items():
+            base_seconds = base_case.get("stages", {}).get(stage, {}).get("seconds")
+            if base_seconds is None:
+                continue
+            if result["seconds"] > base_seconds * (1 + time_tolerance) and result["seconds"] - base_seconds >= min_seconds:
+                regressions.append({"case": name, "stage": stage, "metric": "seconds", "baseline": base_seconds, "current": result["seconds"],
+                                    "change_pct": round(100 * (result["seconds"] / base_seconds - 1), 1)})
+        base_rss, rss = base_case.get("peak_rss_mb"), case.get("peak_rss_mb")
+        if base_rss and rss and rss > base_rss * (1 + memory_tolerance):
+            regressions.append({"case": name, "stage": None, "metric": "peak_rss_mb", "baseline": base_rss, "current": rss,
+                                "change_pct": round(100 * (rss / base_rss - 1), 1)})
+    return regressions
+
+
+def format_results(results: Dict[str, Any]) -> str:
+    lines = [f"{'case':<32}{'stage':<26}{'seconds':>10}{'rows/s':>14}{'peak MB':>10}"]
+    for name, case in results["cases"].items():
+        for stage, r in case["stages"].items():
+            lines.append(f"{name:<32}{stage:<26}{r['seconds']:>10.4f}{r['rows_per_s'] or 0:>14,}{r['peak_rss_mb'] or 0:>10}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', force=True)
+    parser = argparse.ArgumentParser(description="Benchmark the validation stages on synthetic dirty data.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="smoke")
+    parser.add_argument("--case", action="append", type=parse_case, default=None,
+                        help="<shape>:<rows>x<columns>, e.g. customer_orders:1e6x50 (repeatable; replaces the preset).")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case; the fastest time of each stage is kept.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="Where generated files are cached.")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=None, help="Compare against this results file and exit 1 on regressions.")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Also write the results to {DEFAULT_BASELINE}.")
+    parser.add_argument("--tolerance", type=float, default=TIME_TOLERANCE, help="Allowed slowdown per stage (0.25 = 25%%).")
+    parser.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE, help="Allowed growth of peak RSS per case.")
+    for rate in synthetic_data.ERROR_RATES:
+        parser.add_argument(f"--{rate.replace('_', '-')}", type=float, default=DEFAULT_ERROR_RATES[rate])
+    args = parser.parse_args()
+
+    rates = {rate: getattr(args, rate) for rate in synthetic_data.ERROR_RATES}
+    results = run_benchmarks(args.case or PRESETS[args.preset], args.seed, rates, args.data_dir, args.repeat)
+    print(format_results(results))
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(DEFAULT_BASELINE, "w") as f:
+            json.dump(results, f, indent=2)
+        logging.info(f"Baseline saved to {DEFAULT_BASELINE}.")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance, args.memory_tolerance)
+        results["regressions"] = regressions
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        for r in regressions:
+            logging.warning(f"REGRESSION {r['case']} {r['stage'] or ''} {r['metric']}: {r['baseline']} -> {r['current']} (+{r['change_pct']}%)")
+        if regressions:
+            sys.exit(1)
+        logging.info("No regressions against the baseline.")
@@ -0,0 +1,231 @@
+import logging
+import numpy as np
+import pandas as pd
+import sqlalchemy
+from sqlalchemy import inspect
+from typing import Dict, Any, List, Optional, Iterator
+import tools
+import incremental_validation
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError: # pyarrow is optional; only needed for columnar inputs
+    pa = None
+    pq = None
+
+# --- Native Parquet / Feather / Arrow IPC input ---
+# The file schema (columns, types, row and null counts) is built from file metadata only.
+# Validation then reads just the columns that map to the target table, one Parquet row
+# group / IPC record batch at a time (IPC files are memory-mapped), and merges the
+# per-chunk results, so memory use is bounded by the largest row group.
+
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+IPC_EXTENSIONS = ('.feather', '.arrow', '.ipc', '.arrows')
+COLUMNAR_EXTENSIONS = PARQUET_EXTENSIONS + IPC_EXTENSIONS
+
+
+def is_columnar_file(file_path: str) -> bool:
+    return file_path.lower().endswith(COLUMNAR_EXTENSIONS)
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("pyarrow is required to read Parquet/Feather/Arrow files. Install it with 'pip install pyarrow'.")
+
+
+def _open_ipc(file_path: str):
+    """Opens a memory-mapped Arrow IPC file (Feather v2), falling back to the streaming format."""
+    source = pa.memory_map(file_path, 'r')
+    try:
+        return pa.ipc.open_file(source)
+    except pa.ArrowInvalid:
+        source.seek(0)
+        return pa.ipc.open_stream(source)
+
+
+def _pandas_type_name(arrow_type) -> str:
+    """Name of the dtype the column gets in pandas, so it matches extract_schema_from_df."""
+    if pa.types.is_date(arrow_type):
+        return 'datetime64[ms]' # Dates are read with date_as_object=False
+    try:
+        return np.dtype(arrow_type.to_pandas_dtype()).name
+    except (NotImplementedError, TypeError):
+        return str(arrow_type)
+
+
+def _json_safe(value: Any) -> Any:
+    return value if isinstance(value, (int, float, str, bool)) or value is None else str(value)
+
+
+def read_columnar_schema(file_path: str) -> Dict[str, Any]:
+    """
+    Extracts the file schema of a Parquet/Feather/Arrow file from its metadata, without reading data.
+
+    Returns the same structure as tools.extract_schema_from_df. For Parquet, 'sample_values'
+    holds the min/max column statistics of the first row group (when written).
+    """
+    _require_pyarrow()
+    file_name = file_path
+    try:
+        column_details: Dict[str, Dict[str, Any]] = {}
+        if file_path.lower().endswith(PARQUET_EXTENSIONS):
+            parquet_file = pq.ParquetFile(file_path, memory_map=True)
+            metadata = parquet_file.metadata
+            schema = parquet_file.schema_arrow
+            total_rows, chunk_count = metadata.num_rows, metadata.num_row_groups
+            leaf_index = {metadata.schema.column(j).path: j for j in range(metadata.num_columns)}
+            for field in schema:
+                null_count, sample_values = None, []
+                j = leaf_index.get(field.name)
+                if j is not None and chunk_count:
+                    stats = [metadata.row_group(i).column(j).statistics for i in range(chunk_count)]
+                    if all(s is not None and s.has_null_count for s in stats):
+                        null_count = int(sum(s.null_count for s in stats))
+                    if stats[0] is not None and stats[0].has_min_max:
+                        sample_values = list(dict.fromkeys(_json_safe(v) for v in (stats[0].min, stats[0].max)))
+                column_details[field.name] = {
+                    'inferred_type': _pandas_type_name(field.type),
+                    'arrow_type': str(field.type),
+                    'sample_values': sample_values,
+                    'null_count': null_count
+                }
+        else:
+            reader = _open_ipc(file_path)
+            schema = reader.schema
+            null_counts = {field.name: 0 for field in schema}
+            total_rows, chunk_count = 0, 0
+            # Record batches are memory-mapped: row and null counts come from the batch headers
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches)) if isinstance(reader, pa.ipc.RecordBatchFileReader) else reader
+            for batch in batches:
+                total_rows += batch.num_rows
+                chunk_count += 1
+                for field, column in zip(schema, batch.columns):
+                    null_counts[field.name] += column.null_count
+            for field in schema:
+                column_details[field.name] = {
+                    'inferred_type': _pandas_type_name(field.type),
+                    'arrow_type': str(field.type),
+                    'sample_values': [],
+                    'null_count': int(null_counts[field.name])
+                }
+
+        logging.info(f"Extracted schema from metadata of '{file_path}': {len(column_details)} columns, {total_rows} rows in {chunk_count} chunk(s).")
+        return {
+            "file_name": file_name,
+            "sheet_name": None,
+            "total_rows": int(total_rows),
+            "total_columns": len(column_details),
+            "columns": column_details,
+            "schema_source": "file_metadata",
+            "row_groups": chunk_count
+        }
+    except Exception as e:
+        logging.error(f"Error reading metadata of columnar file '{file_path}': {e}")
+        return {"file_name": file_name, "sheet_name": None, "total_rows": 0, "columns": {}, "error": str(e)}
+
+
+def _iter_arrow_tables(file_path: str, columns: Optional[List[str]]) -> Iterator["pa.Table"]:
+    if file_path.lower().endswith(PARQUET_EXTENSIONS):
+        parquet_file = pq.ParquetFile(file_path, memory_map=True)
+        for i in range(parquet_file.metadata.num_row_groups):
+            yield parquet_file.read_row_group(i, columns=columns)
+    else:
+        reader = _open_ipc(file_path)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches)) if isinstance(reader, pa.ipc.RecordBatchFileReader) else reader
+        for batch in batches:
+            table = pa.Table.from_batches([batch])
+            yield table.select(columns) if columns is not None else table
+
+
+def iter_columnar_chunks(file_path: str, columns: Optional[List[str]] = None, column_mapping: Optional[Dict[str, str]] = None) -> Iterator[pd.DataFrame]:
+    """
+    Yields the file as pandas DataFrames, one per Parquet row group / IPC record batch.
+
+    Only 'columns' (file column names) are read. Columns are renamed with column_mapping on
+    the Arrow side, and every chunk carries a global row index (row offset within the file).
+    """
+    _require_pyarrow()
+    row_offset = 0
+    for table in _iter_arrow_tables(file_path, columns):
+        if column_mapping:
+            table = table.rename_columns([column_mapping.get(name, name) for name in table.column_names])
+        chunk = table.to_pandas(date_as_object=False)
+        chunk.index = pd.RangeIndex(row_offset, row_offset + len(chunk))
+        row_offset += len(chunk)
+        yield chunk
+
+
+def validate_columnar_file(
+    file_path: str,
+    db_schema: Dict[str, Any],
+    table_name: str,
+    engine: Optional[sqlalchemy.engine.Engine] = None,
+    column_mapping: Optional[Dict[str, str]] = None,
+    feed: Optional[str] = None,
+    date_feed: Optional[str] = None,
+    memory_budget_bytes: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Runs type, data quality, date and foreign key checks over a Parquet/Feather/Arrow file chunk by chunk.
+
+    Only file columns that map to a column of db_schema are read. Null, CHECK, primary key and
+    UNIQUE checks are accumulated across chunks (see incremental_validation.ValidationState); the other
+    checks run per chunk and their counts and samples are merged. If a feed name is given, primary
+    keys are also checked against the keys accepted from earlier files of that feed. Key
+    tracking stays within memory_budget_bytes and spills to disk past it.
+    Returns a summary dict with 'type_violations' and 'dq_violations' in the usual formats.
+    """
+    _require_pyarrow()
+    column_mapping = column_mapping or {}
+    file_schema = read_columnar_schema(file_path)
+    if "error" in file_schema:
+        raise ValueError(f"Could not read columnar file '{file_path}': {file_schema['error']}")
+    columns = [col for col in file_schema["columns"] if column_mapping.get(col, col) in db_schema]
+    logging.info(f"Reading {len(columns)}/{len(file_schema['columns'])} column(s) of '{file_path}': {columns}")
+
+    check_constraints = []
+    if engine is not None:
+        try:
+            check_constraints = inspect(engine).get_check_constraints(table_name)
+        except Exception as e:
+            logging.warning(f"Could not fetch CHECK constraints for table '{table_name}': {e}. Skipping CHECK constraint validation.")
+
+    state = incremental_validation.ValidationState(db_schema, check_constraints, memory_budget_bytes)
+    type_merged: Dict[str, Dict[str, Any]] = {}
+    dq_merged: Dict[tuple, Dict[str, Any]] = {}
+    chunk_count = 0
+    for chunk in iter_columnar_chunks(file_path, columns, column_mapping):
+        chunk_count += 1
+        state.update(chunk)
+        tools.merge_type_violations(type_merged, tools.validate_data_types(chunk, db_schema), len(chunk))
+        chunk_violations = tools.validate_dates(chunk, db_schema, feed=date_feed)
+        if engine is not None:
+            chunk_violations.extend(tools.check_foreign_keys(chunk, engine, table_name))
+        if feed:
+            chunk_violations.extend(tools.check_cross_batch_duplicates(chunk, db_schema, feed, table_name))
+        tools.merge_violations(dq_merged, chunk_violations)
+
+    dq_violations = state.to_violations() + list(dq_merged.values())
+    state.close()
+    logging.info(f"Columnar validation of '{file_path}' complete: {state.rows} rows in {chunk_count} chunk(s).")
+    return {
+        "file_name": file_path,
+        "total_rows": state.rows,
+        "chunks_validated": chunk_count,
+        "columns_read": columns,
+        "column_stats": state.column_stats(),
+        "type_violations": tools.finalize_type_violations(type_merged),
+        "dq_violations": dq_violations,
+    }
+
+
+def record_accepted_keys(file_path: str, db_schema: Dict[str, Any], feed: str, table_name: str, column_mapping: Optional[Dict[str, str]] = None) -> int:
+    """Adds the primary keys of a validated columnar file to the feed's key index, reading only the key columns."""
+    column_mapping = column_mapping or {}
+    pk_columns = {col for col, details in db_schema.items() if details.get('primary_key')}
+    file_schema = read_columnar_schema(file_path)
+    columns = [col for col in file_schema.get("columns", {}) if column_mapping.get(col, col) in pk_columns]
+    if not pk_columns or len(columns) < len(pk_columns):
+        return 0
+    return sum(tools.record_accepted_keys(chunk, db_schema, feed, table_name) for chunk in iter_columnar_chunks(file_path, columns, column_mapping))
@@ -0,0 +1,77 @@
+import zipfile
+import logging
+import posixpath
+import pandas as pd
+from pandas import DataFrame
+from typing import List, Optional, Iterator
+import tools
+
+# --- Compressed and archived CSV input ---
+# .csv.gz / .csv.bz2 / .csv.xz / .csv.zst files are decompressed on the fly while pandas
+# parses them, and the CSV members of a .zip bundle are read straight from the archive
+# (one stream per member), so nothing is extracted to disk. A zip is treated like an
+# Excel workbook: every CSV member is a "sheet". Reading .zst needs the optional
+# 'zstandard' package.
+
+COMPRESSION_BY_SUFFIX = {'.gz': 'gzip', '.gzip': 'gzip', '.bz2': 'bz2', '.xz': 'xz', '.zst': 'zstd', '.zstd': 'zstd'}
+COMPRESSED_CSV_EXTENSIONS = tuple(f".csv{suffix}" for suffix in COMPRESSION_BY_SUFFIX)
+ZIP_MEMBER_EXTENSIONS = ('.csv',) + COMPRESSED_CSV_EXTENSIONS
+ARCHIVE_MAX_WORKERS = 4
+
+
+def is_compressed_csv(file_path: str) -> bool:
+    return file_path.lower().endswith(COMPRESSED_CSV_EXTENSIONS)
+
+
+def is_zip_archive(file_path: str) -> bool:
+    return file_path.lower().endswith('.zip')
+
+
+def get_compression(file_name: str) -> Optional[str]:
+    """Returns the pandas compression name for a (compressed) CSV file name, or None if uncompressed."""
+    return COMPRESSION_BY_SUFFIX.get(posixpath.splitext(file_name.lower())[1])
+
+
+def list_zip_members(file_path: str) -> List[str]:
+    """Returns the CSV members of a zip archive in archive order, skipping directories and OS metadata files."""
+    with zipfile.ZipFile(file_path) as archive:
+        members = [
+            info.filename for info in archive.infolist()
+            if not info.is_dir()
+            and info.filename.lower().endswith(ZIP_MEMBER_EXTENSIONS)
+            and not info.filename.startswith('__MACOSX/')
+            and not posixpath.basename(info.filename).startswith('.')
+        ]
+        skipped = [name for name in archive.namelist() if name not in members and not name.endswith('/')]
+    if skipped:
+        logging.info(f"Skipping non-CSV members of '{file_path}': {skipped}")
+    return members
+
+
+def read_csv_input(file_path: str, member: Optional[str] = None, compact: bool = False) -> DataFrame:
+    """
+    Reads a plain or compressed CSV, or one CSV member of a zip archive, with streaming decompression.
+
+    With compact=True the result uses compact dtypes (see tools.read_csv_compact / tools.compact_dataframe).
+    """
+    if member is None:
+        compression = get_compression(file_path)
+        if compact:
+            return tools.read_csv_compact(file_path, compression=compression)
+        return pd.read_csv(file_path, compression=compression)
+
+    # Every call opens its own ZipFile, so members can be read from several threads at once
+    with zipfile.ZipFile(file_path) as archive, archive.open(member) as stream:
+        df = pd.read_csv(stream, compression=get_compression(member))
+    return tools.compact_dataframe(df) if compact else df
+
+
+def iter_csv_chunks(file_path: str, member: Optional[str] = None, chunksize: int = 1_000_000) -> Iterator[DataFrame]:
+    """Yields a plain/compressed CSV (or a zip member) in chunks of chunksize rows, with a global row index."""
+    if member is None:
+        with pd.read_csv(file_path, compression=get_compression(file_path), chunksize=chunksize) as reader:
+            yield from reader
+        return
+    with zipfile.ZipFile(file_path) as archive, archive.open(member) as stream:
+        with pd.read_csv(stream, compression=get_compression(member), chunksize=chunksize) as reader:
+            yield from reader
@@ -10,6 +10,14 @@ AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION")
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Memory budget for key tracking (duplicate detection); past it, keys spill to disk
+MEMORY_BUDGET_MB = int(os.getenv("MEMORY_BUDGET_MB", "1024"))
+
+# Connection pool of the shared engine per database URL (see engine_registry.py)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+
 config_list = [
     {
         "model": AZURE_OPENAI_DEPLOYMENT,
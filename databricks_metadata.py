@@ -0,0 +1,115 @@
+import re
+import time
+import logging
+import threading
+import sqlalchemy
+from sqlalchemy import inspect
+from typing import Dict, Any, List, Optional
+
+# --- Cached catalog metadata ---
+# Agent tools ask for table lists and column schemas over and over. MetadataService answers
+# both from one cached snapshot of the schema: a single information_schema.columns query
+# for every table, run on a pooled connection of the shared engine and fetched as Arrow
+# (cursor.fetchall_arrow) when the driver supports it, as on Databricks SQL. The snapshot
+# is refreshed after METADATA_TTL_SECONDS. Databases without information_schema (e.g. a
+# local SQLite stand-in) are reflected with SQLAlchemy's batched get_multi_columns instead.
+
+METADATA_TTL_SECONDS = 600
+COLUMNS_QUERY = (
+    "SELECT table_name, column_name, data_type, is_nullable, ordinal_position "
+    "FROM information_schema.columns WHERE table_schema = '{schema}' "
+    "ORDER BY table_name, ordinal_position"
+)
+
+_services: Dict[tuple, "MetadataService"] = {}
+_services_lock = threading.Lock()
+
+
+class MetadataService:
+    """Table list and column schemas of one database schema, cached with a TTL."""
+
+    def __init__(self, engine: sqlalchemy.engine.Engine, schema: str = "default", ttl_seconds: float = METADATA_TTL_SECONDS):
+        if not re.fullmatch(r'\w+', schema):
+            raise ValueError(f"Invalid schema name: '{schema}'")
+        self.engine = engine
+        self.schema = schema
+        self.ttl_seconds = ttl_seconds
+        self.fetch_count = 0 # Number of round trips to the database, for monitoring
+        self._tables: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    # --- Fetching ---
+    def _query_information_schema(self) -> List[Dict[str, Any]]:
+        raw_connection = self.engine.raw_connection() # Checked out from the pool, returned on close()
+        try:
+            cursor = raw_connection.cursor()
+            try:
+                cursor.execute(COLUMNS_QUERY.format(schema=self.schema))
+                if hasattr(cursor, "fetchall_arrow"):
+                    return [{k.lower(): v for k, v in row.items()} for row in cursor.fetchall_arrow().to_pylist()]
+                names = [d[0].lower() for d in cursor.description]
+                return [dict(zip(names, row)) for row in cursor.fetchall()]
+            finally:
+                cursor.close()
+        finally:
+            raw_connection.close()
+
+    def _reflect(self) -> List[Dict[str, Any]]:
+        rows = []
+        for (_, table_name), columns in inspect(self.engine).get_multi_columns(schema=self.schema).items():
+            for position, col in enumerate(columns, start=1):
+                rows.append({"table_name": table_name, "column_name": col["name"], "data_type": str(col["type"]),
+                             "is_nullable": "YES" if col.get("nullable", True) else "NO", "ordinal_position": position})
+        return rows
+
+    def _load(self) -> None:
+        started = time.perf_counter()
+        try:
+            rows = self._query_information_schema()
+            source = "information_schema"
+        except Exception as e:
+            logging.info(f"information_schema is not available ({e}). Reflecting the schema instead.")
+            rows = self._reflect()
+            source = "reflection"
+        tables: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for row in rows:
+            tables.setdefault(row["table_name"], {})[row["column_name"]] = {
+                "type": str(row["data_type"]),
+                "nullable": str(row["is_nullable"]).upper() in ("YES", "TRUE", "1"),
+            }
+        self._tables = tables
+        self._fetched_at = time.monotonic()
+        self.fetch_count += 1
+        logging.info(f"Loaded metadata of {len(tables)} tables in schema '{self.schema}' from {source} in {time.perf_counter() - started:.2f}s.")
+
+    def _snapshot(self, refresh: bool = False) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        with self._lock:
+            if refresh or self._tables is None or time.monotonic() - self._fetched_at >= self.ttl_seconds:
+                self._load()
+            return self._tables
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._tables = None
+
+    # --- Queries (served from the cache) ---
+    def list_tables(self, refresh: bool = False) -> List[str]:
+        return sorted(self._snapshot(refresh))
+
+    def get_columns(self, table_names: Optional[List[str]] = None, refresh: bool = False) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """{table: {column: {'type', 'nullable'}}} for the given tables (all if None). Unknown tables are left out."""
+        tables = self._snapshot(refresh)
+        if table_names is None:
+            return dict(tables)
+        return {name: tables[name] for name in table_names if name in tables}
+
+
+def get_metadata_service(engine: sqlalchemy.engine.Engine, schema: str = "default", ttl_seconds: float = METADATA_TTL_SECONDS) -> MetadataService:
+    """Returns the process-wide MetadataService for (engine URL, schema)."""
+    key = (str(engine.url), schema)
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = _services[key] = MetadataService(engine, schema, ttl_seconds)
+    return service
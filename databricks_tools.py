@@ -1,12 +1,16 @@
 import os
-import sqlalchemy as sa
 import json
 from dotenv import load_dotenv
+from typing import List, Optional
+import engine_registry
+import databricks_metadata
+import pushdown_validation
 
 def get_databricks_engine():
     """
-    Creates and returns a SQLAlchemy engine for Databricks.
-    Pulls all credentials from your .env file.
+    Returns the shared, pooled SQLAlchemy engine for Databricks (see engine_registry).
+    Pulls all credentials from your .env file. The engine is created and health-checked
+    on first use only; later calls reuse its warm connections.
     """
     load_dotenv()
     
@@ -29,40 +33,42 @@ def get_databricks_engine():
             f"schema=default"
         )
         
-        engine = sa.create_engine(connection_string)
-        
-        # Test the connection
-        with engine.connect() as conn:
-            conn.execute(sa.text("SELECT 1"))
-        
-        print("SQLAlchemy engine for Databricks (workspace.default) created successfully.")
+        # Lazy health check: 'SELECT 1' runs on first use, then only every few minutes
+        engine = engine_registry.get_engine(connection_string, verify=True)
         return engine
         
     except Exception as e:
         print(f"Error creating Databricks SQLAlchemy engine: {e}")
         return None
 
+def get_metadata_service():
+    """
+    Returns the cached metadata service of 'workspace.default' (see databricks_metadata),
+    or None if no Databricks engine is available.
+    """
+    engine = get_databricks_engine()
+    if engine is None:
+        return None
+    return databricks_metadata.get_metadata_service(engine, schema="default")
+
+
 def list_all_tables() -> str:
     """
-    Connects to Databricks via SQLAlchemy and lists all tables 
-    in the 'workspace.default' schema (pre-configured in the engine).
+    Lists all tables in the 'workspace.default' schema (pre-configured in the engine).
     
-    This is the function your agent will use as a tool.
+    This is the function your agent will use as a tool. Table names are served from the
+    cached schema snapshot; the warehouse is queried at most once per cache TTL.
     
     Returns:
         A JSON string of the tables found, or an error message.
     """
     
-    print("Connecting to Databricks with SQLAlchemy to list tables...")
-    engine = get_databricks_engine()
-    if engine is None:
+    service = get_metadata_service()
+    if service is None:
         return json.dumps({"error": "Failed to create Databricks connection."})
 
     try:
-        inspector = sa.inspect(engine)
-        
-        # We don't need schema='default' because the engine now knows
-        table_names = inspector.get_table_names()
+        table_names = service.list_tables()
         
         print(f"Success! Found {len(table_names)} tables in workspace.default.")
         return json.dumps({
@@ -73,11 +79,50 @@ def list_all_tables() -> str:
 
     except Exception as e:
         return json.dumps({"error": f"Failed to list tables: {e}"})
+    # The engine stays in the registry; its pool is disposed once at exit
+
+
+def get_table_schemas(table_names: Optional[List[str]] = None) -> str:
+    """
+    Returns the column names, types and nullability of the given tables (all tables if None)
+    in 'workspace.default', from the same cached snapshot as list_all_tables.
+    
+    Returns:
+        A JSON string {"tables": {table: {column: {"type", "nullable"}}}}, or an error message.
+    """
+    service = get_metadata_service()
+    if service is None:
+        return json.dumps({"error": "Failed to create Databricks connection."})
+
+    try:
+        schemas = service.get_columns(table_names)
+        missing = [name for name in (table_names or []) if name not in schemas]
+        return json.dumps({
+            "catalog": "workspace",
+            "schema": "default",
+            "tables": schemas,
+            "tables_not_found": missing
+        })
+    except Exception as e:
+        return json.dumps({"error": f"Failed to fetch table schemas: {e}"})
+
+def validate_staging_table(source_table: str, target_table: str) -> str:
+    """
+    Validates a table that already sits in 'workspace.default' against the constraints of
+    target_table, inside the warehouse (see pushdown_validation): only violation counts and
+    a few sample values are transferred, not the table itself.
     
-    finally:
-        # Dispose of the engine to close all connections
-        if engine:
-            engine.dispose()
+    Returns:
+        A JSON string with 'total_rows' and 'dq_violations', or an error message.
+    """
+    engine = get_databricks_engine()
+    if engine is None:
+        return json.dumps({"error": "Failed to create Databricks connection."})
+
+    try:
+        return json.dumps(pushdown_validation.run_pushdown_checks(engine, source_table, target_table), default=str)
+    except Exception as e:
+        return json.dumps({"error": f"Failed to validate table '{source_table}': {e}"})
 
 # --- This part lets you test the file directly ---
 if __name__ == "__main__":
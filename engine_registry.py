@@ -0,0 +1,91 @@
+import time
+import atexit
+import logging
+import threading
+import sqlalchemy
+from sqlalchemy.engine import make_url
+from typing import Dict, Any
+import config
+
+# --- Process-wide engine registry ---
+# One SQLAlchemy engine (and so one connection pool) per database URL, shared by every sheet,
+# tool and agent in the process. Pooled connections are pre-pinged on checkout and recycled
+# after DB_POOL_RECYCLE_SECONDS, so stale warehouse sessions are replaced transparently.
+# A full "SELECT 1" health check runs lazily: on first use and then at most once per
+# HEALTH_CHECK_INTERVAL_SECONDS. All engines are disposed once, at interpreter shutdown.
+
+HEALTH_CHECK_INTERVAL_SECONDS = 300
+
+_engines: Dict[str, sqlalchemy.engine.Engine] = {}
+_last_health_check: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def _engine_options(url: str) -> Dict[str, Any]:
+    options: Dict[str, Any] = {"pool_pre_ping": True, "pool_recycle": config.DB_POOL_RECYCLE_SECONDS}
+    if not make_url(url).get_backend_name().startswith("sqlite"):
+        # SQLite uses its own single-file pools; sizing only applies to server databases
+        options.update(pool_size=config.DB_POOL_SIZE, max_overflow=config.DB_MAX_OVERFLOW)
+    return options
+
+
+def get_engine(url: str, verify: bool = False, **engine_kwargs) -> sqlalchemy.engine.Engine:
+    """
+    Returns the shared engine for a database URL, creating it on first use.
+
+    With verify=True a 'SELECT 1' health check runs if the engine has not been checked within
+    HEALTH_CHECK_INTERVAL_SECONDS; a failing check disposes the engine and re-raises.
+    engine_kwargs override the configured pool options when the engine is first created.
+    """
+    if not url:
+        raise ValueError("No database URL given. Set DATABASE_URL in your .env file.")
+    key = str(url)
+    with _lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = sqlalchemy.create_engine(url, **{**_engine_options(key), **engine_kwargs})
+            _engines[key] = engine
+            logging.info(f"Created pooled engine for {engine.url.render_as_string(hide_password=True)}")
+    if verify:
+        check_health(engine)
+    return engine
+
+
+def check_health(engine: sqlalchemy.engine.Engine, force: bool = False) -> None:
+    """Runs 'SELECT 1' unless the engine passed a check within HEALTH_CHECK_INTERVAL_SECONDS."""
+    key = str(engine.url)
+    last_check = _last_health_check.get(key)
+    if not force and last_check is not None and time.monotonic() - last_check < HEALTH_CHECK_INTERVAL_SECONDS:
+        return
+    try:
+        with engine.connect() as conn:
+            conn.execute(sqlalchemy.text("SELECT 1"))
+    except Exception:
+        _last_health_check.pop(key, None)
+        engine.dispose() # Drop every pooled connection; the next checkout reconnects
+        raise
+    _last_health_check[key] = time.monotonic()
+
+
+def dispose_engine(url: str) -> None:
+    with _lock:
+        engine = _engines.pop(str(url), None)
+        _last_health_check.pop(str(url), None)
+    if engine is not None:
+        engine.dispose()
+
+
+def dispose_all() -> None:
+    """Closes every pooled connection of every registered engine."""
+    with _lock:
+        engines = list(_engines.values())
+        _engines.clear()
+        _last_health_check.clear()
+    for engine in engines:
+        try:
+            engine.dispose()
+        except Exception as e:
+            logging.warning(f"Could not dispose engine {engine.url.render_as_string(hide_password=True)}: {e}")
+
+
+atexit.register(dispose_all)
@@ -0,0 +1,468 @@
+import os
+import io
+import json
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+import sqlalchemy
+from sqlalchemy import inspect
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+import tools
+import key_spill
+import violation_matrix
+
+# --- Incremental re-validation for append-only CSV feeds ---
+# The file is split into byte chunks that always end on a newline. For every chunk we
+# store its byte range and content hash, plus the accumulated check state (null counts,
+# numeric stats, CHECK violations, the PK / UNIQUE key counts and the merged type, date and
+# cross-batch results). On the next run the stored prefix chunks are re-hashed (no
+# parsing) and, if they are unchanged, only the new tail is parsed, validated and merged
+# into the previous state. The file is never loaded as a whole: the file schema comes
+# from its first SCHEMA_SAMPLE_ROWS rows (see read_head).
+#
+# Limitation: chunks are cut on raw newlines, so quoted CSV fields containing line breaks
+# are not supported in incremental mode.
+
+VALIDATION_STATE_DIR = "validation_state"
+CHUNK_BYTES = 64 * 1024 * 1024
+STATE_VERSION = 3
+MAX_SAMPLES = 5
+SCHEMA_SAMPLE_ROWS = 10_000
+
+
+def _safe_name(name: str) -> str:
+    return "".join(c if c.isalnum() else "_" for c in name)
+
+
+def _hash_bytes(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class ValidationState:
+    """
+    Accumulated data quality state for one file validated chunk by chunk.
+
+    Chunks passed to update() must already use DB column names and carry a
+    global row index (row offset within the file), so sample indices stay valid
+    after merging. The key counts of the primary key and of every UNIQUE constraint
+    share memory_budget_bytes and spill to disk past it (see key_spill.KeyCounter).
+    Results of the row-local checks
+    run outside this class (types, dates, ...) are kept with merge_chunk_results().
+    """
+
+    def __init__(self, db_schema: Dict[str, Any], check_constraints: Optional[List[Dict[str, Any]]] = None, memory_budget_bytes: Optional[int] = None):
+        self.db_schema = db_schema
+        self.check_constraints = check_constraints or []
+        self.key_constraints = tools.get_key_constraints(db_schema)
+        self.rows = 0
+        self.null_counts: Dict[str, int] = {}
+        self.null_samples: Dict[str, List[int]] = {}
+        self.stats: Dict[str, Dict[str, Any]] = {}
+        self.check_violations: Dict[str, Dict[str, Any]] = {}
+        # Per key constraint (name): sample duplicated keys, and how many rows carried each key hash
+        self.duplicate_samples: Dict[str, List[str]] = {c["name"]: [] for c in self.key_constraints}
+        key_budget = (memory_budget_bytes or key_spill.MEMORY_BUDGET_BYTES) // max(1, len(self.key_constraints))
+        self.key_counters = {c["name"]: key_spill.KeyCounter(key_budget) for c in self.key_constraints}
+        # Merged per-chunk results, see tools.merge_type_violations / tools.merge_violations
+        self.type_violations: Dict[str, Dict[str, Any]] = {}
+        self.chunk_violations: Dict[tuple, Dict[str, Any]] = {}
+
+    # --- Accumulation ---
+    def update(self, chunk: pd.DataFrame) -> None:
+        """Validates one chunk and merges its results into the accumulated state."""
+        for col, details in self.db_schema.items():
+            if col not in chunk.columns:
+                continue
+            column_data = chunk[col]
+
+            # 1. Null counts (only enforced for non-nullable columns)
+            if not details.get('nullable', True):
+                null_mask = column_data.isnull()
+                null_count = int(null_mask.sum())
+                if null_count:
+                    self.null_counts[col] = self.null_counts.get(col, 0) + null_count
+                    samples = self.null_samples.setdefault(col, [])
+                    if len(samples) < MAX_SAMPLES:
+                        samples.extend(chunk.index[null_mask][:MAX_SAMPLES - len(samples)].tolist())
+
+            # 2. Running numeric stats
+            numeric_col = pd.to_numeric(column_data, errors='coerce').dropna()
+            if not numeric_col.empty:
+                col_stats = self.stats.setdefault(col, {"count": 0, "sum": 0.0, "min": None, "max": None})
+                col_stats["count"] += int(numeric_col.size)
+                col_stats["sum"] += float(numeric_col.sum())
+                chunk_min, chunk_max = float(numeric_col.min()), float(numeric_col.max())
+                col_stats["min"] = chunk_min if col_stats["min"] is None else min(col_stats["min"], chunk_min)
+                col_stats["max"] = chunk_max if col_stats["max"] is None else max(col_stats["max"], chunk_max)
+
+            # 3. CHECK constraints (row-local, so per-chunk results simply add up)
+            for violation in tools.find_check_constraint_violations(column_data, col, self.check_constraints):
+                key = f"{col}|{violation['sqltext']}"
+                merged = self.check_violations.setdefault(key, {**violation, "count": 0, "affected_rows_sample_indices": [], "sample_violating_values": []})
+                merged["count"] += violation["count"]
+                merged["details"] = f"{merged['count']} values violate CHECK constraint '{violation['sqltext']}'."
+                room = MAX_SAMPLES - len(merged["affected_rows_sample_indices"])
+                if room > 0:
+                    merged["affected_rows_sample_indices"].extend(violation["affected_rows_sample_indices"][:room])
+                    merged["sample_violating_values"].extend(violation["sample_violating_values"][:room])
+
+        # 4. Primary key / UNIQUE key tuple counts (across all chunks seen so far)
+        for key_constraint in self.key_constraints:
+            if all(col in chunk.columns for col in key_constraint["columns"]):
+                self._update_keys(chunk, key_constraint)
+
+        self.rows += len(chunk)
+
+    def merge_chunk_results(self, rows: int, type_violations: List[Dict[str, Any]], dq_violations: List[Dict[str, Any]]) -> None:
+        """Merges the type and (row-local) data quality violations found in one chunk of 'rows' rows."""
+        tools.merge_type_violations(self.type_violations, type_violations, rows)
+        tools.merge_violations(self.chunk_violations, dq_violations)
+
+    def _update_keys(self, chunk: pd.DataFrame, key_constraint: Dict[str, Any]) -> None:
+        key_columns = key_constraint["columns"]
+        keys = chunk[key_columns].dropna() # Rows with a NULL in any key column are ignored, as in SQL
+        if keys.empty:
+            return
+        hashes = tools.hash_key_columns(keys, key_columns, as_text=True).to_numpy()
+        # Keys that now occur more than once (within the chunk, or against earlier chunks unless spilled)
+        dup_hashes = self.key_counters[key_constraint["name"]].add(hashes)
+        samples = self.duplicate_samples[key_constraint["name"]]
+        if len(samples) < MAX_SAMPLES and len(dup_hashes):
+            sample_rows = keys[np.isin(hashes, dup_hashes)].drop_duplicates()
+            for row in sample_rows.astype(str).itertuples(index=False):
+                value = "|".join(row)
+                if value not in samples:
+                    samples.append(value)
+                if len(samples) >= MAX_SAMPLES:
+                    break
+
+    # --- Reporting ---
+    def to_violations(self) -> List[Dict[str, Any]]:
+        """Builds violation dicts in the same format as tools.run_data_quality_checks."""
+        dq_violations = []
+        for col, null_count in self.null_counts.items():
+            dq_violations.append({
+                "column": col,
+                "check": "not_null_violation",
+                "check_id": violation_matrix.make_check_id("not_null_violation", col),
+                "count": null_count,
+                "affected_rows_sample_indices": self.null_samples.get(col, []),
+                "severity": "high",
+                "details": f"Column is non-nullable but contains {null_count} nulls (or empty strings treated as nulls)."
+            })
+
+        for key_constraint in self.key_constraints:
+            distinct_keys_duplicated, duplicate_record_count = self.key_counters[key_constraint["name"]].duplicate_summary()
+            if distinct_keys_duplicated == 0:
+                continue
+            is_primary_key = key_constraint["type"] == "primary_key"
+            check = "primary_key_violation" if is_primary_key else "unique_constraint_violation"
+            key_label = "Primary key" if is_primary_key else f"UNIQUE constraint '{key_constraint['name']}'"
+            column = ", ".join(key_constraint["columns"])
+            dq_violations.append({
+                "column": column,
+                "columns": key_constraint["columns"],
+                "check": check,
+                "check_id": violation_matrix.make_check_id(check, column, key_constraint["name"]),
+                "constraint_name": key_constraint["name"],
+                "distinct_keys_duplicated": distinct_keys_duplicated,
+                "total_duplicate_records": duplicate_record_count,
+                "sample_duplicate_values": self.duplicate_samples[key_constraint["name"]][:MAX_SAMPLES],
+                "severity": "high",
+                "details": f"{key_label} contains duplicates for {distinct_keys_duplicated} unique key(s), affecting {duplicate_record_count} records total."
+            })
+
+        dq_violations.extend(self.check_violations.values())
+        dq_violations.extend(self.chunk_violations.values())
+        return dq_violations
+
+    def key_arrays(self) -> Optional[Dict[str, Tuple[np.ndarray, np.ndarray]]]:
+        """(hashes, counts) per key constraint for saving, or None once a key set has spilled to disk."""
+        arrays = {name: counter.to_arrays() for name, counter in self.key_counters.items()}
+        return None if any(a is None for a in arrays.values()) else arrays
+
+    def restore_keys(self, arrays: Dict[str, Tuple[np.ndarray, np.ndarray]]) -> None:
+        for name, (hashes, counts) in arrays.items():
+            if name in self.key_counters:
+                self.key_counters[name].load_arrays(hashes, counts)
+
+    def close(self) -> None:
+        """Removes the spill files of the key counters."""
+        for counter in self.key_counters.values():
+            counter.close()
+
+    def column_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Returns count/min/max/mean per numeric column."""
+        return {
+            col: {**s, "mean": s["sum"] / s["count"] if s["count"] else None}
+            for col, s in self.stats.items()
+        }
+
+    # --- Persistence ---
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "null_counts": self.null_counts,
+            "null_samples": self.null_samples,
+            "stats": self.stats,
+            "check_violations": self.check_violations,
+            "duplicate_samples": self.duplicate_samples,
+            "type_violations": self.type_violations,
+            "chunk_violations": list(self.chunk_violations.values()),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], db_schema: Dict[str, Any], check_constraints: Optional[List[Dict[str, Any]]] = None, memory_budget_bytes: Optional[int] = None) -> "ValidationState":
+        state = cls(db_schema, check_constraints, memory_budget_bytes)
+        state.rows = data.get("rows", 0)
+        state.null_counts = data.get("null_counts", {})
+        state.null_samples = data.get("null_samples", {})
+        state.stats = data.get("stats", {})
+        state.check_violations = data.get("check_violations", {})
+        state.duplicate_samples.update(data.get("duplicate_samples", {}))
+        state.type_violations = data.get("type_violations", {})
+        tools.merge_violations(state.chunk_violations, data.get("chunk_violations", []))
+        return state
+
+
+def _state_paths(file_path: str, table_name: str, state_dir: str) -> (str, str):
+    base = os.path.join(state_dir, f"{_safe_name(os.path.abspath(file_path))}__{_safe_name(table_name)}")
+    return base + ".json", base + "_keys.npz"
+
+
+def _config_hash(db_schema: Dict[str, Any], column_mapping: Dict[str, str], check_constraints: List[Dict[str, Any]]) -> str:
+    payload = json.dumps([db_schema, column_mapping, check_constraints], sort_keys=True, default=str)
+    return _hash_bytes(payload.encode("utf-8"))
+
+
+def _load_state(json_path: str, keys_path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(json_path):
+        return None
+    try:
+        with open(json_path, 'r') as f:
+            saved = json.load(f)
+        if os.path.exists(keys_path):
+            # Arrays are stored as hashes_<i> / counts_<i>, i = position of the constraint in 'key_names'
+            with np.load(keys_path) as keys:
+                saved["key_arrays"] = {name: (keys[f"hashes_{i}"], keys[f"counts_{i}"]) for i, name in enumerate(saved.get("key_names", []))}
+        return saved
+    except Exception as e:
+        logging.warning(f"Could not load incremental state '{json_path}': {e}. Re-validating from row 0.")
+        return None
+
+
+def _save_state(json_path: str, keys_path: str, saved: Dict[str, Any], state: ValidationState) -> None:
+    os.makedirs(os.path.dirname(json_path) or ".", exist_ok=True)
+    key_arrays = state.key_arrays()
+    saved["keys_complete"] = key_arrays is not None
+    if key_arrays is not None:
+        saved["key_names"] = list(key_arrays)
+        np.savez(keys_path, **{f"{part}_{i}": array for i, pair in enumerate(key_arrays.values()) for part, array in zip(("hashes", "counts"), pair)})
+    else:
+        # Spilled key sets are not persisted; the next run re-validates from row 0
+        logging.info(f"Key sets of '{json_path}' exceeded the memory budget and are not saved.")
+        if os.path.exists(keys_path):
+            os.remove(keys_path)
+    tmp_path = json_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(saved, f, indent=2, default=str)
+    os.replace(tmp_path, json_path)
+
+
+def _verify_prefix(f, header: bytes, saved: Dict[str, Any], file_size: int) -> bool:
+    """Re-hashes the stored chunks. True if the file still starts with exactly those bytes."""
+    if saved.get("header_hash") != _hash_bytes(header):
+        return False
+    chunks = saved.get("chunks", [])
+    if chunks and chunks[-1]["end"] > file_size:
+        return False # File was truncated or rotated
+    for chunk in chunks:
+        f.seek(chunk["start"])
+        if _hash_bytes(f.read(chunk["end"] - chunk["start"])) != chunk["hash"]:
+            return False
+    return True
+
+
+def _parse_chunk(header: bytes, body: bytes, row_offset: int, column_mapping: Dict[str, str]) -> pd.DataFrame:
+    # Types are inferred per chunk, as for a full read; key hashes use the text form of the
+    # keys (tools.hash_key_columns as_text), so they match across chunks of different dtypes
+    chunk = pd.read_csv(io.BytesIO(header + body))
+    chunk.index = pd.RangeIndex(row_offset, row_offset + len(chunk))
+    if column_mapping:
+        chunk = chunk.rename(columns=column_mapping)
+    return chunk
+
+
+def _iter_blocks(f, position: int, chunk_bytes: int, end: Optional[int] = None) -> Iterator[Tuple[int, bytes, bool]]:
+    """
+    Yields (start, body, complete) byte blocks of the open file from 'position' on (up to 'end').
+
+    Complete blocks end on a newline. A trailing line without newline comes last with
+    complete=False: it may still be in the middle of being written.
+    """
+    f.seek(position)
+    leftover = b""
+    while True:
+        block = f.read(chunk_bytes if end is None else min(chunk_bytes, end - position - len(leftover)))
+        if not block:
+            break
+        block = leftover + block
+        cut = block.rfind(b"\n") + 1
+        body, leftover = block[:cut], block[cut:]
+        if body:
+            yield position, body, True
+            position += len(body)
+    if leftover.strip():
+        yield position, leftover, False
+
+
+def read_head(file_path: str, rows: int = SCHEMA_SAMPLE_ROWS) -> pd.DataFrame:
+    """The first rows of a CSV: the file schema of an incremental run is extracted from them."""
+    return pd.read_csv(file_path, nrows=rows)
+
+
+def iter_csv_tail(
+    file_path: str,
+    start: int,
+    row_offset: int,
+    end: Optional[int] = None,
+    column_mapping: Optional[Dict[str, str]] = None,
+    chunk_bytes: int = CHUNK_BYTES
+) -> Iterator[pd.DataFrame]:
+    """
+    Yields the rows of the CSV from byte 'start' (a line start, e.g. 'tail_start' of a
+    validate_appended_csv() result) up to 'end' (default: the end of the file) as DataFrames.
+
+    row_offset is the row number of the first of them; chunks carry a global row index.
+    """
+    with open(file_path, 'rb') as f:
+        header = f.readline()
+        for _, body, _ in _iter_blocks(f, start, chunk_bytes, end):
+            chunk = _parse_chunk(header, body, row_offset, column_mapping or {})
+            row_offset += len(chunk)
+            yield chunk
+
+
+def _check_chunk(state: ValidationState, chunk: pd.DataFrame, engine: Optional[sqlalchemy.engine.Engine], table_name: str, feed: Optional[str], date_feed: Optional[str]) -> None:
+    state.update(chunk)
+    chunk_violations = tools.validate_dates(chunk, state.db_schema, feed=date_feed)
+    if engine is not None:
+        chunk_violations.extend(tools.check_foreign_keys(chunk, engine, table_name))
+    if feed:
+        chunk_violations.extend(tools.check_cross_batch_duplicates(chunk, state.db_schema, feed, table_name))
+    state.merge_chunk_results(len(chunk), tools.validate_data_types(chunk, state.db_schema), chunk_violations)
+
+
+def validate_appended_csv(
+    file_path: str,
+    db_schema: Dict[str, Any],
+    table_name: str,
+    engine: Optional[sqlalchemy.engine.Engine] = None,
+    column_mapping: Optional[Dict[str, str]] = None,
+    feed: Optional[str] = None,
+    date_feed: Optional[str] = None,
+    chunk_bytes: int = CHUNK_BYTES,
+    state_dir: str = VALIDATION_STATE_DIR,
+    memory_budget_bytes: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Runs the type, data quality, date and foreign key checks on an append-only CSV, re-using the saved state of previous runs.
+
+    Unchanged prefix chunks are verified by hash and skipped; only the new tail is parsed,
+    validated and merged into the stored state. If the prefix changed (or the schema/mapping
+    changed), the whole file is re-validated from row 0. CHECK constraints and foreign keys
+    are read from 'engine' (skipped without one). If a feed name is given, the primary
+    keys of the new rows are also checked against the keys accepted from earlier files of that
+    feed. Date formats are cached under date_feed (see tools.validate_dates).
+    Returns a summary dict with 'type_violations' and 'dq_violations' in the usual formats, and
+    the byte range of the new rows ('tail_start' / 'tail_end', see iter_csv_tail).
+    """
+    column_mapping = column_mapping or {}
+    check_constraints = []
+    if engine is not None:
+        try:
+            check_constraints = inspect(engine).get_check_constraints(table_name)
+        except Exception as e:
+            logging.warning(f"Could not fetch CHECK constraints for table '{table_name}': {e}. Skipping CHECK constraint validation.")
+
+    json_path, keys_path = _state_paths(file_path, table_name, state_dir)
+    config_hash = _config_hash(db_schema, column_mapping, check_constraints)
+    saved = _load_state(json_path, keys_path)
+
+    file_size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        header = f.readline()
+
+        # --- 1. Decide how much of the previous state can be re-used ---
+        state = ValidationState(db_schema, check_constraints, memory_budget_bytes)
+        chunks: List[Dict[str, Any]] = []
+        full_revalidation = True
+        if saved and saved.get("version") == STATE_VERSION and saved.get("config_hash") == config_hash and saved.get("keys_complete", True):
+            if _verify_prefix(f, header, saved, file_size):
+                state = ValidationState.from_dict(saved["state"], db_schema, check_constraints, memory_budget_bytes)
+                state.restore_keys(saved.get("key_arrays", {}))
+                chunks = saved.get("chunks", [])
+                full_revalidation = False
+            else:
+                logging.info(f"Prefix of '{file_path}' changed since the last run. Re-validating from row 0.")
+        chunks_reused = len(chunks)
+        rows_reused = state.rows
+
+        # --- 2. Validate the new tail chunk by chunk ---
+        tail_start = chunks[-1]["end"] if chunks else len(header)
+        leftover = b""
+        for position, body, complete in _iter_blocks(f, tail_start, chunk_bytes):
+            if not complete:
+                leftover = body
+                break
+            chunk_df = _parse_chunk(header, body, state.rows, column_mapping)
+            _check_chunk(state, chunk_df, engine, table_name, feed, date_feed)
+            chunks.append({"start": position, "end": position + len(body), "rows": len(chunk_df), "hash": _hash_bytes(body)})
+
+    # --- 3. Persist everything that ends on a complete line ---
+    saved = {
+        "version": STATE_VERSION,
+        "file_name": file_path,
+        "table_name": table_name,
+        "config_hash": config_hash,
+        "header_hash": _hash_bytes(header),
+        "chunks": chunks,
+        "state": state.to_dict(),
+    }
+    _save_state(json_path, keys_path, saved, state)
+
+    # A trailing line without newline may still be in the middle of being written:
+    # report it, but keep it out of the persisted state (already saved above) so it is re-read next time.
+    if leftover:
+        _check_chunk(state, _parse_chunk(header, leftover, state.rows, column_mapping), engine, table_name, feed, date_feed)
+
+    rows_validated = state.rows - rows_reused
+    logging.info(f"Incremental validation of '{file_path}': re-used {chunks_reused} chunk(s) / {rows_reused} rows, validated {rows_validated} new rows.")
+    dq_violations = state.to_violations()
+    state.close()
+    return {
+        "file_name": file_path,
+        "total_rows": state.rows,
+        "rows_reused": rows_reused,
+        "rows_validated": rows_validated,
+        "chunks_reused": chunks_reused,
+        "chunks_validated": len(chunks) - chunks_reused,
+        "full_revalidation": full_revalidation,
+        "tail_start": tail_start,
+        "tail_end": chunks[-1]["end"] if chunks else tail_start,
+        "column_stats": state.column_stats(),
+        "type_violations": tools.finalize_type_violations(state.type_violations),
+        "dq_violations": dq_violations,
+    }
+
+
+def record_accepted_keys(file_path: str, db_schema: Dict[str, Any], feed: str, table_name: str, result: Dict[str, Any], column_mapping: Optional[Dict[str, str]] = None) -> int:
+    """
+    Adds the primary keys of the rows validated by validate_appended_csv() ('result') to the feed's key index.
+
+    The rows of earlier runs were recorded by those runs; an unterminated last line is left
+    for the run that sees it complete.
+    """
+    tail = iter_csv_tail(file_path, result["tail_start"], result["rows_reused"], result["tail_end"], column_mapping)
+    return sum(tools.record_accepted_keys(chunk, db_schema, feed, table_name) for chunk in tail)
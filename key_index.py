@@ -0,0 +1,150 @@
+import os
+import sqlite3
+import logging
+import contextlib
+import numpy as np
+from typing import Iterable, Iterator
+
+# --- Persistent key index for recurring feeds ---
+# One SQLite file per (feed, table) holds the 64-bit hash of every key accepted so far.
+# A Bloom filter (memory-mapped bit array next to the SQLite file) sits in front of it,
+# so most new keys are answered without touching SQLite; only Bloom "maybe" hits are
+# resolved with one bulk temp-table join. Memory use is the Bloom size plus one batch.
+# Batch and watch workers may share an index: every Bloom write (adds and rebuilds) runs
+# inside a SQLite write transaction, whose lock serializes the writers across processes.
+
+KEY_INDEX_DIR = "key_index"
+BLOOM_BITS = 2 ** 27  # 16 MiB on disk, ~1% false positives at ~14M keys with 4 hashes
+BLOOM_HASHES = 4
+LOOKUP_BATCH_SIZE = 500_000
+WRITE_LOCK_TIMEOUT_SECONDS = 300  # How long a writer waits for another process to finish its batch
+
+
+def _safe_name(name: str) -> str:
+    return "".join(c if c.isalnum() else "_" for c in name)
+
+
+def _to_sqlite_ints(hashes: np.ndarray) -> np.ndarray:
+    # SQLite integers are signed 64-bit; reinterpret the uint64 hashes bit-for-bit
+    return np.ascontiguousarray(hashes, dtype=np.uint64).view(np.int64)
+
+
+class KeyIndex:
+    """
+    On-disk set of previously accepted key hashes for one (feed, table).
+
+    Keys are passed in as uint64 hashes (see tools.hash_key_columns), so composite
+    keys and any key dtype are handled the same way.
+    """
+
+    def __init__(self, feed: str, table_name: str, index_dir: str = KEY_INDEX_DIR,
+                 bloom_bits: int = BLOOM_BITS, bloom_hashes: int = BLOOM_HASHES):
+        os.makedirs(index_dir, exist_ok=True)
+        base = os.path.join(index_dir, f"{_safe_name(feed)}__{_safe_name(table_name)}")
+        self.db_path = base + ".db"
+        self.bloom_path = base + ".bloom"
+        self.bloom_bits = bloom_bits
+        self.bloom_hashes = bloom_hashes
+
+        self.conn = sqlite3.connect(self.db_path, timeout=WRITE_LOCK_TIMEOUT_SECONDS)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS accepted_keys (key_hash INTEGER PRIMARY KEY)")
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS candidate_keys (key_hash INTEGER PRIMARY KEY)")
+
+        with self._write_transaction():
+            # Under the lock, so a concurrent rebuild cannot truncate or zero bits another writer just set
+            rebuild = not os.path.exists(self.bloom_path) or os.path.getsize(self.bloom_path) != bloom_bits // 8
+            self.bloom = np.memmap(self.bloom_path, dtype=np.uint8, mode='w+' if rebuild else 'r+', shape=(bloom_bits // 8,))
+            if rebuild:
+                self._rebuild_bloom()
+
+    @contextlib.contextmanager
+    def _write_transaction(self) -> Iterator[None]:
+        """
+        Holds the SQLite write lock (BEGIN IMMEDIATE) for the whole block.
+        np.bitwise_or.at on the shared memmap is a read-modify-write, so Bloom writes must only happen in here.
+        """
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            yield
+            self.bloom.flush()
+
+    # --- Bloom filter ---
+    def _bloom_positions(self, hashes: np.ndarray) -> np.ndarray:
+        """Double hashing: position_i = h1 + i * h2 (mod m). Shape (k, n)."""
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(self.bloom_hashes, dtype=np.uint64)[:, None]
+        return (h1[None, :] + steps * h2[None, :]) % np.uint64(self.bloom_bits)
+
+    def _bloom_add(self, hashes: np.ndarray) -> None:
+        positions = self._bloom_positions(hashes).ravel()
+        np.bitwise_or.at(self.bloom, positions >> np.uint64(3), (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)))
+
+    def _bloom_maybe_contains(self, hashes: np.ndarray) -> np.ndarray:
+        positions = self._bloom_positions(hashes)
+        bits = (self.bloom[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return bits.all(axis=0)
+
+    def _rebuild_bloom(self) -> None:
+        """Rebuilds the Bloom filter from SQLite. Call inside _write_transaction."""
+        self.bloom[:] = 0
+        cursor = self.conn.execute("SELECT key_hash FROM accepted_keys")
+        while True:
+            rows = cursor.fetchmany(LOOKUP_BATCH_SIZE)
+            if not rows:
+                break
+            self._bloom_add(np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows)).view(np.uint64))
+        logging.info(f"Rebuilt Bloom filter for key index '{self.db_path}'.")
+
+    # --- Public API ---
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        Returns a boolean mask: True where the key hash was accepted in an earlier batch.
+        Exact (Bloom hits are confirmed against SQLite).
+        """
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        found = np.zeros(len(hashes), dtype=bool)
+        for start in range(0, len(hashes), LOOKUP_BATCH_SIZE):
+            batch = hashes[start:start + LOOKUP_BATCH_SIZE]
+            maybe = self._bloom_maybe_contains(batch)
+            if not maybe.any():
+                continue
+            candidates = np.unique(batch[maybe])
+            with self.conn: # Commit right away; an open read snapshot would make a later add() fail with SQLITE_BUSY
+                self.conn.execute("DELETE FROM candidate_keys")
+                self.conn.executemany("INSERT INTO candidate_keys (key_hash) VALUES (?)",
+                                      ((int(v),) for v in _to_sqlite_ints(candidates)))
+                rows = self.conn.execute(
+                    "SELECT c.key_hash FROM candidate_keys c JOIN accepted_keys a ON a.key_hash = c.key_hash"
+                ).fetchall()
+            if rows:
+                confirmed = np.array([r[0] for r in rows], dtype=np.int64).view(np.uint64)
+                found[start:start + len(batch)] = np.isin(batch, confirmed)
+        return found
+
+    def add(self, hashes: Iterable[int]) -> int:
+        """Records key hashes as accepted. Returns the number of keys that were new."""
+        hashes = np.unique(np.asarray(hashes, dtype=np.uint64))
+        before = self.conn.total_changes
+        with self._write_transaction():
+            for start in range(0, len(hashes), LOOKUP_BATCH_SIZE):
+                batch = hashes[start:start + LOOKUP_BATCH_SIZE]
+                self.conn.executemany("INSERT OR IGNORE INTO accepted_keys (key_hash) VALUES (?)",
+                                      ((int(v),) for v in _to_sqlite_ints(batch)))
+                self._bloom_add(batch)
+        return self.conn.total_changes - before
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM accepted_keys").fetchone()[0]
+
+    def close(self) -> None:
+        self.bloom.flush()
+        self.conn.close()
+
+    def __enter__(self) -> "KeyIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
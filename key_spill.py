@@ -0,0 +1,228 @@
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import weakref
+import numpy as np
+from typing import Optional, Tuple, List
+import config
+
+# --- Memory-budgeted key counting ---
+# Duplicate detection needs a count per distinct key, i.e. memory proportional to the row
+# count. KeyCounter keeps the key hashes and counts as sorted arrays in memory while they
+# fit in the memory budget. Every batch becomes a sorted run and runs are merged like a
+# binary counter (a run is merged into the one before it once it is at least half as
+# large), so there are O(log n) runs to search and every key is merged O(log n) times.
+# Past the budget it switches to spill mode: every batch is aggregated, hash-partitioned
+# on the top bits of the key and appended to one spill file per partition. At the end
+# each partition is loaded on its own (re-partitioned on the next bits if it is still too
+# large) and reduced exactly. Peak memory stays around the budget plus one batch, and the
+# result is the same as in memory.
+
+SPILL_PARTITION_BITS = 8 # 256 spill files
+RECORD_DTYPE = np.dtype([('key', '<u8'), ('count', '<i8')])
+SPILL_WRITE_RECORDS = 1_000_000 # Records are written in slices, so spilling needs little extra memory
+MEMORY_BUDGET_BYTES = config.MEMORY_BUDGET_MB * 1024 * 1024
+
+
+def _reduce(keys: np.ndarray, counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Sums counts per distinct key. Returns sorted unique keys and their counts."""
+    uniq, inverse = np.unique(keys, return_inverse=True)
+    return uniq, np.bincount(inverse, weights=counts, minlength=len(uniq)).astype(np.int64)
+
+
+def _merge_runs(first: Tuple[np.ndarray, np.ndarray], second: Tuple[np.ndarray, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Merges two sorted runs of unique keys, summing the counts of keys found in both."""
+    keys = np.concatenate([first[0], second[0]])
+    order = np.argsort(keys, kind='stable') # Timsort: linear on two presorted runs
+    keys = keys[order]
+    counts = np.concatenate([first[1], second[1]])[order]
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]])) if len(keys) else np.empty(0, dtype=np.int64)
+    return keys[starts], np.add.reduceat(counts, starts) if len(keys) else counts
+
+
+def _contains(sorted_keys: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    pos = np.searchsorted(sorted_keys, keys)
+    found = pos < len(sorted_keys)
+    found[found] = sorted_keys[pos[found]] == keys[found]
+    return found
+
+
+class KeyCounter:
+    """
+    Exact multiset of uint64 key hashes (see tools.hash_key_columns) with a memory budget.
+
+    add() batches of hashes, then duplicate_summary() for the number of keys seen more
+    than once and the records involved.
+    """
+
+    def __init__(self, memory_budget_bytes: Optional[int] = None, spill_dir: Optional[str] = None):
+        self.memory_budget_bytes = memory_budget_bytes or MEMORY_BUDGET_BYTES
+        self.spill_dir = spill_dir
+        self._runs: List[Tuple[np.ndarray, np.ndarray]] = [] # Sorted (hashes, counts) runs, largest first
+        self._run_bytes = 0
+        self.spilled = False
+        self.spilled_records = 0
+        self._spill_path: Optional[str] = None
+        self._spill_files = []
+
+    # --- Accumulation ---
+    def add(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        Counts a batch of key hashes.
+
+        Returns the distinct hashes of the batch that are known to be duplicated now (within the
+        batch, or against earlier batches while in memory), for collecting sample values.
+        """
+        uniq, counts = np.unique(np.asarray(hashes, dtype=np.uint64), return_counts=True)
+        if self.spilled:
+            self._write_spill(uniq, counts)
+            return uniq[counts > 1]
+
+        found = np.zeros(len(uniq), dtype=bool)
+        for run_hashes, _ in self._runs:
+            found |= _contains(run_hashes, uniq)
+        now_duplicated = (counts > 1) | found
+
+        self._runs.append((uniq, counts))
+        while len(self._runs) > 1 and 2 * len(self._runs[-1][0]) >= len(self._runs[-2][0]):
+            second, first = self._runs.pop(), self._runs.pop()
+            self._runs.append(_merge_runs(first, second))
+        self._run_bytes = sum(h.nbytes + c.nbytes for h, c in self._runs)
+
+        # A merge needs the runs, their concatenation and the sort order at the same time; keep room for it
+        if 3 * self._run_bytes > self.memory_budget_bytes:
+            self._start_spilling()
+        return uniq[now_duplicated]
+
+    def _compact(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Merges all runs into one and returns it (sorted unique hashes and their counts)."""
+        while len(self._runs) > 1:
+            second, first = self._runs.pop(), self._runs.pop()
+            self._runs.append(_merge_runs(first, second))
+        if not self._runs:
+            return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+        return self._runs[0]
+
+    def _start_spilling(self) -> None:
+        self._spill_path = tempfile.mkdtemp(prefix="key_spill_", dir=self.spill_dir)
+        weakref.finalize(self, shutil.rmtree, self._spill_path, True)
+        self._spill_files = [open(os.path.join(self._spill_path, f"part_{i:03d}.bin"), 'wb')
+                             for i in range(1 << SPILL_PARTITION_BITS)]
+        logging.info(f"Key set exceeded the memory budget of {self.memory_budget_bytes} bytes "
+                     f"({sum(len(h) for h, _ in self._runs)} key records). Spilling to '{self._spill_path}'.")
+        self.spilled = True
+        runs, self._runs, self._run_bytes = self._runs, [], 0
+        for hashes, counts in runs:
+            self._write_spill(hashes, counts)
+
+    def _write_spill(self, hashes: np.ndarray, counts: np.ndarray) -> None:
+        # hashes are sorted, so the top bits (the partition) are sorted too: one slice per file
+        partition_starts = np.arange((1 << SPILL_PARTITION_BITS) + 1, dtype=np.uint64) << np.uint64(64 - SPILL_PARTITION_BITS)
+        bounds = np.searchsorted(hashes, partition_starts[:-1]).tolist() + [len(hashes)]
+        for partition, spill_file in enumerate(self._spill_files):
+            for start in range(bounds[partition], bounds[partition + 1], SPILL_WRITE_RECORDS):
+                end = min(start + SPILL_WRITE_RECORDS, bounds[partition + 1])
+                records = np.empty(end - start, dtype=RECORD_DTYPE)
+                records['key'], records['count'] = hashes[start:end], counts[start:end]
+                spill_file.write(records.tobytes())
+        self.spilled_records += len(hashes)
+
+    # --- Reduction ---
+    def _reduce_partition(self, path: str, shift: int) -> Tuple[int, int]:
+        """Exact (distinct keys duplicated, duplicate records) of one spill file."""
+        size = os.path.getsize(path)
+        if size == 0:
+            return 0, 0
+        if 3 * size > self.memory_budget_bytes and shift > 0:
+            # Still too large: split on the next partition bits and reduce the parts one by one
+            shift = max(shift - SPILL_PARTITION_BITS, 0)
+            part_paths = [f"{path}.{i:03d}" for i in range(1 << SPILL_PARTITION_BITS)]
+            part_files = [open(p, 'wb') for p in part_paths]
+            try:
+                records = np.memmap(path, dtype=RECORD_DTYPE, mode='r')
+                step = max(1, self.memory_budget_bytes // (4 * RECORD_DTYPE.itemsize))
+                for start in range(0, len(records), step):
+                    batch = np.array(records[start:start + step])
+                    sub_partitions = ((batch['key'] >> np.uint64(shift)) & np.uint64((1 << SPILL_PARTITION_BITS) - 1)).astype(np.int64)
+                    order = np.argsort(sub_partitions, kind='stable')
+                    batch, sub_partitions = batch[order], sub_partitions[order]
+                    bounds = np.searchsorted(sub_partitions, np.arange((1 << SPILL_PARTITION_BITS) + 1))
+                    for i, part_file in enumerate(part_files):
+                        if bounds[i + 1] > bounds[i]:
+                            part_file.write(batch[bounds[i]:bounds[i + 1]].tobytes())
+                del records
+            finally:
+                for part_file in part_files:
+                    part_file.close()
+            totals = [self._reduce_partition(p, shift) for p in part_paths]
+            for p in part_paths:
+                os.remove(p)
+            return sum(t[0] for t in totals), sum(t[1] for t in totals)
+
+        records = np.fromfile(path, dtype=RECORD_DTYPE)
+        _, counts = _reduce(records['key'], records['count'])
+        duplicated = counts > 1
+        return int(duplicated.sum()), int(counts[duplicated].sum())
+
+    def duplicate_summary(self) -> Tuple[int, int]:
+        """Returns (distinct keys seen more than once, total records carrying those keys). Exact."""
+        if not self.spilled:
+            _, counts = self._compact()
+            duplicated = counts > 1
+            return int(duplicated.sum()), int(counts[duplicated].sum())
+        distinct, records = 0, 0
+        for spill_file in self._spill_files:
+            spill_file.flush()
+            part_distinct, part_records = self._reduce_partition(spill_file.name, 64 - SPILL_PARTITION_BITS)
+            distinct += part_distinct
+            records += part_records
+        return distinct, records
+
+    # --- Persistence ---
+    def to_arrays(self) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """(hashes, counts) for saving, or None once the key set has spilled to disk."""
+        return None if self.spilled else self._compact()
+
+    def load_arrays(self, hashes: np.ndarray, counts: np.ndarray) -> None:
+        """Restores a saved to_arrays() result into an empty counter."""
+        self._runs = [(np.asarray(hashes, dtype=np.uint64), np.asarray(counts, dtype=np.int64))] if len(hashes) else []
+        self._run_bytes = sum(h.nbytes + c.nbytes for h, c in self._runs)
+
+    def close(self) -> None:
+        for spill_file in self._spill_files:
+            spill_file.close()
+        self._spill_files = []
+        if self._spill_path:
+            shutil.rmtree(self._spill_path, ignore_errors=True)
+            self._spill_path = None
+
+
+# --- Benchmark: python key_spill.py [n_keys] [budget_mb] ---
+if __name__ == "__main__":
+    import resource
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    n_keys = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000_000
+    budget_mb = int(sys.argv[2]) if len(sys.argv) > 2 else 1024
+    batch_size = 5_000_000
+    duplicate_every = 1000 # Every 1000th row repeats the key of the row before it (within its batch)
+
+    rng = np.random.default_rng(42)
+    counter = KeyCounter(memory_budget_bytes=budget_mb * 1024 * 1024)
+    started = time.perf_counter()
+    for start in range(0, n_keys, batch_size):
+        keys = rng.integers(np.iinfo(np.uint64).max, size=min(batch_size, n_keys - start), dtype=np.uint64)
+        repeat = np.arange(start + 1, start + len(keys)) % duplicate_every == 0
+        keys[1:][repeat] = keys[:-1][repeat]
+        counter.add(keys)
+    distinct, records = counter.duplicate_summary()
+    elapsed = time.perf_counter() - started
+    counter.close()
+
+    expected = (n_keys - 1) // duplicate_every - (n_keys - 1) // batch_size
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"keys={n_keys} budget={budget_mb}MB spilled={counter.spilled} time={elapsed:.1f}s peak_rss={peak_rss_mb:.0f}MB")
+    print(f"duplicated keys={distinct} (expected {expected}), duplicate records={records} (expected {2 * expected})")
+    assert distinct == expected and records == 2 * expected, "Duplicate counts do not match"
@@ -0,0 +1,285 @@
+import re
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+import httpx
+import openai
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Iterator, Optional
+import table_matcher
+
+# --- Offline stand-in for the Azure OpenAI client ---
+# StubOpenAIClient has the part of the openai client interface the pipeline uses
+# (client.chat.completions.create(stream=True, messages=...)) and answers each of the three
+# prompt types in prompts.py with a deterministic response in the requested JSON format:
+# schema analysis maps file columns to DB columns by normalized name, dynamic rules are
+# empty and the final report echoes the file metadata. Swap it in with
+# main.client = llm_stub.StubOpenAIClient() (or install()) to run the pipeline without an endpoint.
+# For load tests and benchmarks the stub can simulate the endpoint: a time to first token,
+# a streaming token rate, and a seeded fraction of failed (500) and rate-limited (429) calls,
+# raised as the same openai exceptions the real client raises. `python llm_stub.py` serves
+# the same responses as an OpenAI / Azure OpenAI compatible HTTP endpoint, so the unmodified
+# client (or another process) can be pointed at it with AZURE_ENDPOINT=http://127.0.0.1:<port>.
+
+CHARS_PER_TOKEN = 4 # Rough token size of English/JSON text; used for simulated token counts
+STREAM_CHUNK_TOKENS = 8
+
+
+def _json_after(prompt: str, heading: str) -> Any:
+    """Parses the JSON block that follows a '**heading**' line of a prompt."""
+    start = prompt.find(heading)
+    if start < 0:
+        return {}
+    try:
+        return json.JSONDecoder().raw_decode(prompt[prompt.index("\n", start):].lstrip())[0]
+    except ValueError:
+        return {}
+
+
+def _filled_in(prompt: str, label: str) -> Optional[str]:
+    """Value of the last '**label**: value' line; the instructions mention the same labels mid-line."""
+    values = re.findall(rf"^\*\*{re.escape(label)}\*\*: (.*?)\s*$", prompt, re.MULTILINE)
+    return values[-1] if values else None
+
+
+def _schema_analysis(prompt: str) -> Dict[str, Any]:
+    db_schema = _json_after(prompt, "**Database Schema (Target):**")
+    file_columns = _json_after(prompt, "**File Schema (Source):**")
+    db_by_name = {table_matcher.normalize_column_name(col): col for col in db_schema}
+    naming_mismatches = {}
+    for col in file_columns:
+        db_col = db_by_name.get(table_matcher.normalize_column_name(col))
+        if db_col is not None and db_col != col:
+            naming_mismatches[col] = db_col
+    mapped = {naming_mismatches.get(col, col) for col in file_columns}
+    missing = [col for col in db_schema if col not in mapped]
+    extra = [col for col in file_columns if naming_mismatches.get(col, col) not in db_schema]
+    return {
+        "target_table": _filled_in(prompt, "Target Table"),
+        "source_file": _filled_in(prompt, "Source File"),
+        "columns_missing_from_file": missing,
+        "columns_extra_in_file": extra,
+        "naming_mismatches": naming_mismatches,
+        "analysis": {
+            "context": f"{len(missing)} missing, {len(extra)} extra and {len(naming_mismatches)} renamed column(s) (stub analysis).",
+            "reasoning": "Columns were matched by normalized name only.",
+            "recommendation": []
+        }
+    }
+
+
+def _final_report(prompt: str) -> Dict[str, Any]:
+    file_name = re.search(r'"file_name": "([^"]*)"', prompt)
+    total_rows = re.search(r'"total_rows_checked": (\d+)', prompt)
+    return {
+        "file_name": file_name.group(1) if file_name else None,
+        "total_rows_checked": int(total_rows.group(1)) if total_rows else 0,
+        "validated_at": datetime.now(timezone.utc).isoformat(),
+        "validation_summary": {"status": "Passed", "high_severity_issues": 0, "medium_severity_issues": 0, "low_severity_issues": 0},
+        "data_quality_score": {"score": 100, "grade": "A", "reasoning": "Stub report: no LLM analysis was performed."},
+        "triage_plan": [],
+        "data_type_mismatch": [],
+        "data_quality_issues": [],
+        "append_upsert_suggestion": {},
+        "schema_drift": {},
+        "dynamic_validation_rules": [],
+        "root_cause_analysis": {},
+        "overall_analysis": {}
+    }
+
+
+def respond(user_prompt: str) -> str:
+    """The stub's JSON answer to one of the prompts built by prompts.py."""
+    if "**Database Schema (Target):**" in user_prompt:
+        return json.dumps(_schema_analysis(user_prompt))
+    if "Return *ONLY* a single JSON list of rule objects" in user_prompt:
+        return json.dumps([])
+    return json.dumps(_final_report(user_prompt))
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN) if text else 0
+
+
+class StubBehavior:
+    """
+    Simulated endpoint behaviour, shared by the in-process client and the HTTP server.
+
+    latency_s: delay before the first token. tokens_per_second: streaming rate (None = instant).
+    error_rate / rate_limit_rate: fraction of calls that fail with a 500 / 429, drawn from a
+    random generator seeded with seed, so a run is reproducible.
+    """
+
+    def __init__(self, latency_s: float = 0.0, tokens_per_second: Optional[float] = None, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, seed: int = 0):
+        self.latency_s = latency_s
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"calls": 0, "errors": 0, "rate_limited": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def outcome(self, prompt_text: str) -> str:
+        """Counts the call and decides its fate: 'ok', 'error' or 'rate_limited'."""
+        with self.lock:
+            self.stats["calls"] += 1
+            self.stats["prompt_tokens"] += estimate_tokens(prompt_text)
+            draw = self.random.random()
+            if draw < self.rate_limit_rate:
+                self.stats["rate_limited"] += 1
+                return "rate_limited"
+            if draw < self.rate_limit_rate + self.error_rate:
+                self.stats["errors"] += 1
+                return "error"
+            return "ok"
+
+    def stream(self, text: str) -> Iterator[str]:
+        """Yields the response in chunks of STREAM_CHUNK_TOKENS, paced by latency and token rate."""
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        chunk_chars = STREAM_CHUNK_TOKENS * CHARS_PER_TOKEN
+        for start in range(0, len(text), chunk_chars):
+            piece = text[start:start + chunk_chars]
+            if self.tokens_per_second:
+                time.sleep(estimate_tokens(piece) / self.tokens_per_second)
+            yield piece
+        with self.lock:
+            self.stats["completion_tokens"] += estimate_tokens(text)
+
+
+def _api_error(outcome: str) -> openai.APIStatusError:
+    status = 429 if outcome == "rate_limited" else 500
+    response = httpx.Response(status, headers={"retry-after": "1"}, request=httpx.Request("POST", "http://llm-stub/chat/completions"))
+    if status == 429:
+        return openai.RateLimitError("Simulated rate limit (429).", response=response, body=None)
+    return openai.InternalServerError("Simulated server error (500).", response=response, body=None)
+
+
+def _chunk(text: str) -> SimpleNamespace:
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class _Completions:
+    def __init__(self, owner: "StubOpenAIClient"):
+        self.owner = owner
+
+    def create(self, messages: List[Dict[str, str]], stream: bool = False, **kwargs) -> Any:
+        self.owner.calls += 1
+        behavior = self.owner.behavior
+        outcome = behavior.outcome("".join(m["content"] for m in messages))
+        if outcome != "ok":
+            raise _api_error(outcome)
+        text = respond(messages[-1]["content"])
+        if stream:
+            return (_chunk(piece) for piece in behavior.stream(text))
+        text = "".join(behavior.stream(text))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+class StubOpenAIClient:
+    """Drop-in replacement for main.client that never leaves the process. See StubBehavior for the options."""
+
+    def __init__(self, **behavior_options):
+        self.calls = 0
+        self.behavior = StubBehavior(**behavior_options)
+        self.chat = SimpleNamespace(completions=_Completions(self))
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return dict(self.behavior.stats)
+
+
+def install(**behavior_options) -> StubOpenAIClient:
+    """Replaces main.client with a stub and returns it."""
+    import main
+    main.client = StubOpenAIClient(**behavior_options)
+    return main.client
+
+
+# --- OpenAI-compatible HTTP endpoint ---
+class _StubRequestHandler(BaseHTTPRequestHandler):
+    behavior: StubBehavior = None # Set by serve()
+
+    def _send_json(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args) -> None:
+        logging.debug(f"llm_stub: {format % args}")
+
+    def do_GET(self) -> None:
+        self._send_json(200, self.behavior.stats) # Any GET returns the call statistics
+
+    def do_POST(self) -> None:
+        # Both /v1/chat/completions and Azure's /openai/deployments/<name>/chat/completions
+        if not self.path.split("?")[0].endswith("/chat/completions"):
+            return self._send_json(404, {"error": {"message": "Not found."}})
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        messages = request.get("messages", [])
+        outcome = self.behavior.outcome("".join(str(m.get("content", "")) for m in messages))
+        if outcome == "rate_limited":
+            return self._send_json(429, {"error": {"code": "429", "message": "Simulated rate limit."}}, {"Retry-After": "1"})
+        if outcome == "error":
+            return self._send_json(500, {"error": {"code": "500", "message": "Simulated server error."}})
+        text = respond(messages[-1]["content"] if messages else "")
+        completion_id, created, model = f"chatcmpl-stub-{self.behavior.stats['calls']}", int(time.time()), request.get("model", "stub")
+        if not request.get("stream"):
+            text = "".join(self.behavior.stream(text))
+            return self._send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": estimate_tokens(json.dumps(messages)), "completion_tokens": estimate_tokens(text),
+                          "total_tokens": estimate_tokens(json.dumps(messages)) + estimate_tokens(text)},
+            })
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        pieces = list(self.behavior.stream(text)) + [None]
+        for piece in pieces:
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": {"content": piece} if piece is not None else {},
+                                  "finish_reason": None if piece is not None else "stop"}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+def serve(host: str = "127.0.0.1", port: int = 8011, **behavior_options) -> ThreadingHTTPServer:
+    """Creates the mock endpoint; call serve_forever() on the result (or run it in a thread)."""
+    _StubRequestHandler.behavior = StubBehavior(**behavior_options)
+    return ThreadingHTTPServer((host, port), _StubRequestHandler)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', force=True)
+    parser = argparse.ArgumentParser(description="Serve deterministic LLM responses on an OpenAI / Azure OpenAI compatible endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before the first token.")
+    parser.add_argument("--tokens-per-second", type=float, default=None, help="Streaming rate (default: instant).")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with a 500.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of calls answered with a 429.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    server = serve(args.host, args.port, latency_s=args.latency, tokens_per_second=args.tokens_per_second,
+                   error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, seed=args.seed)
+    logging.info(f"LLM stub listening on http://{args.host}:{server.server_address[1]} "
+                 f"(use AZURE_ENDPOINT=http://{args.host}:{server.server_address[1]}). GET / returns call statistics.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -1,9 +1,12 @@
 import logging
 import os
+import sys
 import glob
 import pandas as pd
 import json
-import sqlalchemy
+import argparse
+import itertools
+import contextlib
 import time # Added
 import httpx # Added
 import openai # Added
@@ -12,8 +15,18 @@ from dotenv import load_dotenv # Added
 from openai import AzureOpenAI # Added
 from datetime import datetime, timezone
 from typing import Optional, List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
 import tools
 import prompts
+import incremental_validation
+import rule_engine
+import columnar_input
+import compressed_input
+import sampling
+import violation_matrix
+import table_matcher
+import engine_registry
+import tracing
 
 # --- 1. NEW: Load .env and Set Up Logging ---
 load_dotenv() # Load environment variables from .env file
@@ -75,12 +88,23 @@ Do not chat. Provide *only* the requested JSON analysis.
 SYSTEM_PROMPT_INTERACTIVE = """
 You are a helpful database expert. Your job is to analyze a file schema, compare it to database tables, and ask the user to select the correct one.
 """
+_token_encoding = None
+_token_encoding_unavailable = False # tiktoken could not load its encoding (e.g. offline); not retried per call
+
 def count_tokens(system_prompt, user_prompt, full_response):
     """
     Counts input, output, and total tokens for the API call using tiktoken.
+    Returns zeros without counting when the LLM is stubbed (llm_stub) or the encoding cannot be
+    loaded, so offline runs never wait for the tiktoken download.
     """
+    global _token_encoding, _token_encoding_unavailable
+    stub = sys.modules.get("llm_stub") # Only imported when the stub is in use
+    if _token_encoding_unavailable or (stub is not None and isinstance(client, stub.StubOpenAIClient)):
+        return 0, 0, 0 # The caller estimates from the text length
     try:
-        encoding = tiktoken.get_encoding("cl100k_base")
+        if _token_encoding is None:
+            _token_encoding = tiktoken.get_encoding("cl100k_base")
+        encoding = _token_encoding
         
         system_tokens = len(encoding.encode(system_prompt))
         user_tokens = len(encoding.encode(user_prompt))
@@ -100,9 +124,16 @@ def count_tokens(system_prompt, user_prompt, full_response):
         return input_tokens, output_tokens, total_tokens
         
     except Exception as e:
-        print(f"An error occurred during token counting: {e}")
+        _token_encoding_unavailable = _token_encoding is None
+        logging.warning(f"An error occurred during token counting: {e}")
         return 0, 0, 0 # Return 0 if counting fails
 # --- 6. NEW: API Calling Function (From your code, with fixes) ---
+# Optional cap on concurrent LLM calls: a (multiprocessing) semaphore shared by all batch
+# workers, set by batch_validation.py. None means unlimited.
+llm_call_slots = None
+# Pause after a 429 before retrying; benchmarks against llm_stub set this close to 0
+LLM_RATE_LIMIT_BACKOFF_SECONDS = float(os.getenv("LLM_RATE_LIMIT_BACKOFF_SECONDS", "60"))
+
 def get_llm_streaming_response(system_prompt: str, user_prompt: str, max_retries: int = 3) -> Optional[str]:
     """
     Calls the Azure OpenAI API with streaming and retries on RateLimitError.
@@ -111,33 +142,22 @@ def get_llm_streaming_response(system_prompt: str, user_prompt: str, max_retries
     for attempt in range(max_retries):
         try:
             logging.info(f"Sending prompt to LLM (Attempt {attempt + 1}/{max_retries})...")
-            response = client.chat.completions.create(
-                stream=True,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.0,
-                top_p=1.0,
-                frequency_penalty=0.0,
-                presence_penalty=0.0,
-                model=DEPLOYMENT_NAME,
-            )
-
-            full_response = ""
-            for chunk in response:
-                if chunk.choices and chunk.choices[0].delta.content:
-                    full_response += chunk.choices[0].delta.content
+            with llm_call_slots if llm_call_slots is not None else contextlib.nullcontext():
+                with tracing.span("llm_call", "llm", attempt=attempt + 1):
+                    full_response = _stream_completion(system_prompt, user_prompt)
             
-            # Call the helper function to count and log tokens
-            count_tokens(system_prompt, user_prompt, full_response)
+                    # Call the helper function to count and log tokens
+                    input_tokens, output_tokens, _ = count_tokens(system_prompt, user_prompt, full_response)
+                    # Estimated at ~4 characters per token when tiktoken cannot count (e.g. offline)
+                    tracing.count(tokens_in=input_tokens or len(system_prompt + user_prompt) // 4,
+                                  tokens_out=output_tokens or len(full_response) // 4)
                     
             return full_response
         
         except openai.RateLimitError as e:
             sleep_time = 60 * (attempt + 1)
-            logging.warning(f"Rate limit hit. Retrying in 60s... ({attempt + 1}/{max_retries})")
-            time.sleep(60)
+            logging.warning(f"Rate limit hit. Retrying in {LLM_RATE_LIMIT_BACKOFF_SECONDS:g}s... ({attempt + 1}/{max_retries})")
+            time.sleep(LLM_RATE_LIMIT_BACKOFF_SECONDS)
             
         except Exception as e:
             # Log other errors and break the loop (no retry)
@@ -147,6 +167,28 @@ def get_llm_streaming_response(system_prompt: str, user_prompt: str, max_retries
     logging.error("Max retries exceeded for RateLimitError. Giving up.")
     return None
 
+
+def _stream_completion(system_prompt: str, user_prompt: str) -> str:
+    """Runs one streaming chat completion and returns the concatenated response text."""
+    response = client.chat.completions.create(
+        stream=True,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        temperature=0.0,
+        top_p=1.0,
+        frequency_penalty=0.0,
+        presence_penalty=0.0,
+        model=DEPLOYMENT_NAME,
+    )
+
+    full_response = ""
+    for chunk in response:
+        if chunk.choices and chunk.choices[0].delta.content:
+            full_response += chunk.choices[0].delta.content
+    return full_response
+
 # --- 7. Schema History Functions (Unchanged) ---
 SCHEMA_HISTORY_DIR = "schema_history"
 NUM_HISTORICAL_SCHEMAS_TO_LOAD = 3
@@ -156,7 +198,7 @@ def save_schema_to_history(table_name: str, file_schema: Dict[str, Any]):
     try:
         safe_table_name = "".join(c if c.isalnum() else "_" for c in table_name)
         os.makedirs(SCHEMA_HISTORY_DIR, exist_ok=True)
-        timestamp = datetime.now().strftime('%Y%m%dT%H%M%SZ')
+        timestamp = datetime.now().strftime('%Y%m%dT%H%M%S%fZ') # Microseconds: zip members can finish in the same second
         filename = f"{safe_table_name}_schema_{timestamp}.json"
         filepath = os.path.join(SCHEMA_HISTORY_DIR, filename)
         schema_to_save = {"columns": file_schema.get("columns", {})}
@@ -194,28 +236,72 @@ FILE_PATH = "new_order.csv"
 TABLE_NAME = None 
 DB_URL = "sqlite:///database/sample_data.db"
 
+@tracing.traced(category="pipeline")
 def run_validation_for_sheet(
-    df: pd.DataFrame,
+    df: Optional[pd.DataFrame],
     file_path: str,
     sheet_name: Optional[str],
     db_url: str,
-    user_provided_table_name: Optional[str]
+    user_provided_table_name: Optional[str],
+    incremental: bool = False,
+    feed: Optional[str] = None,
+    fast: bool = False,
+    memory_budget_mb: Optional[int] = None
 ) -> (Dict[str, Any], Dict[str, Any], Optional[str]):
     """
     Runs the validation process for a single DataFrame (representing a sheet).
     This version now uses the new streaming API function.
+    With incremental=True (CSV only, pass df=None), the checks re-use the saved
+    state of previous runs and only validate rows appended since then; the file is
+    not loaded, its schema is extracted from the first rows.
+    If a feed name is given, primary keys are also checked against the keys
+    accepted from earlier files of that feed.
+    For Parquet/Feather/Arrow files pass df=None: the schema is taken from the
+    file metadata and only the mapped columns are read, chunk by chunk.
+    With fast=True (df=None) the checks run on a random row sample drawn batch by batch,
+    and the report gets a 'sampling_report' with violation rates, confidence intervals
+    and a pass/fail/inconclusive verdict.
+    memory_budget_mb caps the memory of chunked PK tracking (incremental and columnar
+    paths); past it, keys spill to disk. Defaults to config.MEMORY_BUDGET_MB.
+    Full in-memory runs add a 'row_summary' (rows failing any / a high-severity check,
+    clean rows, per-check counts and sample reason codes) built from the shared
+    violation matrix. Incremental runs have none.
     """
     sheet_report = {}
+    memory_budget_bytes = memory_budget_mb * 1024 * 1024 if memory_budget_mb else None
     target_table_name = user_provided_table_name
     schema_analysis_json = {}
     inferred_table_name_sheet = None
+    table_match = None
+    sample_batches = None # Fast mode's sample generator; holds the file open until closed
 
     try:
         sheet_display_name = sheet_name if sheet_name is not None else "CSV Data"
         logging.info(f"---  Starting Validation for Sheet: '{sheet_display_name}' ---")
 
         # --- Step 1 (Sheet): Extract Schema (Unchanged) ---
-        file_schema = tools.extract_schema_from_df(df, file_path, sheet_name)
+        columnar = not fast and df is None and columnar_input.is_columnar_file(file_path)
+        # Append-only CSV: validated chunk by chunk against the state of earlier runs (Step 4)
+        appended = incremental and not fast and not columnar and sheet_name is None
+        with tracing.span("extract_schema") as stage:
+            if fast:
+                # The first sample batch stands in for the sheet; more batches are drawn in Step 4
+                sample_info: Dict[str, Any] = {}
+                sample_batches = sampling.iter_sample_batches(file_path, sheet_name, info=sample_info)
+                df = next(sample_batches, None)
+                if df is None:
+                    raise ValueError(f"No rows could be sampled from sheet '{sheet_display_name}'")
+            if columnar:
+                file_schema = columnar_input.read_columnar_schema(file_path)
+            else:
+                schema_sample = appended and df is None
+                if schema_sample:
+                    df = incremental_validation.read_head(file_path)
+                df = tools.drop_all_null_rows(df)
+                file_schema = tools.extract_schema_from_df(df, file_path, sheet_name)
+                if schema_sample:
+                    file_schema["schema_source"] = "head_sample" # total_rows is set after Step 4
+            stage.add(rows=file_schema.get("total_rows"))
         if "error" in file_schema or not file_schema.get("columns"):
             raise ValueError(f"Schema extraction failed for sheet '{sheet_display_name}'")
 
@@ -225,59 +311,29 @@ def run_validation_for_sheet(
         # --- [THIS IS THE NEW CODE BLOCK TO INSERT] ---
 
         else:
-            logging.warning(f"No table name provided. Fetching all table names for user selection...")
-            engine = sqlalchemy.create_engine(db_url)
-            
-            # We still need all_schemas to get the table names
-            all_schemas = tools.get_all_table_schemas(engine)
-            if not all_schemas:
-             raise ValueError("No tables found in database to choose from.")
-
-            # Get the list of available table names
-            table_names = list(all_schemas.keys())
-
-            # --- This block replaces the LLM call ---
-            logging.info("--- WAITING FOR USER INPUT ---")
-            
-            print("\n" + "="*80)
-            print(f"File: {file_path}" + (f" (Sheet: {sheet_display_name})" if sheet_display_name else ""))
-            print("\nNo target table was provided. Please choose a table from the list below:")
-            
-            # Print the list of tables for the user
-            for name in table_names:
-                print(f"- {name}")
-            
-            # Wait for user's response
-            user_selection = input("\n> Please type the full name of the table or 'None': ").strip()
-            print("="*80)
-            # --- End of replacement block ---
-
-            if not user_selection or user_selection.lower() == 'none':
-                raise ValueError(f"Process stopped: User confirmed no matching table.")
-
-            # NEW: Add validation to make sure the user's choice is valid
-            if user_selection not in table_names:
-                logging.error(f"Invalid table name: '{user_selection}' is not in the database.")
-                raise ValueError(f"Invalid table: '{user_selection}' is not in the database. Aborting.")
-
-            target_table_name = user_selection
+            logging.warning("No table name provided. Matching the sheet against the database catalog...")
+            engine = engine_registry.get_engine(db_url)
+            file_label = f"{file_path}" + (f" (Sheet: {sheet_display_name})" if sheet_name is not None else "")
+            # Confident matches are auto-selected; the user is asked only for ambiguous ones
+            with tracing.span("match_table"):
+                target_table_name, table_match = table_matcher.select_target_table(engine, file_schema, file_label)
             inferred_table_name_sheet = target_table_name
-            logging.info(f"User selected table: '{target_table_name}'")
 
         # --- Step 3 (Sheet): LLM Schema Analysis (UPDATED) ---
         logging.info(f"--- [Sheet '{sheet_display_name}'] Step 2: LLM Schema Analysis ---")
-        engine = sqlalchemy.create_engine(db_url)
-        db_schema = tools.get_db_schema(engine, target_table_name)
+        engine = engine_registry.get_engine(db_url) # Shared, pooled engine; disposed at exit
+        with tracing.span("reflect_table", table=target_table_name):
+            db_schema = tools.get_db_schema(engine, target_table_name)
         if db_schema is None:
             raise ValueError(f"Database table '{target_table_name}' does not exist.")
 
-        raw_comparison = tools.compare_schemas(file_schema, db_schema)
-        schema_prompt = prompts.get_schema_analysis_prompt(
-            db_schema=db_schema, file_schema=file_schema, raw_comparison=raw_comparison,
-            target_table_name=target_table_name, source_file_name=os.path.basename(file_path)
-        )
-        
-        schema_response_str = get_llm_streaming_response(SYSTEM_PROMPT_INSIGHT, schema_prompt)
+        with tracing.span("llm_schema_analysis"):
+            raw_comparison = tools.compare_schemas(file_schema, db_schema)
+            schema_prompt = prompts.get_schema_analysis_prompt(
+                db_schema=db_schema, file_schema=file_schema, raw_comparison=raw_comparison,
+                target_table_name=target_table_name, source_file_name=os.path.basename(file_path)
+            )
+            schema_response_str = get_llm_streaming_response(SYSTEM_PROMPT_INSIGHT, schema_prompt)
         if schema_response_str is None:
             raise ValueError("Failed to get schema analysis from LLM.")
         
@@ -292,37 +348,92 @@ def run_validation_for_sheet(
         # --- Step 4 (Sheet): Deep Validation (Unchanged) ---
         logging.info(f"--- [Sheet '{sheet_display_name}'] Step 3: Deep Validation ---")
         naming_mismatches = schema_analysis_json.get("naming_mismatches", {})
-        mapped_df = df.rename(columns=naming_mismatches)
-        type_violations = tools.validate_data_types(mapped_df, db_schema)
-        dq_violations = tools.run_data_quality_checks(mapped_df, db_schema, engine, target_table_name)
+        row_summary = None
+        with tracing.span("deep_validation", mode="fast" if fast else "columnar" if columnar else "incremental" if appended else "in_memory") as stage:
+            if fast:
+                def run_checks(batch: pd.DataFrame):
+                    mapped_batch = tools.ColumnMappedFrame(batch, naming_mismatches)
+                    batch_violations = tools.run_data_quality_checks(mapped_batch, db_schema, engine, target_table_name)
+                    if feed:
+                        batch_violations.extend(tools.check_cross_batch_duplicates(mapped_batch, db_schema, feed, target_table_name))
+                    batch_violations.extend(tools.validate_dates(mapped_batch, db_schema, feed=feed or os.path.basename(file_path)))
+                    return tools.validate_data_types(mapped_batch, db_schema), batch_violations
+
+                fast_result = sampling.run_sampled_checks(itertools.chain([df], sample_batches), run_checks, info=sample_info)
+                type_violations = fast_result["type_violations"]
+                dq_violations = fast_result["dq_violations"]
+                df = fast_result["sample"] # Dynamic rules run on the consumed sample
+            elif columnar:
+                columnar_result = columnar_input.validate_columnar_file(
+                    file_path, db_schema, target_table_name, engine=engine, column_mapping=naming_mismatches,
+                    feed=feed, date_feed=feed or os.path.basename(file_path), memory_budget_bytes=memory_budget_bytes
+                )
+                type_violations = columnar_result["type_violations"]
+                dq_violations = columnar_result["dq_violations"]
+            elif appended:
+                incremental_result = incremental_validation.validate_appended_csv(
+                    file_path, db_schema, target_table_name, engine=engine, column_mapping=naming_mismatches,
+                    feed=feed, date_feed=feed or os.path.basename(file_path), memory_budget_bytes=memory_budget_bytes
+                )
+                type_violations = incremental_result["type_violations"]
+                dq_violations = incremental_result["dq_violations"]
+                file_schema["total_rows"] = incremental_result["total_rows"]
+                # No row summary: the rows of earlier runs are only known through the saved state
+            else:
+                mapped_df = tools.ColumnMappedFrame(df, naming_mismatches) # Renamed view, no copy of the sheet
+                # Row-level results of every check, shared so the row summary needs no second pass
+                row_matrix = violation_matrix.ViolationMatrix(df.index)
+                type_violations = tools.validate_data_types(mapped_df, db_schema, matrix=row_matrix)
+                dq_violations = tools.run_data_quality_checks(mapped_df, db_schema, engine, target_table_name, matrix=row_matrix)
+                if feed:
+                    dq_violations.extend(tools.check_cross_batch_duplicates(mapped_df, db_schema, feed, target_table_name, matrix=row_matrix))
+                dq_violations.extend(tools.validate_dates(mapped_df, db_schema, feed=feed or os.path.basename(file_path), matrix=row_matrix))
+                row_summary = row_matrix.summary()
+                logging.info(f"Row-level summary: {row_summary['rows_with_violations']} of {row_summary['total_rows']} rows fail at least one check "
+                             f"({row_summary['rows_failing_high_severity']} a high-severity one).")
+            if fast:
+                stage.add(rows=fast_result["sampling_report"].get("sample_rows"))
+            else:
+                stage.add(rows=incremental_result["rows_validated"] if appended else file_schema.get("total_rows"))
         logging.info(f"Deep validation: Complete")
 
         # --- Step 4.5 (Sheet): Infer Dynamic Rules (UPDATED) ---
         logging.info(f"--- [Sheet '{sheet_display_name}'] Step 4.5: Inferring Dynamic Rules ---")
         dynamic_rules = []
-        try:
-            dynamic_rules_prompt = prompts.get_dynamic_rules_prompt(file_schema)
-            dynamic_rules_str = get_llm_streaming_response(SYSTEM_PROMPT_INSIGHT, dynamic_rules_prompt)
-            if dynamic_rules_str:
-                dynamic_rules = json.loads(dynamic_rules_str)
-            logging.info(f"LLM Dynamic Rules: Complete")
-        except Exception as e:
-            logging.warning(f"Could not generate dynamic rules: {e}")
-            dynamic_rules = [{"error": "Failed to generate dynamic rules"}]
+        with tracing.span("dynamic_rules"):
+            try:
+                dynamic_rules_prompt = prompts.get_dynamic_rules_prompt(file_schema)
+                dynamic_rules_str = get_llm_streaming_response(SYSTEM_PROMPT_INSIGHT, dynamic_rules_prompt)
+                if dynamic_rules_str:
+                    dynamic_rules = json.loads(dynamic_rules_str)
+                    # Execute the inferred rules over the full data so the report carries real counts
+                    if columnar:
+                        rule_columns = list(dict.fromkeys(r.get("column") for r in dynamic_rules if isinstance(r, dict) and r.get("column") in file_schema["columns"]))
+                        dynamic_rules = rule_engine.run_dynamic_rules_chunked(columnar_input.iter_columnar_chunks(file_path, rule_columns), dynamic_rules)
+                    elif appended:
+                        # Rules are inferred anew every run; they are executed on the appended rows
+                        appended_rows = incremental_validation.iter_csv_tail(file_path, incremental_result["tail_start"], incremental_result["rows_reused"])
+                        dynamic_rules = rule_engine.run_dynamic_rules_chunked(appended_rows, dynamic_rules)
+                    else:
+                        dynamic_rules = rule_engine.run_dynamic_rules(df, dynamic_rules)
+                logging.info(f"LLM Dynamic Rules: Complete")
+            except Exception as e:
+                logging.warning(f"Could not generate dynamic rules: {e}")
+                dynamic_rules = [{"error": "Failed to generate dynamic rules"}]
 
         # --- Step 5 (Sheet): LLM Final Report Generation (UPDATED) ---
         logging.info(f"--- [Sheet '{sheet_display_name}'] Step 4: LLM Final Report ---")
         historical_schemas = load_historical_schemas(target_table_name, NUM_HISTORICAL_SCHEMAS_TO_LOAD)
         file_metadata = {"file_name": os.path.basename(file_path), "sheet_name": sheet_name, "total_rows": file_schema.get("total_rows")}
 
-        final_prompt = prompts.get_final_report_prompt(
-            file_metadata=file_metadata, schema_analysis=schema_analysis_json,
-            type_mismatches=type_violations, dq_violations=dq_violations,
-            current_file_schema=file_schema, historical_schemas=historical_schemas,
-            dynamic_rules=dynamic_rules
-        )
-        
-        sheet_report_str = get_llm_streaming_response(SYSTEM_PROMPT_INSIGHT, final_prompt)
+        with tracing.span("llm_final_report"):
+            final_prompt = prompts.get_final_report_prompt(
+                file_metadata=file_metadata, schema_analysis=schema_analysis_json,
+                type_mismatches=type_violations, dq_violations=dq_violations,
+                current_file_schema=file_schema, historical_schemas=historical_schemas,
+                dynamic_rules=dynamic_rules
+            )
+            sheet_report_str = get_llm_streaming_response(SYSTEM_PROMPT_INSIGHT, final_prompt)
         if sheet_report_str is None:
             raise ValueError("Failed to get final report from LLM.")
             
@@ -332,8 +443,25 @@ def run_validation_for_sheet(
             logging.error(f"Failed to parse JSON from final report: {e}\nRaw response: {sheet_report_str}")
             raise ValueError("LLM did not return valid JSON for final report.")
 
-        if target_table_name:
-            save_schema_to_history(target_table_name, file_schema)
+        if fast:
+            sheet_report["sampling_report"] = fast_result["sampling_report"]
+        elif appended:
+            sheet_report["incremental_report"] = {key: incremental_result[key] for key in ("total_rows", "rows_reused", "rows_validated", "chunks_reused", "chunks_validated", "full_revalidation")}
+        elif row_summary is not None:
+            sheet_report["row_summary"] = row_summary
+        if table_match is not None:
+            sheet_report["table_match"] = table_match
+
+        with tracing.span("save_history"):
+            if target_table_name:
+                save_schema_to_history(target_table_name, file_schema)
+                # Keys of a sample (fast mode) are not recorded as accepted
+                if feed and columnar:
+                    columnar_input.record_accepted_keys(file_path, db_schema, feed, target_table_name, naming_mismatches)
+                elif feed and appended:
+                    incremental_validation.record_accepted_keys(file_path, db_schema, feed, target_table_name, incremental_result, naming_mismatches)
+                elif feed and not fast:
+                    tools.record_accepted_keys(mapped_df, db_schema, feed, target_table_name)
 
         logging.info(f"---  Sheet '{sheet_display_name}' Validation Complete ---")
 
@@ -345,24 +473,63 @@ def run_validation_for_sheet(
             "validation_summary": { "status": "Error", "details": str(e) },
             "error": str(e)
         }
+    finally:
+        if sample_batches is not None:
+            sample_batches.close() # run_sampled_checks may stop before the last batch
     
     return sheet_report, schema_analysis_json, inferred_table_name_sheet
 
 
 # --- 9. Main Runner Function (Unchanged from last version) ---
-def run_multi_sheet_validation(file_path: str, db_url=DB_URL, user_provided_table_name: Optional[str] = None):
+def run_multi_sheet_validation(file_path: str, db_url=DB_URL, user_provided_table_name: Optional[str] = None, incremental: bool = False, feed: Optional[str] = None, compact: bool = False, fast: bool = False, escalate: bool = False, memory_budget_mb: Optional[int] = None, report_path: Optional[str] = "validation_report_converted.json", print_report: bool = True, trace_path: Optional[str] = None):
     """
-    Handles CSV or multi-sheet Excel validation by iterating through sheets.
+    Handles CSV, Parquet/Feather/Arrow or multi-sheet Excel validation by iterating through sheets.
+    Compressed CSVs (.csv.gz, .csv.zst, ...) are decompressed while reading; the CSV members
+    of a .zip archive are validated concurrently, like sheets, and reported per member.
+    Set incremental=True for append-only CSV feeds to skip re-checking rows validated by earlier runs
+    (the CSV is then read chunk by chunk from where the last run stopped, never as a whole).
+    Set feed to the name of a recurring feed to catch keys re-sent from earlier files.
+    Set compact=True to load sheets with compact dtypes (categoricals, Arrow strings, downcast numerics);
+    every sheet report then includes a memory_report.
+    Set fast=True for triage: every sheet is validated on a random row sample (see sampling.py)
+    and gets a sampling_report with a verdict. With escalate=True a sheet whose sample fails
+    is re-validated in full, keeping the sample's result under 'fast_triage'.
+    memory_budget_mb overrides config.MEMORY_BUDGET_MB for chunked key tracking.
+    The combined report is written to report_path (skipped if None) and printed unless print_report=False.
+    Every stage is traced (see tracing.py): the report gets a 'trace_summary' with wall/CPU time,
+    rows, bytes, tokens and cache hits per stage, and trace_path, if given, receives the full
+    Chrome trace (open it in chrome://tracing or Perfetto).
     """
+    tracer = tracing.start_trace(os.path.basename(file_path))
+    try:
+        with tracer.span("run_multi_sheet_validation", "pipeline", file=file_path):
+            result = _run_multi_sheet_validation(file_path, db_url, user_provided_table_name, incremental, feed, compact, fast, escalate, memory_budget_mb, report_path, print_report)
+    finally:
+        tracing.stop_trace(tracer)
+    if trace_path:
+        tracer.write(trace_path)
+        logging.info(f"Chrome trace saved to {trace_path}")
+    return result
+
+
+def _run_multi_sheet_validation(file_path, db_url, user_provided_table_name, incremental, feed, compact, fast, escalate, memory_budget_mb, report_path, print_report):
     logging.info(f"---  STARTING VALIDATION FOR FILE: {file_path} ---")
     if user_provided_table_name:
         logging.info(f"User provided target table: '{user_provided_table_name}'")
     else:
         logging.info("User did not provide target table. Will infer table per sheet.")
 
+    # Referenced FK key sets are fetched once per run and shared by all sheets
+    tools.clear_referenced_key_cache()
+
     try:
         sheet_names: List[Optional[str]] = []
         is_excel = file_path.endswith(('.xls', '.xlsx'))
+        is_columnar = columnar_input.is_columnar_file(file_path)
+        is_zip = compressed_input.is_zip_archive(file_path)
+        if incremental and (is_zip or compressed_input.is_compressed_csv(file_path)):
+            logging.warning(f"Incremental validation needs an uncompressed append-only CSV. Validating '{file_path}' in full.")
+            incremental = False
 
         if is_excel:
             xls = pd.ExcelFile(file_path)
@@ -371,6 +538,15 @@ def run_multi_sheet_validation(file_path: str, db_url=DB_URL, user_provided_tabl
             if not sheet_names:
                 logging.warning(f"Excel file '{file_path}' contains no sheets.")
                 return
+        elif is_zip:
+            sheet_names = compressed_input.list_zip_members(file_path)
+            logging.info(f"Detected zip archive with CSV members: {sheet_names}")
+            if not sheet_names:
+                logging.warning(f"Zip archive '{file_path}' contains no CSV files.")
+                return
+        elif is_columnar:
+            sheet_names = [None] # Single table; read chunk by chunk inside the sheet validation
+            logging.info(f"Detected columnar file: {file_path}")
         else:
             sheet_names = [None] # Placeholder for CSV
             logging.info(f"Detected CSV file: {file_path}")
@@ -378,32 +554,75 @@ def run_multi_sheet_validation(file_path: str, db_url=DB_URL, user_provided_tabl
         all_sheet_reports: Dict[str, Dict] = {}
         first_schema_mismatch = {}
         inferred_target_table = None
-        
-        for sheet_name in sheet_names:
+
+        def process_sheet(sheet_name: Optional[str], fast_pass: bool = fast):
             current_df = None
             sheet_display_name = sheet_name if sheet_name is not None else "CSV Data"
             try:
                 logging.info(f"--- Loading data for sheet: '{sheet_display_name}' ---")
-                current_df = pd.read_excel(file_path, sheet_name=sheet_name) if is_excel else pd.read_csv(file_path)
+                memory_report = None
+                appended = incremental and not (fast_pass or is_excel or is_columnar)
+                if not (is_columnar or fast_pass or appended): # Columnar files, samples and appended CSVs are not loaded up front
+                    with tracing.span("read", sheet=sheet_display_name) as stage:
+                        peak_rss_before = tools.get_peak_rss_bytes()
+                        if is_excel:
+                            current_df = pd.read_excel(file_path, sheet_name=sheet_name)
+                            current_df = tools.compact_dataframe(current_df) if compact else current_df
+                        else:
+                            current_df = compressed_input.read_csv_input(file_path, member=sheet_name if is_zip else None, compact=compact)
+                        memory_report = tools.build_memory_report(current_df, peak_rss_before)
+                        stage.add(rows=len(current_df), bytes=memory_report["dataframe_bytes"])
+                    logging.info(f"Loaded sheet '{sheet_display_name}': {memory_report['dataframe_bytes']} bytes in memory, peak RSS {memory_report['peak_rss_after_bytes']} bytes.")
                 
                 sheet_report, schema_analysis_json, inferred_table = run_validation_for_sheet(
                     df=current_df, file_path=file_path, sheet_name=sheet_name,
-                    db_url=db_url, user_provided_table_name=user_provided_table_name
+                    db_url=db_url, user_provided_table_name=user_provided_table_name,
+                    incremental=incremental and not fast_pass, feed=feed, fast=fast_pass,
+                    memory_budget_mb=memory_budget_mb
                 )
+                sampling_report = sheet_report.get("sampling_report") if fast_pass else None
+                if escalate and sampling_report and sampling_report.get("verdict") == "fail":
+                    logging.warning(f"Sample of sheet '{sheet_display_name}' failed. Escalating to a full validation.")
+                    full_result = process_sheet(sheet_name, fast_pass=False)
+                    full_result[1]["fast_triage"] = sampling_report
+                    return full_result
                 report_key = sheet_name if sheet_name is not None else "csv_data"
                 sheet_report["schema_analysis_report"] = schema_analysis_json
-                all_sheet_reports[report_key] = sheet_report
-                
-                if not first_schema_mismatch: first_schema_mismatch = schema_analysis_json
-                if not inferred_target_table and inferred_table: inferred_target_table = inferred_table
+                if compact and memory_report:
+                    sheet_report["memory_report"] = memory_report
+                return report_key, sheet_report, schema_analysis_json, inferred_table
                 
             except Exception as e:
                 logging.error(f"Failed to process sheet '{sheet_display_name}': {e}", exc_info=True)
-                # ... (error handling) ...
+                # Recorded like an error of run_validation_for_sheet, so the sheet shows up as failed in the report
+                error_report = {
+                    "file_name": file_path, "sheet_name": sheet_name,
+                    "validated_at": datetime.now(timezone.utc).isoformat(),
+                    "validation_summary": { "status": "Error", "details": str(e) },
+                    "error": str(e)
+                }
+                return (sheet_name if sheet_name is not None else "csv_data"), error_report, {}, None
+
+        if is_zip and len(sheet_names) > 1:
+            # Members are independent, so they are validated concurrently (the LLM calls dominate).
+            # Without a target table an ambiguous member may ask the user for one; interactive runs
+            # therefore validate members one at a time.
+            interactive = not user_provided_table_name and sys.stdin is not None and sys.stdin.isatty()
+            max_workers = 1 if interactive else min(compressed_input.ARCHIVE_MAX_WORKERS, len(sheet_names))
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                sheet_results = list(pool.map(process_sheet, sheet_names))
+        else:
+            sheet_results = [process_sheet(sheet_name) for sheet_name in sheet_names]
+
+        for sheet_result in sheet_results:
+            report_key, sheet_report, schema_analysis_json, inferred_table = sheet_result
+            all_sheet_reports[report_key] = sheet_report
+            if not first_schema_mismatch: first_schema_mismatch = schema_analysis_json
+            if not inferred_target_table and inferred_table: inferred_target_table = inferred_table
 
         # --- Final Output Assembly (Unchanged) ---
         base_file_name = os.path.basename(file_path)
-        if is_excel:
+        if is_excel or is_zip:
             final_output = {
                 "User_file_name": base_file_name,
                 "Processed_at": datetime.now(timezone.utc).isoformat(),
@@ -424,15 +643,20 @@ def run_multi_sheet_validation(file_path: str, db_url=DB_URL, user_provided_tabl
             final_output.update(csv_report)
         
         logging.info("--- [Step 5: Complete Validation Report] ---")
-        print("="*80)
-        print(" SCHEMA VALIDATOR POC - FINAL REPORT - [CONVERTED VERSION]")
-        print("="*80)
+        tracer = tracing.active_tracer()
+        if tracer is not None:
+            final_output["trace_summary"] = tracer.summary()
         final_report_str_pretty = json.dumps(final_output, indent=2)
-        print(final_report_str_pretty)
+        if print_report:
+            print("="*80)
+            print(" SCHEMA VALIDATOR POC - FINAL REPORT - [CONVERTED VERSION]")
+            print("="*80)
+            print(final_report_str_pretty)
 
-        with open("validation_report_converted.json", "w") as f:
-            f.write(final_report_str_pretty) 
-        logging.info("Combined report saved to validation_report_converted.json")
+        if report_path:
+            with open(report_path, "w") as f:
+                f.write(final_report_str_pretty) 
+            logging.info(f"Combined report saved to {report_path}")
         return final_output
 
     except Exception as e:
@@ -441,4 +665,9 @@ def run_multi_sheet_validation(file_path: str, db_url=DB_URL, user_provided_tabl
 # --- 10. Main Entry Point (Unchanged) ---
 if __name__ == "__main__":
     # This runs our main validation logic, NOT the test joke
-    run_multi_sheet_validation(file_path=FILE_PATH, user_provided_table_name=TABLE_NAME)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Validate a data file against its database table.")
+    parser.add_argument("--fast", action="store_true", help="Validate a random row sample and report violation rates with confidence intervals.")
+    parser.add_argument("--escalate", action="store_true", help="With --fast: run a full validation for sheets whose sample fails.")
+    parser.add_argument("--trace", metavar="PATH", default=None, help="Write a Chrome trace of the run's stages to PATH.")
+    args = parser.parse_args()
+    run_multi_sheet_validation(file_path=FILE_PATH, user_provided_table_name=TABLE_NAME, fast=args.fast, escalate=args.escalate, trace_path=args.trace)
\ No newline at end of file
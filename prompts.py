@@ -112,7 +112,13 @@ You will be given:
 Your Job:
 1.  Analyze the `sample_values` for each column.
 2.  Infer potential new validation rules (format checks, enum lists, range checks).
-3.  Return *ONLY* a single JSON list of rule objects. Do not add any other text, markdown, or explanations.
+3.  Fill in the machine-readable field of the rule's type, because the rules are executed against the full file.
+    Every rule has "column", "rule_type", "inferred_from_samples" and "rule_details", plus only the field(s) of its type:
+    * `format_check`: `"pattern"` - a Python regex the *whole* value must match, and nothing else (no notes inside the string).
+    * `enum_check`: `"allowed_values"` - the JSON list of allowed values.
+    * `range_check`: `"min"` and/or `"max"` - numeric bounds (inclusive).
+4.  Return *ONLY* a single JSON list of rule objects. Do not add any other text, markdown, or explanations.
+    The list must be valid JSON: escape every backslash of a regex (the regex `\\d` is written `"\\\\d"`).
 
 ---
 [INPUT DATA]
@@ -127,10 +133,26 @@ Produce a single JSON list in this *exact* format:
 
 [
   {{
-    "column": "ColumnName",
-    "rule_type": "[format_check | enum_check | range_check]",
-    "inferred_from_samples": ["sample1", "sample2"],
-    "rule_details": "Explain the inferred rule. E.g., 'Based on X/Y samples, this column appears to follow a regex format: ^[A-Z]{{3}}\\d{{4}}$' OR 'Column appears to be categorical. All samples were from the list: [\"ValueA\", \"ValueB\"]'"
+    "column": "OrderCode",
+    "rule_type": "format_check",
+    "inferred_from_samples": ["ABC1234", "XYZ0042"],
+    "pattern": "^[A-Z]{{3}}\\\\d{{4}}$",
+    "rule_details": "Based on 5/5 samples, this column appears to follow a regex format: ^[A-Z]{{3}}\\\\d{{4}}$"
+  }},
+  {{
+    "column": "ShippingMethod",
+    "rule_type": "enum_check",
+    "inferred_from_samples": ["Standard", "Express"],
+    "allowed_values": ["Standard", "Express", "Priority"],
+    "rule_details": "Column appears to be categorical. All samples were from the list: [\\"Standard\\", \\"Express\\", \\"Priority\\"]"
+  }},
+  {{
+    "column": "Quantity",
+    "rule_type": "range_check",
+    "inferred_from_samples": ["1", "10"],
+    "min": 0,
+    "max": 100,
+    "rule_details": "All samples are between 0 and 100."
   }}
 ]
 """
@@ -0,0 +1,272 @@
+import sys
+import json
+import logging
+import pandas as pd
+import sqlalchemy
+from sqlalchemy import inspect, select, func, case, and_, Table, MetaData
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+import tools
+import violation_matrix
+
+# --- SQL push-down validation ---
+# For data that already sits in a warehouse (staging) table, the checks of
+# tools.run_data_quality_checks are compiled to SQL and run where the data is, instead of
+# downloading the table into a DataFrame. All row-level checks (NOT NULL, simple CHECK
+# constraints, date range) share ONE scan: a single SELECT with a SUM(CASE WHEN ...) per
+# check. Primary key / UNIQUE duplicates and foreign key orphans need one GROUP BY query
+# each. Only the counts, plus up to SAMPLE_SIZE sample values per violated check, cross the
+# wire. Results use the usual violation dict format; rows of a table have no position, so
+# 'affected_rows_sample_indices' is empty and the samples are given as values.
+# Like find_check_constraint_violations, a CHECK is only evaluated on a column whose values
+# are all numeric: it is skipped for non-numeric column types, and dropped after the scan
+# when the column has nulls. Skipped CHECKs are listed in the result's 'skipped_checks'.
+
+SAMPLE_SIZE = 5
+
+_VIOLATES = { # CHECK '<col> <op> <value>' is violated when...
+    '>': lambda col, value: col <= value,
+    '>=': lambda col, value: col < value,
+    '<': lambda col, value: col >= value,
+    '<=': lambda col, value: col > value,
+    '!=': lambda col, value: col == value,
+    '=': lambda col, value: col != value,
+}
+
+
+def _row_checks(source: Table, db_schema: Dict[str, Any], source_columns: Dict[str, str], check_constraints: List[Dict[str, Any]],
+                min_date: str, max_date: Optional[str], max_future_days: int, reference_time: Optional[datetime],
+                skipped_checks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One entry per row-level check: the violation condition plus the fields of its violation dict.
+
+    CHECK constraints on a column with a non-numeric type are not evaluated; they are appended to skipped_checks.
+    """
+    now = pd.Timestamp(reference_time or datetime.now())
+    future_limit = now.normalize() + pd.Timedelta(days=max_future_days + 1)
+    window_start = pd.Timestamp(min_date)
+    window_end = pd.Timestamp(max_date) if max_date else None
+
+    checks = []
+    for db_col_name, db_col_details in db_schema.items():
+        if db_col_name not in source_columns:
+            continue
+        col = source.c[source_columns[db_col_name]]
+
+        if not db_col_details['nullable']:
+            checks.append({"column": db_col_name, "check": "not_null_violation", "condition": col.is_(None), "severity": "high",
+                           "details": "Column is non-nullable but contains {count} nulls."})
+
+        for constraint in check_constraints:
+            sqltext = constraint.get('sqltext', '').strip()
+            if db_col_name not in sqltext:
+                continue
+            parsed_check = tools.parse_simple_check_constraint(sqltext, db_col_name)
+            if parsed_check is None:
+                logging.info(f"Skipping CHECK constraint for column '{db_col_name}' as it is too complex to push down: '{sqltext}'")
+                continue
+            if not isinstance(col.type, (sqlalchemy.types.Integer, sqlalchemy.types.Numeric, sqlalchemy.types.Float)):
+                skipped_checks.append({"column": db_col_name, "constraint_name": constraint.get('name'), "sqltext": sqltext,
+                                       "reason": f"column type {col.type} is not numeric"})
+                continue
+            operator, value = parsed_check
+            checks.append({"column": db_col_name, "check": "check_constraint_violation", "constraint_name": constraint.get('name'),
+                           "sqltext": sqltext, "condition": and_(col.isnot(None), _VIOLATES[operator](col, value)), "severity": "medium",
+                           "details": f"{{count}} values violate CHECK constraint '{sqltext}'."})
+
+        db_type_base = str(db_col_details['type']).split('(')[0].upper()
+        if db_type_base in tools.DATE_DB_TYPES:
+            as_bound = (lambda ts: ts.date()) if db_type_base == 'DATE' else (lambda ts: ts.to_pydatetime())
+            checks.append({"column": db_col_name, "check": "future_date_violation", "condition": col >= as_bound(future_limit),
+                           "severity": "medium", "details": f"{{count}} dates are later than {(future_limit - pd.Timedelta(days=1)).date()}."})
+            out_of_window = col < as_bound(window_start)
+            if window_end is not None:
+                out_of_window = out_of_window | (col > as_bound(window_end))
+            checks.append({"column": db_col_name, "check": "date_out_of_window_violation", "condition": out_of_window, "severity": "medium",
+                           "details": f"{{count}} dates fall outside the allowed window [{window_start.date()}, {window_end.date() if window_end is not None else 'open'}]."})
+    return checks
+
+
+def _sample_values(conn: sqlalchemy.engine.Connection, query: sqlalchemy.sql.Select) -> List[str]:
+    return ["|".join(str(v) for v in row) for row in conn.execute(query.limit(SAMPLE_SIZE))]
+
+
+def _key_duplicates(conn, source: Table, key_constraint: Dict[str, Any], key_columns: List[sqlalchemy.Column]) -> Optional[Dict[str, Any]]:
+    duplicated = (
+        select(*key_columns, func.count().label('n'))
+        .where(and_(*(c.isnot(None) for c in key_columns)))
+        .group_by(*key_columns)
+        .having(func.count() > 1)
+        .subquery()
+    )
+    distinct_keys_duplicated, duplicate_record_count = conn.execute(select(func.count(), func.sum(duplicated.c.n))).one()
+    if not distinct_keys_duplicated:
+        return None
+    names = key_constraint["columns"]
+    is_primary_key = key_constraint["type"] == "primary_key"
+    key_label = "Primary key" if is_primary_key else f"UNIQUE constraint '{key_constraint['name']}'"
+    return {
+        "column": ", ".join(names),
+        "columns": names,
+        "check": "primary_key_violation" if is_primary_key else "unique_constraint_violation",
+        "check_id": violation_matrix.make_check_id("primary_key_violation" if is_primary_key else "unique_constraint_violation", ", ".join(names), key_constraint["name"]),
+        "constraint_name": key_constraint["name"],
+        "distinct_keys_duplicated": int(distinct_keys_duplicated),
+        "total_duplicate_records": int(duplicate_record_count),
+        "sample_duplicate_values": _sample_values(conn, select(*(duplicated.c[c.name] for c in key_columns))),
+        "affected_rows_sample_indices": [],
+        "severity": "high",
+        "details": f"{key_label} contains duplicates for {distinct_keys_duplicated} unique key(s), affecting {duplicate_record_count} records total."
+    }
+
+
+def _foreign_key_orphans(conn, engine: sqlalchemy.engine.Engine, fk: Dict[str, Any], key_columns: List[sqlalchemy.Column]) -> Optional[Dict[str, Any]]:
+    referenced = Table(fk['referred_table'], MetaData(), autoload_with=engine, schema=fk.get('referred_schema'))
+    ref_columns = [referenced.c[name] for name in fk['referred_columns']]
+    orphans = (
+        select(*key_columns, func.count().label('n'))
+        .select_from(key_columns[0].table.outerjoin(referenced, and_(*(k == r for k, r in zip(key_columns, ref_columns)))))
+        .where(and_(*(c.isnot(None) for c in key_columns), ref_columns[0].is_(None)))
+        .group_by(*key_columns)
+        .subquery()
+    )
+    distinct_orphans, orphan_count = conn.execute(select(func.count(), func.sum(orphans.c.n))).one()
+    if not distinct_orphans:
+        return None
+    names = fk['constrained_columns']
+    referenced_label = f"{fk['referred_table']}({', '.join(fk['referred_columns'])})"
+    return {
+        "column": ", ".join(names),
+        "columns": names,
+        "check": "foreign_key_violation",
+        "check_id": violation_matrix.make_check_id("foreign_key_violation", ", ".join(names), fk.get('name')),
+        "constraint_name": fk.get('name'),
+        "referenced_table": fk['referred_table'],
+        "referenced_columns": fk['referred_columns'],
+        "count": int(orphan_count),
+        "distinct_orphan_keys": int(distinct_orphans),
+        "affected_rows_sample_indices": [],
+        "sample_orphan_values": _sample_values(conn, select(*(orphans.c[c.name] for c in key_columns))),
+        "severity": "high",
+        "details": f"{orphan_count} rows reference {distinct_orphans} key(s) that do not exist in {referenced_label}."
+    }
+
+
+def run_pushdown_checks(
+    engine: sqlalchemy.engine.Engine,
+    source_table: str,
+    target_table: str,
+    column_mapping: Optional[Dict[str, str]] = None,
+    source_schema: Optional[str] = None,
+    min_date: str = tools.DEFAULT_MIN_DATE,
+    max_date: Optional[str] = None,
+    max_future_days: int = 0,
+    reference_time: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    Validates the rows of source_table (e.g. a staging table) against the schema and constraints of target_table, in SQL.
+
+    Runs NOT NULL, simple CHECK, date range, primary key / UNIQUE and foreign key checks (see the
+    module comment for the queries). column_mapping maps source column names to target column
+    names where they differ. Date parse checks need the values and are not pushed down.
+    Returns a summary dict with 'total_rows', 'queries', 'dq_violations' in the format of
+    tools.run_data_quality_checks and 'skipped_checks' (CHECKs on columns that are not all numeric).
+    """
+    db_schema = tools.get_db_schema(engine, target_table)
+    if db_schema is None:
+        raise ValueError(f"Database table '{target_table}' does not exist.")
+    source = Table(source_table, MetaData(), autoload_with=engine, schema=source_schema)
+    mapping = column_mapping or {}
+    source_columns = {mapping.get(col.name, col.name): col.name for col in source.columns} # target name -> source name
+    source_columns = {target: src for target, src in source_columns.items() if target in db_schema}
+
+    inspector = inspect(engine)
+    try:
+        check_constraints = inspector.get_check_constraints(target_table)
+    except Exception as e:
+        logging.warning(f"Could not fetch CHECK constraints for table '{target_table}': {e}. Skipping CHECK constraint validation.")
+        check_constraints = []
+
+    dq_violations = []
+    skipped_checks = []
+    queries = 0
+    with engine.connect() as conn:
+        # --- 1. Row-level checks: one scan for all of them ---
+        checks = _row_checks(source, db_schema, source_columns, check_constraints, min_date, max_date, max_future_days, reference_time, skipped_checks)
+        # Null counts of the CHECK columns ride along: a CHECK is only evaluated on all-numeric (null-free) columns
+        check_columns = sorted({check["column"] for check in checks if check["check"] == "check_constraint_violation"})
+        conditions = [check["condition"] for check in checks] + [source.c[source_columns[name]].is_(None) for name in check_columns]
+        scan = select(func.count().label('total_rows'), *(
+            func.coalesce(func.sum(case((condition, 1), else_=0)), 0).label(f"c{i}") for i, condition in enumerate(conditions)
+        )).select_from(source)
+        counts = conn.execute(scan).one()
+        queries += 1
+        total_rows = int(counts[0])
+        null_counts = dict(zip(check_columns, counts[1 + len(checks):]))
+        for check, count in zip(checks, counts[1:1 + len(checks)]):
+            if check["check"] == "check_constraint_violation" and null_counts[check["column"]]:
+                skipped_checks.append({"column": check["column"], "constraint_name": check.get("constraint_name"), "sqltext": check["sqltext"],
+                                       "reason": f"column has {int(null_counts[check['column']])} nulls, so not all values are numeric"})
+                continue
+            if not count:
+                continue
+            violation = {k: v for k, v in check.items() if k not in ("condition", "details")}
+            column = source.c[source_columns[check["column"]]]
+            violation.update({
+                "check_id": violation_matrix.make_check_id(check["check"], check["column"], check.get("constraint_name")),
+                "count": int(count),
+                "affected_rows_sample_indices": [],
+                "sample_violating_values": _sample_values(conn, select(column).where(check["condition"])),
+                "severity": check["severity"],
+                "details": check["details"].format(count=int(count)),
+            })
+            queries += 1
+            dq_violations.append(violation)
+
+        # --- 2. Primary key and UNIQUE duplicates: one GROUP BY per key ---
+        for key_constraint in tools.get_key_constraints(db_schema):
+            if any(col not in source_columns for col in key_constraint["columns"]):
+                continue
+            violation = _key_duplicates(conn, source, key_constraint, [source.c[source_columns[col]] for col in key_constraint["columns"]])
+            queries += 1 if violation is None else 2
+            if violation:
+                dq_violations.append(violation)
+
+        # --- 3. Foreign keys: one anti-join per constraint, in the database ---
+        try:
+            foreign_keys = inspector.get_foreign_keys(target_table)
+        except Exception as e:
+            logging.warning(f"Could not fetch FOREIGN KEY constraints for table '{target_table}': {e}. Skipping foreign key validation.")
+            foreign_keys = []
+        for fk in foreign_keys:
+            key_names = fk.get('constrained_columns', [])
+            if not key_names or any(col not in source_columns for col in key_names):
+                continue
+            try:
+                violation = _foreign_key_orphans(conn, engine, fk, [source.c[source_columns[col]] for col in key_names])
+                queries += 1 if violation is None else 2
+                if violation:
+                    dq_violations.append(violation)
+            except Exception as fk_err:
+                logging.warning(f"Could not evaluate foreign key {key_names} -> '{fk.get('referred_table')}': {fk_err}")
+
+    for skipped in skipped_checks:
+        logging.info(f"Skipping CHECK constraint '{skipped['sqltext']}' on column '{skipped['column']}': {skipped['reason']}.")
+    logging.info(f"Push-down validation of '{source_table}' against '{target_table}' complete: {total_rows} rows, "
+                 f"{len(dq_violations)} violations, {queries} queries.")
+    return {
+        "source_table": source_table,
+        "target_table": target_table,
+        "total_rows": total_rows,
+        "queries": queries,
+        "dq_violations": dq_violations,
+        "skipped_checks": skipped_checks,
+    }
+
+
+# --- Usage: python pushdown_validation.py <db_url> <source_table> <target_table> ---
+if __name__ == "__main__":
+    import engine_registry
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if len(sys.argv) != 4:
+        sys.exit("Usage: python pushdown_validation.py <db_url> <source_table> <target_table>")
+    print(json.dumps(run_pushdown_checks(engine_registry.get_engine(sys.argv[1]), sys.argv[2], sys.argv[3]), indent=2, default=str))
@@ -0,0 +1,194 @@
+import re
+import json
+import logging
+import functools
+import pandas as pd
+from pandas import DataFrame
+from typing import Dict, Any, List, Optional, Iterable
+import tools
+
+# --- Execution engine for LLM-inferred dynamic validation rules ---
+# get_dynamic_rules_prompt() asks the LLM for rule objects (format_check / enum_check /
+# range_check). This module compiles them into vectorized checks and runs them over the
+# full column (or chunk by chunk), attaching real violation counts and sample offenders
+# to every rule under "execution". A rule that cannot be compiled is reported with
+# status "compile_error", and one that fails while running over the data with status
+# "execution_error", instead of failing the sheet.
+
+MAX_SAMPLES = 5
+
+
+class RuleCompileError(ValueError):
+    """Raised when a rule object cannot be turned into an executable check."""
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_regex(pattern: str) -> re.Pattern:
+    return re.compile(pattern)
+
+
+def _extract_pattern(rule: Dict[str, Any]) -> str:
+    pattern = rule.get("pattern")
+    if not pattern:
+        # Fall back to the free-text details, e.g. "... a regex format: ^[A-Z]{3}\d{4}$"
+        match = re.search(r"regex(?:\s+format)?\s*:?\s*`?(\S+?)`?['\".,]*(?:\s|$)", rule.get("rule_details", ""), re.IGNORECASE)
+        if not match:
+            raise RuleCompileError("No regex pattern found in rule.")
+        pattern = match.group(1)
+    try:
+        _compile_regex(pattern)
+    except re.error as e:
+        raise RuleCompileError(f"Invalid regex '{pattern}': {e}")
+    # fullmatch anchors the whole pattern; the group keeps alternations such as '^a|b$' intact
+    # (anchors inside it are harmless)
+    return f"(?:{pattern})"
+
+
+def _extract_allowed_values(rule: Dict[str, Any]) -> List[str]:
+    values = rule.get("allowed_values")
+    if values is None:
+        # Fall back to the first JSON list in the details, e.g. 'from the list: ["A", "B"]'
+        match = re.search(r"\[[^\[\]]*\]", rule.get("rule_details", ""))
+        if not match:
+            raise RuleCompileError("No list of allowed values found in rule.")
+        try:
+            values = json.loads(match.group(0))
+        except json.JSONDecodeError as e:
+            raise RuleCompileError(f"Could not parse allowed values {match.group(0)}: {e}")
+    if not isinstance(values, list) or not values:
+        raise RuleCompileError("Allowed values must be a non-empty list.")
+    return [str(v) for v in values]
+
+
+def _extract_range(rule: Dict[str, Any]) -> (Optional[float], Optional[float]):
+    min_value, max_value = rule.get("min"), rule.get("max")
+    if min_value is None and max_value is None:
+        # Fall back to "between X and Y" in the details
+        match = re.search(r"between\s+(-?\d+(?:\.\d+)?)\s+and\s+(-?\d+(?:\.\d+)?)", rule.get("rule_details", ""), re.IGNORECASE)
+        if not match:
+            raise RuleCompileError("No min/max bounds found in rule.")
+        min_value, max_value = match.group(1), match.group(2)
+    try:
+        min_value = float(min_value) if min_value is not None else None
+        max_value = float(max_value) if max_value is not None else None
+    except (TypeError, ValueError) as e:
+        raise RuleCompileError(f"Range bounds are not numeric: {e}")
+    if min_value is not None and max_value is not None and min_value > max_value:
+        raise RuleCompileError(f"Range is empty: min {min_value} > max {max_value}.")
+    return min_value, max_value
+
+
+def compile_rule(rule: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compiles one rule object into an executable check description.
+
+    Structured fields ('pattern', 'allowed_values', 'min'/'max') are preferred; the free-text
+    'rule_details' is parsed as a fallback. Raises RuleCompileError if the rule is unusable.
+    """
+    if not isinstance(rule, dict) or not rule.get("column"):
+        raise RuleCompileError("Rule is not an object with a 'column'.")
+    rule_type = str(rule.get("rule_type", "")).strip().lower()
+
+    if rule_type == "format_check":
+        return {"column": rule["column"], "rule_type": rule_type, "pattern": _extract_pattern(rule)}
+    if rule_type == "enum_check":
+        allowed_values = _extract_allowed_values(rule)
+        # Numeric columns are matched by value, so 1.0 in a float column matches an allowed "1"
+        allowed_numbers = pd.to_numeric(pd.Series(allowed_values, dtype=object), errors='coerce').dropna().unique().tolist()
+        return {"column": rule["column"], "rule_type": rule_type, "allowed_values": frozenset(allowed_values), "allowed_numbers": allowed_numbers}
+    if rule_type == "range_check":
+        min_value, max_value = _extract_range(rule)
+        return {"column": rule["column"], "rule_type": rule_type, "min": min_value, "max": max_value}
+    raise RuleCompileError(f"Unsupported rule_type '{rule.get('rule_type')}'.")
+
+
+def _violation_mask(column_data: pd.Series, compiled: Dict[str, Any]) -> pd.Series:
+    """Returns a boolean mask over the non-null values of the column: True = violates the rule."""
+    values = column_data.dropna()
+    rule_type = compiled["rule_type"]
+    if rule_type == "format_check":
+        matches = tools.values_as_text(values).str.fullmatch(_compile_regex(compiled["pattern"]))
+        return ~matches.fillna(False).astype(bool)
+    if rule_type == "enum_check":
+        if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+            return ~values.isin(compiled["allowed_numbers"])
+        return ~tools.values_as_text(values).isin(compiled["allowed_values"])
+    # range_check: non-numeric values are out of range as well
+    numeric = pd.to_numeric(values, errors='coerce')
+    violated = numeric.isna()
+    if compiled["min"] is not None:
+        violated |= numeric < compiled["min"]
+    if compiled["max"] is not None:
+        violated |= numeric > compiled["max"]
+    return violated
+
+
+def run_dynamic_rules_chunked(chunks: Iterable[DataFrame], rules: List[Any]) -> List[Any]:
+    """
+    Runs the dynamic rules over a stream of DataFrame chunks (same columns, global row index).
+
+    Returns the rules in their original order, each with an added "execution" block:
+    status ('executed' | 'compile_error' | 'execution_error' | 'skipped'), checked_rows,
+    violation_count, sample_offenders and affected_rows_sample_indices. 'compile_error' means
+    the rule itself is unusable; 'execution_error' means it failed on the column's data.
+    Both carry an 'error' message.
+    """
+    if not isinstance(rules, list):
+        logging.warning("Dynamic rules are not a list. Skipping rule execution.")
+        return rules
+
+    compiled_rules: Dict[int, Dict[str, Any]] = {}
+    executions: Dict[int, Dict[str, Any]] = {}
+    for i, rule in enumerate(rules):
+        try:
+            compiled_rules[i] = compile_rule(rule)
+            executions[i] = {"status": "executed", "checked_rows": 0, "violation_count": 0,
+                             "sample_offenders": [], "affected_rows_sample_indices": []}
+        except RuleCompileError as e:
+            logging.warning(f"Could not compile dynamic rule #{i} ({rule.get('column') if isinstance(rule, dict) else rule}): {e}")
+            executions[i] = {"status": "compile_error", "error": str(e)}
+
+    seen_columns = set()
+    for chunk in chunks:
+        seen_columns.update(map(str, chunk.columns))
+        for i, compiled in compiled_rules.items():
+            column = compiled["column"]
+            if column not in chunk.columns or isinstance(chunk[column], pd.DataFrame):
+                continue
+            execution = executions[i]
+            if execution["status"] != "executed":
+                continue
+            try:
+                column_data = chunk[column]
+                violated = _violation_mask(column_data, compiled)
+                execution["checked_rows"] += int(len(violated))
+                violation_count = int(violated.sum())
+                if violation_count:
+                    execution["violation_count"] += violation_count
+                    room = MAX_SAMPLES - len(execution["sample_offenders"])
+                    if room > 0:
+                        offenders = violated.index[violated.to_numpy()][:room]
+                        execution["affected_rows_sample_indices"].extend(offenders.tolist())
+                        execution["sample_offenders"].extend(tools.values_as_text(column_data.loc[offenders]).tolist())
+            except Exception as e:
+                logging.warning(f"Dynamic rule #{i} on column '{column}' failed during execution: {e}")
+                executions[i] = {"status": "execution_error", "error": f"Execution failed: {e}"}
+
+    annotated = []
+    for i, rule in enumerate(rules):
+        execution = executions[i]
+        if i in compiled_rules and compiled_rules[i]["column"] not in seen_columns:
+            execution = {"status": "skipped", "reason": f"Column '{compiled_rules[i]['column']}' not found in data."}
+        elif execution["status"] == "executed":
+            checked = execution["checked_rows"]
+            execution["violation_rate"] = round(execution["violation_count"] / checked, 6) if checked else 0.0
+        annotated.append({**rule, "execution": execution} if isinstance(rule, dict) else rule)
+
+    executed = sum(1 for i in executions if executions[i]["status"] == "executed")
+    logging.info(f"Dynamic rule execution complete. Executed {executed}/{len(rules)} rules.")
+    return annotated
+
+
+def run_dynamic_rules(df: DataFrame, rules: List[Any]) -> List[Any]:
+    """Runs the dynamic rules over a full DataFrame. See run_dynamic_rules_chunked()."""
+    return run_dynamic_rules_chunked([df], rules)
@@ -0,0 +1,274 @@
+import io
+import os
+import math
+import logging
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from typing import Dict, Any, List, Optional, Iterator, Iterable, Callable, Tuple
+import tools
+import columnar_input
+import compressed_input
+
+# --- Fast (sampling-based) validation ---
+# Triage mode for very large files: instead of reading every row, a random row sample is
+# drawn in batches and the checks run batch by batch. After every batch each violation
+# rate gets a Wilson confidence interval, and sampling stops early as soon as every
+# interval lies clearly above or below the failure threshold.
+#
+# Plain CSV files are sampled without a full read: every batch seeks to one random offset
+# in each of N equal byte ranges (strata) of the file and takes a few complete lines
+# there. Row indices are then byte offsets of the sampled lines, and quoted fields that
+# contain line breaks are not supported. Everything else (compressed CSV, zip members,
+# Excel, Parquet/Arrow) is read once in chunks with reservoir sampling (bottom-k random
+# keys), which keeps exact row indices.
+
+FAST_SAMPLE_ROWS = 100_000 # Upper bound on the sample size
+SAMPLE_BATCH_ROWS = 10_000 # Rows per batch; the verdict is re-evaluated after every batch
+SAMPLE_BLOCK_BYTES = 16 * 1024 # Bytes read at every sampled offset
+SAMPLE_LINES_PER_BLOCK = 16
+RESERVOIR_CHUNK_ROWS = 1_000_000
+CONFIDENCE_Z = 1.96 # 95% confidence
+FAST_FAIL_RATE = 0.05 # A check "fails" the file when its violation rate is above this
+
+# Checks whose counts are per-row, so sample rates estimate the file's rates
+RATE_CHECKS = {
+    "not_null_violation", "check_constraint_violation", "foreign_key_violation",
+    "date_parse_violation", "future_date_violation", "date_out_of_window_violation",
+    "cross_batch_duplicate_key", "type_mismatch",
+}
+
+
+def wilson_interval(count: int, n: int, z: float = CONFIDENCE_Z) -> Tuple[float, float]:
+    """Wilson score interval for a proportion count/n. Well-behaved for rates near 0 and small n."""
+    if n <= 0:
+        return 0.0, 1.0
+    p = count / n
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+
+# --- Sample sources ---
+def _reservoir_sample(chunks: Iterable[DataFrame], sample_rows: int, rng: np.random.Generator) -> (DataFrame, int):
+    """Uniform sample of sample_rows rows from a stream of chunks, in random order. Returns (sample, rows_seen)."""
+    reservoir, keys, rows_seen = None, None, 0
+    for chunk in chunks:
+        chunk_keys = rng.random(len(chunk))
+        rows_seen += len(chunk)
+        if reservoir is None:
+            reservoir, keys = chunk, chunk_keys
+        else:
+            reservoir, keys = pd.concat([reservoir, chunk]), np.concatenate([keys, chunk_keys])
+        if len(reservoir) > sample_rows:
+            keep = np.argpartition(keys, sample_rows)[:sample_rows]
+            reservoir, keys = reservoir.iloc[keep], keys[keep]
+    if reservoir is None:
+        return pd.DataFrame(), 0
+    return reservoir.iloc[np.argsort(keys)], rows_seen
+
+
+def _estimate_csv_rows(file_path: str) -> int:
+    """Row count of a plain CSV estimated from the average line length of its first block."""
+    with open(file_path, 'rb') as f:
+        f.readline()
+        data_start = f.tell()
+        first_block = f.read(SAMPLE_BLOCK_BYTES)
+    complete = first_block[:first_block.rfind(b"\n") + 1]
+    line_count = complete.count(b"\n")
+    if not line_count:
+        return 0
+    return int((os.path.getsize(file_path) - data_start) / (len(complete) / line_count))
+
+
+def _byte_sample_batches(file_path: str, sample_rows: int, batch_rows: int, rng: np.random.Generator) -> Iterator[DataFrame]:
+    """Stratified byte-offset sampling of a plain CSV. See the module comment."""
+    file_size = os.path.getsize(file_path)
+    blocks_per_batch = max(1, math.ceil(batch_rows / SAMPLE_LINES_PER_BLOCK))
+    seen_offsets = set()
+    sampled = 0
+    with open(file_path, 'rb') as f:
+        header = f.readline()
+        data_start = f.tell()
+        while sampled < sample_rows:
+            strata = np.linspace(data_start, file_size, blocks_per_batch + 1)
+            offsets = (strata[:-1] + rng.random(blocks_per_batch) * np.diff(strata)).astype(np.int64)
+            lines, line_offsets = [], []
+            for offset in offsets:
+                # Start reading one byte early so a line starting exactly at the offset is kept
+                f.seek(offset - 1)
+                block = f.read(SAMPLE_BLOCK_BYTES)
+                start = block.find(b"\n") + 1
+                end = block.rfind(b"\n") + 1
+                if start == 0 or end <= start:
+                    continue
+                block_lines = block[start:end].splitlines(keepends=True)
+                block_offsets = offset - 1 + start + np.cumsum([0] + [len(line) for line in block_lines[:-1]])
+                for i in rng.permutation(len(block_lines))[:SAMPLE_LINES_PER_BLOCK]:
+                    line_offset = int(block_offsets[i])
+                    if line_offset not in seen_offsets and block_lines[i].strip():
+                        seen_offsets.add(line_offset)
+                        lines.append(block_lines[i])
+                        line_offsets.append(line_offset)
+            if not lines:
+                return
+            lines, line_offsets = lines[:sample_rows - sampled], line_offsets[:sample_rows - sampled]
+            batch = pd.read_csv(io.BytesIO(header + b"".join(lines)))
+            batch.index = pd.Index(line_offsets[:len(batch)], name="byte_offset")
+            sampled += len(batch)
+            yield batch
+
+
+def iter_sample_batches(
+    file_path: str,
+    sheet_name: Optional[str] = None,
+    sample_rows: int = FAST_SAMPLE_ROWS,
+    batch_rows: int = SAMPLE_BATCH_ROWS,
+    seed: int = 0,
+    info: Optional[Dict[str, Any]] = None
+) -> Iterator[DataFrame]:
+    """
+    Yields random row samples of a file (or of one Excel sheet / zip member) in batches of batch_rows.
+
+    Every prefix of the batches is itself a random sample of the whole file, so the caller can stop
+    after any batch. 'info' (if given) is filled with the sampling method, the row index basis and the
+    (estimated) total row count.
+    """
+    info = info if info is not None else {}
+    rng = np.random.default_rng(seed)
+    lower_path = file_path.lower()
+    is_excel = lower_path.endswith(('.xls', '.xlsx'))
+    is_zip = compressed_input.is_zip_archive(file_path)
+
+    if not (is_excel or is_zip or columnar_input.is_columnar_file(file_path) or compressed_input.is_compressed_csv(file_path)):
+        # Plain CSV: only worth seeking around if the file is clearly larger than the sample
+        estimated_rows = _estimate_csv_rows(file_path)
+        if estimated_rows > 2 * sample_rows:
+            info.update(method="stratified_byte_offsets", row_index_basis="byte_offset", estimated_total_rows=estimated_rows)
+            yield from _byte_sample_batches(file_path, sample_rows, batch_rows, rng)
+            return
+
+    info.update(method="reservoir", row_index_basis="row_number")
+    if is_excel:
+        chunks = [pd.read_excel(file_path, sheet_name=sheet_name)]
+    elif columnar_input.is_columnar_file(file_path):
+        chunks = columnar_input.iter_columnar_chunks(file_path)
+    else:
+        chunks = compressed_input.iter_csv_chunks(file_path, member=sheet_name if is_zip else None, chunksize=RESERVOIR_CHUNK_ROWS)
+    sample, rows_seen = _reservoir_sample(chunks, sample_rows, rng)
+    info["estimated_total_rows"] = rows_seen
+    for start in range(0, len(sample), batch_rows):
+        yield sample.iloc[start:start + batch_rows]
+
+
+# --- Estimation ---
+class SampleEstimator:
+    """Accumulates violation counts over sample batches and derives rates, confidence intervals and a verdict."""
+
+    def __init__(self, fail_rate: float = FAST_FAIL_RATE, z: float = CONFIDENCE_Z):
+        self.fail_rate = fail_rate
+        self.z = z
+        self.rows = 0
+        self.counts: Dict[tuple, int] = {}
+        self.severities: Dict[tuple, str] = {}
+        self.observed_only: Dict[tuple, Dict[str, Any]] = {}
+
+    def add(self, rows: int, type_violations: List[Dict[str, Any]], dq_violations: List[Dict[str, Any]]) -> None:
+        self.rows += rows
+        for violation in type_violations:
+            if violation.get("parse_rate") is None:
+                continue # A dtype mismatch without a parse rate has no per-row count
+            key = (violation["column"], "type_mismatch")
+            self.counts[key] = self.counts.get(key, 0) + int(round((1 - violation["parse_rate"]) * rows))
+            self.severities[key] = "high"
+        for violation in dq_violations:
+            key = (violation.get("column"), violation.get("check"))
+            if violation.get("check") in RATE_CHECKS and "count" in violation:
+                self.counts[key] = self.counts.get(key, 0) + int(violation["count"])
+                self.severities[key] = violation.get("severity", "medium")
+            else:
+                # e.g. duplicate keys: present in the sample, but their rate does not scale to the file
+                self.observed_only[key] = {"column": key[0], "check": key[1], "severity": violation.get("severity")}
+
+    def estimates(self) -> List[Dict[str, Any]]:
+        estimates = []
+        for (column, check), count in sorted(self.counts.items(), key=lambda item: -item[1]):
+            low, high = wilson_interval(count, self.rows, self.z)
+            estimates.append({
+                "column": column,
+                "check": check,
+                "severity": self.severities[(column, check)],
+                "sample_violations": count,
+                "sample_rows": self.rows,
+                "violation_rate": round(count / self.rows, 6) if self.rows else None,
+                "ci_low": round(low, 6),
+                "ci_high": round(high, 6),
+            })
+        return estimates
+
+    def verdict(self) -> str:
+        """'fail' if some rate is above fail_rate with confidence, 'pass' if all are below, else 'inconclusive'."""
+        if self.rows == 0:
+            return "inconclusive"
+        estimates = self.estimates()
+        if any(e["ci_low"] > self.fail_rate for e in estimates):
+            return "fail"
+        # Checks that never fired are bounded by the interval of 0 violations
+        unseen_high = wilson_interval(0, self.rows, self.z)[1]
+        if all(e["ci_high"] < self.fail_rate for e in estimates) and unseen_high < self.fail_rate:
+            return "pass"
+        return "inconclusive"
+
+
+def run_sampled_checks(
+    batches: Iterable[DataFrame],
+    run_checks: Callable[[DataFrame], Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]],
+    fail_rate: float = FAST_FAIL_RATE,
+    z: float = CONFIDENCE_Z,
+    info: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Runs run_checks(batch) -> (type_violations, dq_violations) over sample batches until the verdict is decided.
+
+    Returns the merged violations of the consumed batches, the consumed sample itself
+    ('sample', for checks that need the rows, e.g. dynamic rules) and a 'sampling_report'
+    with per-check rates, confidence intervals and the verdict.
+    """
+    estimator = SampleEstimator(fail_rate, z)
+    type_merged: Dict[str, Dict[str, Any]] = {}
+    dq_merged: Dict[tuple, Dict[str, Any]] = {}
+    consumed: List[DataFrame] = []
+    early_stop = False
+    for batch in batches:
+        type_violations, dq_violations = run_checks(batch)
+        estimator.add(len(batch), type_violations, dq_violations)
+        tools.merge_type_violations(type_merged, type_violations, len(batch))
+        tools.merge_violations(dq_merged, dq_violations)
+        consumed.append(batch)
+        if estimator.verdict() != "inconclusive":
+            early_stop = True
+            break
+    close = getattr(batches, "close", None)
+    if close is not None:
+        close() # Stop reading the file once the verdict is in
+
+    verdict = estimator.verdict()
+    sampling_report = {
+        **(info or {}),
+        "sample_rows": estimator.rows,
+        "batches": len(consumed),
+        "confidence_level": round(math.erf(z / math.sqrt(2)), 4),
+        "fail_rate_threshold": fail_rate,
+        "verdict": verdict,
+        "early_verdict": early_stop,
+        "estimates": estimator.estimates(),
+        "observed_in_sample": list(estimator.observed_only.values()),
+    }
+    logging.info(f"Sampled validation: verdict '{verdict}' after {estimator.rows} rows in {len(consumed)} batch(es).")
+    return {
+        "sample": pd.concat(consumed) if consumed else pd.DataFrame(),
+        "type_violations": tools.finalize_type_violations(type_merged),
+        "dq_violations": list(dq_merged.values()),
+        "sampling_report": sampling_report,
+    }
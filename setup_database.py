@@ -1,12 +1,34 @@
 import sqlite3
 import os
+import sys
+import time
+import random
+import argparse
+import numpy as np
+import synthetic_data
 
 # Define the path for the database
 DB_DIR = "database"
 DB_PATH = os.path.join(DB_DIR, "sample_data.db")
 
-# Ensure the database directory exists
-os.makedirs(DB_DIR, exist_ok=True)
+# --- Scale options ---
+# By default the reference database gets the three sample rows per table, as before.
+# --orders / --products add that many synthetic rows (synthetic_data.py, clean, deterministic
+# by --seed), --order-items adds an order_items table whose foreign keys reference them, and
+# --extra-tables adds hundreds of unrelated tables for catalog-scale reflection and matching.
+# Bulk loads use executemany in batches inside one transaction, with WAL and relaxed
+# synchronous / large cache pragmas; secondary indexes are built after the load.
+DEFAULT_BATCH_ROWS = 100_000
+LOAD_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=OFF", # Safe here: an interrupted load is simply regenerated
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-262144", # 256 MB page cache
+    "PRAGMA mmap_size=1073741824",
+)
+EXTRA_TABLE_TYPES = ("INTEGER", "REAL", "TEXT", "DATE", "VARCHAR(64)", "NUMERIC(10,2)", "BOOLEAN", "TIMESTAMP")
+EXTRA_TABLE_WORDS = ("sales", "inventory", "ledger", "payments", "shipments", "returns", "users", "events",
+                     "invoices", "suppliers", "claims", "sessions", "budgets", "tickets", "leads", "assets")
 
 # SQL statements for creating tables
 create_customer_orders_table = """
@@ -30,6 +52,26 @@ CREATE TABLE IF NOT EXISTS products (
 );
 """
 
+create_order_items_table = """
+CREATE TABLE IF NOT EXISTS order_items (
+    ItemID INTEGER PRIMARY KEY NOT NULL,
+    OrderID TEXT NOT NULL REFERENCES customer_orders(OrderID),
+    ProductID TEXT NOT NULL REFERENCES products(ProductID),
+    Quantity INTEGER NOT NULL CHECK(Quantity > 0)
+);
+"""
+
+# Built after the bulk load, which is much faster than maintaining them row by row
+create_indexes = [
+    "CREATE INDEX IF NOT EXISTS idx_customer_orders_customer ON customer_orders(CustomerID)",
+    "CREATE INDEX IF NOT EXISTS idx_customer_orders_date ON customer_orders(OrderDate)",
+    "CREATE INDEX IF NOT EXISTS idx_products_category ON products(Category)",
+]
+create_order_items_indexes = [
+    "CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items(OrderID)",
+    "CREATE INDEX IF NOT EXISTS idx_order_items_product ON order_items(ProductID)",
+]
+
 # SQL statements for inserting sample historical data
 insert_orders_data = """
 INSERT INTO customer_orders (OrderID, CustomerID, OrderDate, Quantity, Price, DiscountCode)
@@ -46,44 +88,164 @@ VALUES
     ('PROD002', 'Mouse', 'Electronics', 25.50, 150),
     ('PROD003', 'Coffee Mug', 'Homeware', 15.00, 300);
 """
+SAMPLE_ROWS = 3
+
+
+def bulk_insert_synthetic(cursor, table: str, shape: str, rows: int, seed: int, batch_rows: int = DEFAULT_BATCH_ROWS) -> None:
+    """Inserts rows of synthetic_data's clean shape into a table with the same base columns."""
+    columns = [name for name, _ in synthetic_data.SHAPES[shape]]
+    insert_sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    started = time.perf_counter()
+    for chunk in synthetic_data.iter_chunks(shape, rows, seed=seed, chunk_rows=batch_rows):
+        # Object columns -> Python values; None stays NULL
+        cursor.executemany(insert_sql, chunk.astype(object).itertuples(index=False, name=None))
+    print(f"Inserted {rows} synthetic rows into '{table}' in {time.perf_counter() - started:.1f}s.")
+
+
+def bulk_insert_order_items(cursor, rows: int, orders: int, products: int, seed: int, batch_rows: int = DEFAULT_BATCH_ROWS) -> None:
+    """Order lines referencing the synthetic orders and products (valid foreign keys)."""
+    rng = np.random.default_rng([seed, 1])
+    started = time.perf_counter()
+    for start in range(0, rows, batch_rows):
+        n = min(batch_rows, rows - start)
+        item_ids = np.arange(start + 1, start + n + 1)
+        order_keys = synthetic_data.make_keys("ORD", rng.integers(0, orders, n))
+        product_keys = synthetic_data.make_keys("PROD", rng.integers(0, products, n))
+        quantities = rng.integers(1, 10, n)
+        cursor.executemany("INSERT INTO order_items (ItemID, OrderID, ProductID, Quantity) VALUES (?, ?, ?, ?)",
+                           zip(item_ids.tolist(), order_keys.tolist(), product_keys.tolist(), quantities.tolist()))
+    print(f"Inserted {rows} rows into 'order_items' in {time.perf_counter() - started:.1f}s.")
+
+
+def extra_table_column(rng: np.random.Generator, sql_type: str, rows: int) -> np.ndarray:
+    """Random values for one extra-table column of the given SQL type."""
+    base = sql_type.split("(")[0]
+    if base == "BOOLEAN":
+        return rng.integers(0, 2, rows)
+    if base == "INTEGER":
+        return rng.integers(0, 100_001, rows)
+    if base in ("REAL", "NUMERIC"):
+        return np.round(rng.uniform(0, 10_000, rows), 2)
+    if base in ("DATE", "TIMESTAMP"):
+        return (np.datetime64("2020-01-01") + rng.integers(0, 6 * 365, rows).astype("timedelta64[D]")).astype(str)
+    return np.char.add("value_", rng.integers(0, 1000, rows).astype(str))
+
+
+def create_extra_tables(cursor, count: int, rows: int, seed: int) -> None:
+    """count unrelated tables of 3-30 columns each (deterministic by seed), with rows rows each."""
+    rng = random.Random(seed)
+    values_rng = np.random.default_rng([seed, 2])
+    started = time.perf_counter()
+    for i in range(1, count + 1):
+        table = f"{EXTRA_TABLE_WORDS[rng.randrange(len(EXTRA_TABLE_WORDS))]}_{i:04d}"
+        types = [EXTRA_TABLE_TYPES[rng.randrange(len(EXTRA_TABLE_TYPES))] for _ in range(rng.randint(2, 29))]
+        columns = ["id INTEGER PRIMARY KEY NOT NULL"] + [f"col_{j:02d} {t}{' NOT NULL' if rng.random() < 0.3 else ''}" for j, t in enumerate(types, start=1)]
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)})")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_col_01 ON {table}(col_01)")
+        if rows:
+            # Whole columns at once with numpy; .tolist() hands sqlite3 plain Python values
+            columns = [np.arange(1, rows + 1)] + [extra_table_column(values_rng, t, rows) for t in types]
+            cursor.executemany(f"INSERT INTO {table} VALUES ({', '.join('?' * (len(types) + 1))})",
+                               zip(*(column.tolist() for column in columns)))
+    print(f"Created {count} extra tables ({rows} rows each) in {time.perf_counter() - started:.1f}s.")
+
+
+def setup_database(db_path: str = DB_PATH, orders: int = 0, products: int = 0, order_items: int = 0, extra_tables: int = 0,
+                   extra_table_rows: int = 0, seed: int = 0, batch_rows: int = DEFAULT_BATCH_ROWS, reset: bool = False) -> None:
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    if reset:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+    bulk = orders or products or order_items or extra_tables
+    conn = None
+    try:
+        # Connect to the SQLite database (it will be created if it doesn't exist)
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        print("Database connection established.")
+        if bulk:
+            for pragma in LOAD_PRAGMAS:
+                cursor.execute(pragma)
+
+        # Create tables
+        cursor.execute(create_customer_orders_table)
+        print("Table 'customer_orders' created successfully.")
+
+        cursor.execute(create_products_table)
+        print("Table 'products' created successfully.")
+
+        # Insert sample data (checking if empty first to avoid duplicates on re-run)
+        cursor.execute("SELECT COUNT(*) FROM customer_orders")
+        existing_orders = cursor.fetchone()[0]
+        if existing_orders == 0:
+            cursor.execute(insert_orders_data)
+            print("Sample data inserted into 'customer_orders'.")
+        else:
+            print("'customer_orders' already contains data.")
+        if orders and existing_orders <= SAMPLE_ROWS:
+            bulk_insert_synthetic(cursor, "customer_orders", "customer_orders", orders, seed, batch_rows)
+
+        cursor.execute("SELECT COUNT(*) FROM products")
+        existing_products = cursor.fetchone()[0]
+        if existing_products == 0:
+            cursor.execute(insert_products_data)
+            print("Sample data inserted into 'products'.")
+        else:
+            print("'products' already contains data.")
+        if products and existing_products <= SAMPLE_ROWS:
+            bulk_insert_synthetic(cursor, "products", "products", products, seed, batch_rows)
+
+        if order_items:
+            if not (orders and products):
+                raise ValueError("--order-items needs --orders and --products to reference.")
+            cursor.execute(create_order_items_table)
+            cursor.execute("SELECT COUNT(*) FROM order_items")
+            if cursor.fetchone()[0] == 0:
+                bulk_insert_order_items(cursor, order_items, orders, products, seed, batch_rows)
+            else:
+                print("'order_items' already contains data.")
+
+        if extra_tables:
+            create_extra_tables(cursor, extra_tables, extra_table_rows, seed)
+
+        started = time.perf_counter()
+        for statement in create_indexes + (create_order_items_indexes if order_items else []):
+            cursor.execute(statement)
+        if bulk:
+            cursor.execute("ANALYZE") # Planner statistics for the loaded sizes
+            print(f"Indexes built and statistics gathered in {time.perf_counter() - started:.1f}s.")
+
+        # Commit changes and close the connection
+        conn.commit()
+        print("Changes committed.")
+        if bulk:
+            cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+
+    except (sqlite3.Error, ValueError) as e:
+        print(f"An error occurred: {e}")
+        raise
+
+    finally:
+        if conn:
+            conn.close()
+
 
-try:
-    # Connect to the SQLite database (it will be created if it doesn't exist)
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    print("Database connection established.")
-
-    # Create tables
-    cursor.execute(create_customer_orders_table)
-    print("Table 'customer_orders' created successfully.")
-    
-    cursor.execute(create_products_table)
-    print("Table 'products' created successfully.")
-
-    # Insert sample data (checking if empty first to avoid duplicates on re-run)
-    cursor.execute("SELECT COUNT(*) FROM customer_orders")
-    if cursor.fetchone()[0] == 0:
-        cursor.execute(insert_orders_data)
-        print("Sample data inserted into 'customer_orders'.")
-    else:
-        print("'customer_orders' already contains data.")
-
-    cursor.execute("SELECT COUNT(*) FROM products")
-    if cursor.fetchone()[0] == 0:
-        cursor.execute(insert_products_data)
-        print("Sample data inserted into 'products'.")
-    else:
-        print("'products' already contains data.")
-
-    # Commit changes and close the connection
-    conn.commit()
-    print("Changes committed.")
-
-except sqlite3.Error as e:
-    print(f"An error occurred: {e}")
-
-finally:
-    if conn:
-        conn.close()
-        print("Database connection closed.")
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the reference SQLite database, optionally at scale.")
+    parser.add_argument("--db-path", default=DB_PATH)
+    parser.add_argument("--orders", type=float, default=0, help="Synthetic customer_orders rows to add (1e7 notation accepted).")
+    parser.add_argument("--products", type=float, default=0, help="Synthetic products rows to add.")
+    parser.add_argument("--order-items", type=float, default=0, help="Rows of an order_items table with foreign keys to both.")
+    parser.add_argument("--extra-tables", type=int, default=0, help="Unrelated tables to add for catalog-scale tests.")
+    parser.add_argument("--extra-table-rows", type=int, default=0, help="Rows per extra table.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS, help="Rows per executemany batch.")
+    parser.add_argument("--reset", action="store_true", help="Delete the existing database file first.")
+    args = parser.parse_args()
+    try:
+        setup_database(args.db_path, int(args.orders), int(args.products), int(args.order_items), args.extra_tables,
+                       args.extra_table_rows, args.seed, args.batch_rows, args.reset)
+    except (sqlite3.Error, ValueError):
+        sys.exit(1) # Already reported above
@@ -0,0 +1,205 @@
+import os
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+
+# --- Synthetic customer_orders / products data with controllable dirt ---
+# Generates files shaped like the reference tables (see setup_database.py), from thousands to
+# hundreds of millions of rows and up to ~1,000 columns (extra 'AttrNNNN' columns of rotating
+# types pad the base schema). Rows are generated vectorized, in chunks whose random streams
+# depend only on (seed, chunk number), so the same arguments always give the same file and
+# a chunk never needs the rows before it: keys are derived from the global row number.
+# Errors are injected at the requested rates:
+#   null_rate             nulls in every column (NOT NULL violations on the required ones)
+#   bad_type_rate         text such as 'one' or 'N/A' in numeric columns
+#   duplicate_key_rate    the key of an earlier row repeated
+#   check_violation_rate  values breaking the CHECK constraints (Quantity <= 0, Price/Stock < 0)
+#   future_date_rate      dates in the future (2099) in the date columns
+
+DEFAULT_CHUNK_ROWS = 500_000
+ERROR_RATES = ("null_rate", "bad_type_rate", "duplicate_key_rate", "check_violation_rate", "future_date_rate")
+BAD_TYPE_VALUES = np.array(["one", "N/A", "12,5", "abc", "#REF!"], dtype=object)
+DISCOUNT_CODES = np.array(["SAVE10", "NEW25", "VIP5", "SPRING15"], dtype=object)
+CATEGORIES = np.array(["Electronics", "Homeware", "Garden", "Toys", "Books", "Sports", "Beauty", "Grocery"], dtype=object)
+EXTRA_COLUMN_TYPES = ("REAL", "INTEGER", "TEXT", "DATE")
+DATE_RANGE_START = np.datetime64("2020-01-01")
+DATE_RANGE_DAYS = 5 * 365
+FUTURE_DATE_START = np.datetime64("2099-01-01") # Fixed, so files stay reproducible and their future dates stay future
+
+# Base columns of each shape: (name, SQL type/constraints); the first column is the primary key
+SHAPES: Dict[str, List[Tuple[str, str]]] = {
+    "customer_orders": [
+        ("OrderID", "TEXT PRIMARY KEY NOT NULL"),
+        ("CustomerID", "TEXT NOT NULL"),
+        ("OrderDate", "DATE NOT NULL"),
+        ("Quantity", "INTEGER NOT NULL CHECK(Quantity > 0)"),
+        ("Price", "REAL NOT NULL"),
+        ("DiscountCode", "TEXT"),
+    ],
+    "products": [
+        ("ProductID", "TEXT PRIMARY KEY NOT NULL"),
+        ("ProductName", "TEXT NOT NULL"),
+        ("Category", "TEXT"),
+        ("Price", "REAL NOT NULL CHECK(Price >= 0)"),
+        ("Stock", "INTEGER NOT NULL CHECK(Stock >= 0)"),
+    ],
+}
+KEY_PREFIXES = {"customer_orders": "ORD", "products": "PROD"}
+
+
+def column_spec(shape: str, total_columns: Optional[int] = None) -> List[Tuple[str, str]]:
+    """(name, SQL type) of every column: the base columns of the shape, padded with extra columns."""
+    if shape not in SHAPES:
+        raise ValueError(f"Unknown shape '{shape}'. Choose one of: {', '.join(SHAPES)}")
+    base = SHAPES[shape]
+    extra = max(0, (total_columns or len(base)) - len(base))
+    return base + [(f"Attr{i:04d}", EXTRA_COLUMN_TYPES[i % len(EXTRA_COLUMN_TYPES)]) for i in range(1, extra + 1)]
+
+
+def create_table_sql(shape: str, total_columns: Optional[int] = None, table_name: Optional[str] = None) -> str:
+    columns = ",\n    ".join(f'"{name}" {sql_type}' for name, sql_type in column_spec(shape, total_columns))
+    return f'CREATE TABLE IF NOT EXISTS "{table_name or shape}" (\n    {columns}\n);'
+
+
+def _base_type(sql_type: str) -> str:
+    return sql_type.split()[0].split("(")[0].upper()
+
+
+def make_keys(prefix: str, row_numbers: np.ndarray) -> np.ndarray:
+    """Key strings like 'ORD0000000042' for an array of row numbers (object dtype)."""
+    return np.char.add(prefix, np.char.zfill(row_numbers.astype(str), 10)).astype(object)
+
+
+def _dates(rng: np.random.Generator, n: int) -> np.ndarray:
+    return (DATE_RANGE_START + rng.integers(0, DATE_RANGE_DAYS, n).astype("timedelta64[D]")).astype(str).astype(object)
+
+
+def generate_chunk(
+    shape: str,
+    start_row: int,
+    rows: int,
+    total_columns: Optional[int] = None,
+    seed: int = 0,
+    chunk_number: int = 0,
+    **error_rates: float
+) -> pd.DataFrame:
+    """Rows start_row .. start_row + rows - 1 of the synthetic table, with errors injected at error_rates."""
+    unknown = set(error_rates) - set(ERROR_RATES)
+    if unknown:
+        raise ValueError(f"Unknown error rate(s): {', '.join(sorted(unknown))}")
+    rates = {name: float(error_rates.get(name) or 0.0) for name in ERROR_RATES}
+    rng = np.random.default_rng([seed, chunk_number])
+    row_numbers = np.arange(start_row, start_row + rows, dtype=np.int64)
+    spec = column_spec(shape, total_columns)
+    key_column = spec[0][0]
+    columns: Dict[str, np.ndarray] = {}
+
+    # --- Clean values ---
+    if shape == "customer_orders":
+        columns["OrderID"] = make_keys("ORD", row_numbers)
+        customers = max(1000, (start_row + rows) // 10)
+        columns["CustomerID"] = make_keys("CUST", rng.integers(1, customers, rows))
+        columns["OrderDate"] = _dates(rng, rows)
+        columns["Quantity"] = rng.integers(1, 20, rows)
+        columns["Price"] = np.round(rng.uniform(1, 500, rows), 2)
+        columns["DiscountCode"] = np.where(rng.random(rows) < 0.3, DISCOUNT_CODES[rng.integers(0, len(DISCOUNT_CODES), rows)], None)
+    else:
+        columns["ProductID"] = make_keys("PROD", row_numbers)
+        columns["ProductName"] = np.char.add("Product ", row_numbers.astype(str)).astype(object)
+        columns["Category"] = CATEGORIES[rng.integers(0, len(CATEGORIES), rows)]
+        columns["Price"] = np.round(rng.uniform(0.5, 2000, rows), 2)
+        columns["Stock"] = rng.integers(0, 1000, rows)
+    for name, sql_type in spec[len(SHAPES[shape]):]:
+        base_type = _base_type(sql_type)
+        if base_type == "REAL":
+            columns[name] = np.round(rng.normal(100, 25, rows), 3)
+        elif base_type == "INTEGER":
+            columns[name] = rng.integers(0, 100_000, rows)
+        elif base_type == "DATE":
+            columns[name] = _dates(rng, rows)
+        else:
+            columns[name] = CATEGORIES[rng.integers(0, len(CATEGORIES), rows)]
+
+    # --- Injected errors (later ones win where masks overlap) ---
+    def mask(rate: float) -> np.ndarray:
+        return rng.random(rows) < rate if rate > 0 else np.zeros(rows, dtype=bool)
+
+    duplicates = mask(rates["duplicate_key_rate"]) & (row_numbers > 0)
+    if duplicates.any():
+        earlier = (rng.random(int(duplicates.sum())) * row_numbers[duplicates]).astype(np.int64)
+        columns[key_column][duplicates] = make_keys(KEY_PREFIXES[shape], earlier)
+
+    for name, sql_type in spec:
+        if "CHECK" not in sql_type:
+            continue
+        violations = mask(rates["check_violation_rate"])
+        if violations.any():
+            low = 0 if "> 0" in sql_type else 1 # '> 0' is broken by 0 too, '>= 0' needs a negative value
+            columns[name] = columns[name].astype(float if columns[name].dtype.kind == "f" else np.int64)
+            columns[name][violations] = -rng.integers(low, 10, int(violations.sum()))
+
+    for name, sql_type in spec:
+        if _base_type(sql_type) == "DATE":
+            future = mask(rates["future_date_rate"])
+            if future.any():
+                columns[name][future] = (FUTURE_DATE_START + rng.integers(0, 365, int(future.sum())).astype("timedelta64[D]")).astype(str)
+
+    for name, sql_type in spec:
+        if _base_type(sql_type) in ("INTEGER", "REAL"):
+            bad = mask(rates["bad_type_rate"])
+            if bad.any():
+                columns[name] = columns[name].astype(object)
+                columns[name][bad] = BAD_TYPE_VALUES[rng.integers(0, len(BAD_TYPE_VALUES), int(bad.sum()))]
+
+    if rates["null_rate"] > 0:
+        for name in columns:
+            nulls = mask(rates["null_rate"])
+            if nulls.any():
+                if columns[name].dtype.kind != "f":
+                    columns[name] = columns[name].astype(object) # Keeps ints as ints around the nulls
+                columns[name][nulls] = np.nan if columns[name].dtype.kind == "f" else None
+
+    return pd.DataFrame(columns, index=pd.RangeIndex(start_row, start_row + rows))
+
+
+def iter_chunks(shape: str, rows: int, total_columns: Optional[int] = None, seed: int = 0,
+                chunk_rows: int = DEFAULT_CHUNK_ROWS, **error_rates: float) -> Iterator[pd.DataFrame]:
+    """The whole synthetic table as a sequence of DataFrames of at most chunk_rows rows."""
+    for chunk_number, start in enumerate(range(0, rows, chunk_rows)):
+        yield generate_chunk(shape, start, min(chunk_rows, rows - start), total_columns, seed, chunk_number, **error_rates)
+
+
+def generate_frame(shape: str, rows: int, total_columns: Optional[int] = None, seed: int = 0, **error_rates: float) -> pd.DataFrame:
+    """The synthetic table as one DataFrame (for sizes that fit in memory)."""
+    return pd.concat(list(iter_chunks(shape, rows, total_columns, seed, **error_rates)))
+
+
+def write_csv(path: str, shape: str, rows: int, total_columns: Optional[int] = None, seed: int = 0,
+              chunk_rows: int = DEFAULT_CHUNK_ROWS, **error_rates: float) -> Dict[str, Any]:
+    """Writes the synthetic table to a CSV chunk by chunk (memory stays at one chunk); returns file info."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = path + ".part" # Renamed when complete, so an interrupted run never leaves a short file
+    for i, chunk in enumerate(iter_chunks(shape, rows, total_columns, seed, chunk_rows, **error_rates)):
+        chunk.to_csv(temp_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+    os.replace(temp_path, path)
+    size = os.path.getsize(path)
+    logging.info(f"Wrote {rows} rows x {len(column_spec(shape, total_columns))} columns of '{shape}' to {path} ({size / 1e6:.1f} MB).")
+    return {"path": path, "shape": shape, "rows": rows, "columns": len(column_spec(shape, total_columns)), "bytes": size}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', force=True)
+    parser = argparse.ArgumentParser(description="Write a synthetic customer_orders / products CSV with injected errors.")
+    parser.add_argument("output", help="CSV path to write.")
+    parser.add_argument("--shape", choices=sorted(SHAPES), default="customer_orders")
+    parser.add_argument("--rows", type=float, default=10_000, help="Row count (1e6 notation accepted).")
+    parser.add_argument("--columns", type=int, default=None, help="Total columns; extra columns pad the base schema.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    for rate in ERROR_RATES:
+        parser.add_argument(f"--{rate.replace('_', '-')}", type=float, default=0.0)
+    args = parser.parse_args()
+    write_csv(args.output, args.shape, int(args.rows), args.columns, args.seed, args.chunk_rows,
+              **{rate: getattr(args, rate) for rate in ERROR_RATES})
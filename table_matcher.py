@@ -0,0 +1,228 @@
+import re
+import sys
+import time
+import logging
+import numpy as np
+import pandas as pd
+import sqlalchemy
+from typing import Dict, Any, List, Optional, Tuple
+import tools
+import tracing
+
+# --- Automatic target-table matching ---
+# When no target table is given, the sheet is ranked against every table of the reflected
+# catalog. Each table is indexed once per database: normalized column names, column-name
+# tokens (camelCase / snake_case split), a MinHash signature over both, and a profile of
+# column type classes. A sheet is first compared with all signatures at once (vectorized
+# Jaccard estimate), then the best candidates are scored exactly. The top table is picked
+# automatically when it is both good enough and clearly ahead of the runner-up; only
+# ambiguous matches fall back to asking the user (and fail in non-interactive runs).
+
+MINHASH_PERMUTATIONS = 64
+CANDIDATE_TABLES = 20 # Tables scored exactly after the MinHash pre-ranking
+MATCH_MIN_SCORE = 0.5 # Auto-select only above this score...
+MATCH_MIN_MARGIN = 0.1 # ...and this far ahead of the second-best table
+SCORE_WEIGHTS = {"names": 0.55, "tokens": 0.25, "types": 0.2}
+TYPE_CLASSES = ("number", "text", "datetime", "bool")
+
+_MINHASH_SEEDS = np.random.default_rng(20240601).integers(1, np.iinfo(np.int64).max, size=MINHASH_PERMUTATIONS, dtype=np.int64).astype(np.uint64)
+_index_cache: Dict[str, "TableMatchIndex"] = {}
+
+
+# --- Column features ---
+def normalize_column_name(name: str) -> str:
+    """'Customer_ID', 'customerId' and 'customer id' all normalize to 'customerid'."""
+    return re.sub(r'[^0-9a-z]', '', str(name).lower())
+
+
+def column_tokens(name: str) -> List[str]:
+    """Splits a column name into lower-case word tokens (snake_case, camelCase, digits)."""
+    spaced = re.sub(r'([a-z0-9])([A-Z])', r'\1 \2', str(name))
+    return [t for t in re.split(r'[^0-9a-z]+', spaced.lower()) if len(t) > 1]
+
+
+def sql_type_class(sql_type: str) -> str:
+    base = str(sql_type).split('(')[0].upper()
+    if 'BOOL' in base or base == 'BIT':
+        return 'bool'
+    if 'DATE' in base or 'TIME' in base:
+        return 'datetime'
+    if any(t in base for t in ('INT', 'REAL', 'FLOAT', 'DOUBLE', 'NUMERIC', 'DECIMAL', 'NUMBER', 'SERIAL')):
+        return 'number'
+    return 'text'
+
+
+def file_type_class(column_details: Dict[str, Any]) -> str:
+    """Type class of a file column, using the measured type of text columns when there is one."""
+    suggested = (column_details.get('type_inference') or {}).get('suggested_type')
+    if suggested in ('int', 'float'):
+        return 'number'
+    if suggested in ('datetime', 'bool'):
+        return suggested
+    dtype = str(column_details.get('inferred_type', '')).lower()
+    if dtype.startswith('bool'):
+        return 'bool'
+    if 'int' in dtype or 'float' in dtype or 'decimal' in dtype:
+        return 'number'
+    if 'datetime' in dtype or 'date' in dtype or 'timestamp' in dtype:
+        return 'datetime'
+    return 'text'
+
+
+def _features(names: List[str], tokens: List[str]) -> np.ndarray:
+    # Names and tokens are hashed into one feature set; the prefixes keep them apart
+    return pd.util.hash_array(np.array([f"n:{n}" for n in names] + [f"t:{t}" for t in tokens], dtype=object))
+
+
+def minhash_signature(features: np.ndarray) -> np.ndarray:
+    """MINHASH_PERMUTATIONS minimum hashes of a feature set (uint64)."""
+    if not len(features):
+        return np.full(MINHASH_PERMUTATIONS, np.iinfo(np.uint64).max, dtype=np.uint64)
+    mixed = pd.util.hash_array((features[:, None] ^ _MINHASH_SEEDS[None, :]).ravel()).reshape(len(features), -1)
+    return mixed.min(axis=0)
+
+
+def _type_profile(type_classes: List[str]) -> np.ndarray:
+    counts = np.array([type_classes.count(c) for c in TYPE_CLASSES], dtype=float)
+    return counts / counts.sum() if counts.sum() else counts
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+# --- Index ---
+class TableMatchIndex:
+    """Column-name and type features of every table of a catalog, for ranking sheets against it."""
+
+    def __init__(self, table_schemas: Dict[str, Dict[str, str]]):
+        """table_schemas: {table_name: {column_name: SQL type}} as returned by tools.get_all_table_schemas."""
+        self.tables = list(table_schemas)
+        self.names: List[Dict[str, str]] = [] # normalized name -> type class
+        self.tokens: List[set] = []
+        self.profiles = np.zeros((len(self.tables), len(TYPE_CLASSES)))
+        self.signatures = np.empty((len(self.tables), MINHASH_PERMUTATIONS), dtype=np.uint64)
+        for i, table in enumerate(self.tables):
+            columns = table_schemas[table]
+            names = {normalize_column_name(col): sql_type_class(sql_type) for col, sql_type in columns.items()}
+            tokens = {t for col in columns for t in column_tokens(col)}
+            self.names.append(names)
+            self.tokens.append(tokens)
+            self.profiles[i] = _type_profile(list(names.values()))
+            self.signatures[i] = minhash_signature(_features(list(names), list(tokens)))
+
+    def rank(self, file_schema: Dict[str, Any], top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Ranks the catalog tables for a file schema (see tools.extract_schema_from_df).
+
+        Returns up to top_k dicts with 'table', 'score' (0..1) and the component scores, best first.
+        """
+        if not self.tables:
+            return []
+        columns = file_schema.get("columns", {})
+        names = {normalize_column_name(col): file_type_class(details) for col, details in columns.items()}
+        tokens = {t for col in columns for t in column_tokens(col)}
+        profile = _type_profile(list(names.values()))
+
+        # Vectorized Jaccard estimate against every table, then exact scores for the best candidates
+        estimates = (self.signatures == minhash_signature(_features(list(names), list(tokens)))[None, :]).mean(axis=1)
+        candidates = np.argsort(-estimates, kind='stable')[:max(CANDIDATE_TABLES, top_k)]
+
+        ranking = []
+        for i in candidates:
+            table_names = self.names[i]
+            matched = names.keys() & table_names.keys()
+            if matched:
+                type_score = sum(names[n] == table_names[n] for n in matched) / len(matched)
+            else:
+                type_score = 1 - float(np.abs(profile - self.profiles[i]).sum()) / 2
+            scores = {
+                "names": _jaccard(set(names), set(table_names)),
+                "tokens": _jaccard(tokens, self.tokens[i]),
+                "types": type_score,
+            }
+            ranking.append({
+                "table": self.tables[i],
+                "score": round(sum(SCORE_WEIGHTS[k] * v for k, v in scores.items()), 4),
+                "matched_columns": len(matched),
+                **{f"{k}_score": round(v, 4) for k, v in scores.items()}
+            })
+        ranking.sort(key=lambda r: -r["score"])
+        return ranking[:top_k]
+
+
+def get_table_match_index(engine: sqlalchemy.engine.Engine, refresh: bool = False) -> "TableMatchIndex":
+    """Builds (once per database URL, cached for the process) the match index of the reflected catalog."""
+    cache_key = str(engine.url)
+    if not refresh and cache_key in _index_cache:
+        tracing.count(cache_hits=1)
+    else:
+        tracing.count(cache_misses=1)
+        started = time.perf_counter()
+        index = TableMatchIndex(tools.get_all_table_schemas(engine))
+        logging.info(f"Built table match index for {len(index.tables)} tables in {time.perf_counter() - started:.2f}s.")
+        _index_cache[cache_key] = index
+    return _index_cache[cache_key]
+
+
+def clear_table_match_index_cache() -> None:
+    _index_cache.clear()
+
+
+def is_confident(ranking: List[Dict[str, Any]], min_score: float = MATCH_MIN_SCORE, min_margin: float = MATCH_MIN_MARGIN) -> bool:
+    if not ranking or ranking[0]["score"] < min_score:
+        return False
+    return len(ranking) == 1 or ranking[0]["score"] - ranking[1]["score"] >= min_margin
+
+
+def _ask_user(ranking: List[Dict[str, Any]], table_names: List[str], file_label: str) -> str:
+    print("\n" + "="*80)
+    print(f"File: {file_label}")
+    print("\nNo target table was provided and no table matched with confidence. Best candidates:")
+    for n, match in enumerate(ranking, start=1):
+        print(f"  {n}. {match['table']} (score {match['score']:.2f}, {match['matched_columns']} matching column(s))")
+    user_selection = input("\n> Type a number, the full name of any table, or 'None': ").strip()
+    print("="*80)
+
+    if not user_selection or user_selection.lower() == 'none':
+        raise ValueError("Process stopped: User confirmed no matching table.")
+    if user_selection.isdigit() and 1 <= int(user_selection) <= len(ranking):
+        return ranking[int(user_selection) - 1]["table"]
+    if user_selection not in table_names:
+        logging.error(f"Invalid table name: '{user_selection}' is not in the database.")
+        raise ValueError(f"Invalid table: '{user_selection}' is not in the database. Aborting.")
+    return user_selection
+
+
+def select_target_table(engine: sqlalchemy.engine.Engine, file_schema: Dict[str, Any], file_label: str, interactive: Optional[bool] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Picks the target table for a sheet from the catalog.
+
+    The best-ranked table is returned when the match is confident (see is_confident). Otherwise
+    the user is asked to choose if interactive (default: stdin is a terminal); in batch runs a
+    ValueError listing the candidates is raised instead.
+    Returns (table_name, match_report).
+    """
+    index = get_table_match_index(engine)
+    if not index.tables:
+        raise ValueError("No tables found in database to choose from.")
+
+    started = time.perf_counter()
+    ranking = index.rank(file_schema)
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+    report = {"candidates": ranking, "ranking_ms": elapsed_ms, "tables_indexed": len(index.tables)}
+
+    if is_confident(ranking):
+        logging.info(f"Auto-selected table '{ranking[0]['table']}' (score {ranking[0]['score']:.2f}) from {len(index.tables)} tables in {elapsed_ms} ms.")
+        return ranking[0]["table"], {**report, "selection": "automatic"}
+
+    candidates_text = ", ".join(f"{m['table']} ({m['score']:.2f})" for m in ranking)
+    if interactive is None:
+        interactive = sys.stdin is not None and sys.stdin.isatty()
+    if not interactive:
+        raise ValueError(f"No confident table match for '{file_label}'. Candidates: {candidates_text}. Provide the table name explicitly.")
+
+    logging.info("--- WAITING FOR USER INPUT ---")
+    table_name = _ask_user(ranking, index.tables, file_label)
+    logging.info(f"User selected table: '{table_name}'")
+    return table_name, {**report, "selection": "user"}
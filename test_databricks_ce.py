@@ -2,6 +2,7 @@ import os
 import databricks.sql
 import json
 from dotenv import load_dotenv
+import databricks_tools
 
 def get_databricks_connection():
     """
@@ -31,42 +32,30 @@ def get_databricks_connection():
 
 def list_all_tables() -> str:
     """
-    Connects to Databricks and lists all tables in the 'default' schema.
+    Lists all tables in the 'default' schema.
     This is the main tool function for your Autogen agent.
     
+    Uses the shared, pooled metadata service (databricks_tools.get_metadata_service), so
+    repeated calls are served from its cache instead of opening a new connection each time.
+    
     Returns:
         A JSON string of the tables found, or an error message.
     """
-    
-    # Get a connection
-    connection = get_databricks_connection()
-    if connection is None:
+    service = databricks_tools.get_metadata_service()
+    if service is None:
         return json.dumps({"error": "Failed to create Databricks connection."})
 
     try:
-        with connection.cursor() as cursor:
-            # We use 'default' because that's the schema
-            # you selected when uploading files.
-            cursor.execute("SHOW TABLES IN default")
-            tables = cursor.fetchall()
-
-        # Format the output for the agent
-        # tables will look like [Row(database='default', tableName='hr_employees', ...), ...]
-        table_names = [table.tableName for table in tables]
+        table_names = service.list_tables()
         
         return json.dumps({
-            "catalog": "main",
+            "catalog": "workspace",
             "schema": "default",
             "tables": table_names
         })
 
     except Exception as e:
         return json.dumps({"error": f"Failed to list tables: {e}"})
-    
-    finally:
-        # Always close the connection
-        if connection:
-            connection.close()
 
 # --- This is how you can test the function directly ---
 if __name__ == "__main__":
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The modules live flat in the repository root; make them importable from the tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# main builds its LLM client at import time; tests that import it swap in llm_stub, so any endpoint will do
+os.environ.setdefault("AZURE_ENDPOINT", "http://127.0.0.1:9")
+os.environ.setdefault("API_KEY", "stub")
+os.environ.setdefault("DEPLOYMENT_NAME", "stub")
@@ -0,0 +1,33 @@
+import os
+import batch_validation
+
+# --- Which run_multi_sheet_validation results leave a file to be retried ---
+
+
+def test_report_errors_of_a_validated_csv():
+    result = {"User_file_name": "orders.csv", "schema_analysis_report": {}, "validation_summary": {"status": "Passed"}}
+    assert batch_validation.report_errors(result) == []
+
+
+def test_report_errors_without_a_report_or_sheet_results():
+    assert batch_validation.report_errors(None) == ["Validation did not produce a report."]
+    assert batch_validation.report_errors({"User_file_name": "orders.csv"}) == ["Validation did not produce any sheet results."]
+    assert batch_validation.report_errors({"User_file_name": "book.xlsx", "sheet_validation_results": {}}) == ["Validation did not produce any sheet results."]
+
+
+def test_report_errors_of_errored_sheets():
+    result = {"User_file_name": "book.xlsx", "sheet_validation_results": {
+        "Orders": {"schema_analysis_report": {}},
+        "Customers": {"error": "Failed to get final report from LLM."},
+        "Empty": {},
+    }}
+    assert batch_validation.report_errors(result) == ["Failed to get final report from LLM.", "Sheet did not produce a report."]
+    assert batch_validation.report_errors({"User_file_name": "orders.csv", "error": "disk read error"}) == ["disk read error"]
+
+
+def test_report_paths_do_not_collide(tmp_path):
+    source_root = str(tmp_path / "incoming")
+    nested = batch_validation.report_path_for(os.path.join(source_root, "a", "b.csv"), source_root, "out")
+    flat = batch_validation.report_path_for(os.path.join(source_root, "a__b.csv"), source_root, "out")
+    assert nested == os.path.join("out", "a", "b.csv.report.json")
+    assert flat == os.path.join("out", "a__b.csv.report.json")
@@ -0,0 +1,109 @@
+import tracemalloc
+import numpy as np
+import pandas as pd
+import pytest
+import tools
+
+# --- Peak memory of the column mapping and checks (tracemalloc) ---
+# A wide sheet is validated through tools.ColumnMappedFrame; the renamed view and the checks
+# must not copy the sheet. numpy and pandas report their buffers to tracemalloc, so the traced
+# peak covers the column data.
+
+ROWS = 20_000
+NUMERIC_COLUMNS = 150
+
+
+@pytest.fixture(scope="module")
+def wide_frame():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.random((ROWS, NUMERIC_COLUMNS)), columns=[f"col_{i}" for i in range(NUMERIC_COLUMNS)])
+    df["order_id"] = np.arange(ROWS)
+    df["order_date"] = pd.Series(pd.date_range("2024-01-01", periods=ROWS, freq="min").strftime("%Y-%m-%d"))
+    return df
+
+
+@pytest.fixture(scope="module")
+def db_schema(wide_frame):
+    schema = {f"COL_{i}": {"type": "REAL", "nullable": False, "primary_key": False, "unique_constraints": []} for i in range(NUMERIC_COLUMNS)}
+    schema["ORDER_ID"] = {"type": "INTEGER", "nullable": False, "primary_key": True, "unique_constraints": []}
+    schema["ORDER_DATE"] = {"type": "DATE", "nullable": False, "primary_key": False, "unique_constraints": []}
+    return schema
+
+
+def _input_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True).sum())
+
+
+def _peak_traced_bytes(func) -> int:
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak
+
+
+def test_column_mapped_frame_does_not_copy(wide_frame):
+    mapping = {col: col.upper() for col in wide_frame.columns}
+
+    def mapped_access():
+        mapped = tools.ColumnMappedFrame(wide_frame, mapping)
+        columns = [mapped[col] for col in mapped.columns]
+        return mapped, columns, mapped[["ORDER_ID", "ORDER_DATE"]]
+
+    def renamed_access():
+        renamed = wide_frame.rename(columns=mapping)
+        return renamed, [renamed[col] for col in renamed.columns]
+
+    input_bytes = _input_bytes(wide_frame)
+    mapped_peak = _peak_traced_bytes(mapped_access)
+    renamed_peak = _peak_traced_bytes(renamed_access)
+
+    # No full copy: the view costs a small fraction of the sheet (the key-column subset included),
+    # and never more than df.rename(), which copies every column unless pandas' copy-on-write defers it
+    assert mapped_peak < 0.1 * input_bytes, f"ColumnMappedFrame peaked at {mapped_peak} bytes for a {input_bytes}-byte sheet"
+    assert mapped_peak <= renamed_peak + 0.05 * input_bytes
+
+
+def test_column_mapped_frame_matches_rename(wide_frame):
+    mapping = {"col_0": "COL_1", "col_1": "COL_1", "order_id": "ORDER_ID"} # Two columns map to one name
+    mapped = tools.ColumnMappedFrame(wide_frame, mapping)
+    renamed = wide_frame.rename(columns=mapping)
+
+    assert list(mapped.columns) == list(renamed.columns)
+    assert len(mapped) == len(renamed) and mapped.shape == renamed.shape
+    pd.testing.assert_series_equal(mapped["ORDER_ID"], wide_frame["order_id"])
+    pd.testing.assert_frame_equal(mapped["COL_1"], renamed["COL_1"])
+    with pytest.raises(KeyError):
+        mapped["col_0"]
+
+
+def test_checks_on_mapped_frame_stay_within_small_multiple_of_input(wide_frame, db_schema):
+    mapping = {col: col.upper() for col in wide_frame.columns}
+
+    def run_checks():
+        mapped = tools.ColumnMappedFrame(wide_frame, mapping)
+        schema = tools.extract_schema_from_df(wide_frame, "wide.csv", None)
+        type_violations = tools.validate_data_types(mapped, db_schema)
+        dq_violations = tools.find_duplicate_keys(mapped, tools.get_key_constraints(db_schema)[0])
+        dq_violations += tools.validate_dates(mapped, db_schema)
+        return schema, type_violations, dq_violations
+
+    input_bytes = _input_bytes(wide_frame)
+    peak = _peak_traced_bytes(run_checks)
+    assert peak < 2 * input_bytes, f"Checks peaked at {peak} bytes for a {input_bytes}-byte sheet"
+
+
+def test_extract_schema_does_not_mutate_caller_frame(wide_frame):
+    df = wide_frame.head(100).copy()
+    df.loc[len(df)] = np.nan # An all-null row is ignored by the schema, not dropped from the caller's frame
+    before = len(df)
+
+    schema = tools.extract_schema_from_df(df, "wide.csv", None)
+
+    assert len(df) == before
+    assert schema["total_rows"] == before - 1
@@ -0,0 +1,67 @@
+import time
+import pytest
+import sqlalchemy
+from sqlalchemy.pool import StaticPool
+import databricks_metadata
+
+# --- MetadataService against a local SQLite stand-in ---
+# One in-memory database per test (StaticPool keeps the single connection, so ATTACHed
+# databases stay visible to every query of the service).
+
+
+@pytest.fixture
+def engine():
+    engine = sqlalchemy.create_engine("sqlite://", poolclass=StaticPool)
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text("CREATE TABLE orders (order_id INTEGER PRIMARY KEY, amount REAL NOT NULL)"))
+        conn.execute(sqlalchemy.text("CREATE TABLE customers (customer_id INTEGER, email TEXT)"))
+    yield engine
+    engine.dispose()
+
+
+def test_reflection_fallback_is_cached(engine):
+    # Plain SQLite has no information_schema
+    service = databricks_metadata.MetadataService(engine, schema="main", ttl_seconds=60)
+
+    assert service.list_tables() == ["customers", "orders"]
+    assert service.get_columns(["orders"])["orders"]["amount"] == {"type": "REAL", "nullable": False}
+    assert service.get_columns(["orders", "missing"]).keys() == {"orders"}
+    assert service.fetch_count == 1, "Later calls should be served from the cache"
+
+
+def test_reflection_fallback_uses_the_service_schema(engine):
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text("ATTACH DATABASE ':memory:' AS staging"))
+        conn.execute(sqlalchemy.text("CREATE TABLE staging.raw_orders (order_id INTEGER, payload TEXT)"))
+
+    service = databricks_metadata.MetadataService(engine, schema="staging", ttl_seconds=60)
+
+    assert service.list_tables() == ["raw_orders"]
+    assert list(service.get_columns()["raw_orders"]) == ["order_id", "payload"]
+
+
+def test_information_schema_is_refreshed_after_ttl(engine):
+    # An attached database stands in for the warehouse catalog
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text("ATTACH DATABASE ':memory:' AS information_schema"))
+        conn.execute(sqlalchemy.text("CREATE TABLE information_schema.columns (table_schema TEXT, table_name TEXT, column_name TEXT, data_type TEXT, is_nullable TEXT, ordinal_position INTEGER)"))
+        conn.execute(sqlalchemy.text("INSERT INTO information_schema.columns VALUES ('default', 'hr_employees', 'emp_id', 'BIGINT', 'NO', 1), ('default', 'hr_employees', 'name', 'STRING', 'YES', 2)"))
+
+    service = databricks_metadata.MetadataService(engine, schema="default", ttl_seconds=0.2)
+    assert service.list_tables() == ["hr_employees"]
+    assert service.get_columns()["hr_employees"] == {"emp_id": {"type": "BIGINT", "nullable": False},
+                                                     "name": {"type": "STRING", "nullable": True}}
+    time.sleep(0.25)
+    service.list_tables()
+    assert service.fetch_count == 2, "An expired cache should be refreshed once"
+
+
+def test_invalid_schema_name_is_rejected(engine):
+    with pytest.raises(ValueError):
+        databricks_metadata.MetadataService(engine, schema="main; DROP TABLE orders")
+
+
+def test_get_metadata_service_is_shared_per_engine_and_schema(engine):
+    service = databricks_metadata.get_metadata_service(engine, schema="main")
+    assert databricks_metadata.get_metadata_service(engine, schema="main") is service
+    assert databricks_metadata.get_metadata_service(engine, schema="staging") is not service
@@ -0,0 +1,45 @@
+import os
+from datetime import datetime
+import pandas as pd
+import llm_stub
+import main
+import setup_database
+import tools
+
+# --- Date checks on DATE columns and on TEXT columns that hold dates ---
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REFERENCE_TIME = datetime(2026, 1, 1)
+
+
+def test_text_column_of_dates_gets_future_and_window_checks():
+    df = pd.DataFrame({"OrderDate": ["2025-10-24", "2025-10-25", "2099-12-31", "1850-01-01"],
+                       "Notes": ["2025-10-24", "call back", "n/a", "ok"]})
+    db_schema = {"OrderDate": {"type": "TEXT", "nullable": False}, "Notes": {"type": "VARCHAR(200)", "nullable": True}}
+
+    violations = tools.validate_dates(df, db_schema, reference_time=REFERENCE_TIME)
+
+    assert {(v["column"], v["check"]): v["count"] for v in violations} == {
+        ("OrderDate", "future_date_violation"): 1,
+        ("OrderDate", "date_out_of_window_violation"): 1,
+    }
+
+
+def test_text_column_of_dates_reports_no_parse_violations():
+    df = pd.DataFrame({"OrderDate": ["2025-10-24"] * 20 + ["soon"]})
+    violations = tools.validate_dates(df, {"OrderDate": {"type": "TEXT", "nullable": False}}, reference_time=REFERENCE_TIME)
+    assert violations == [] # 'soon' is valid text; only a DATE column reports it as unparseable
+
+
+def test_new_order_csv_flags_the_future_order_date(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path) # Schema history and key indexes are written to the working directory
+    db_path = str(tmp_path / "sample_data.db")
+    setup_database.setup_database(db_path)
+    llm_stub.install()
+
+    report = main.run_multi_sheet_validation(os.path.join(REPO_ROOT, "new_order.csv"), db_url=f"sqlite:///{db_path}",
+                                             user_provided_table_name="customer_orders", report_path=None, print_report=False)
+
+    checks = report["row_summary"]["checks"]
+    assert checks["future_date_violation:OrderDate"]["count"] == 1
+    assert checks["not_null_violation:OrderID"]["count"] == 1
@@ -0,0 +1,32 @@
+import os
+import multiprocessing
+import numpy as np
+import key_index
+
+# --- Key index shared by concurrent writers ---
+
+BLOOM_BITS = 2 ** 24
+WRITERS = 8
+
+
+def _add_batches(index_dir, seed):
+    hashes = np.random.default_rng(seed).integers(0, 2 ** 63, size=(5, 200), dtype=np.uint64)
+    for batch in hashes: # Reopen per batch, as each validation run does
+        with key_index.KeyIndex("feed", "orders", index_dir, bloom_bits=BLOOM_BITS) as index:
+            index.add(batch)
+    return hashes.ravel()
+
+
+def test_concurrent_writers_lose_no_bloom_bits(tmp_path):
+    index_dir = str(tmp_path)
+    with key_index.KeyIndex("feed", "orders", index_dir, bloom_bits=BLOOM_BITS) as index:
+        index.add(np.arange(1, 200_000, dtype=np.uint64) * np.uint64(2654435761)) # Large enough that a rebuild takes a while
+    os.remove(index.bloom_path) # Every writer now races to rebuild the Bloom filter while the others add keys
+
+    with multiprocessing.get_context().Pool(WRITERS) as pool:
+        added = np.concatenate(pool.starmap(_add_batches, [(index_dir, seed) for seed in range(WRITERS)]))
+
+    with key_index.KeyIndex("feed", "orders", index_dir, bloom_bits=BLOOM_BITS) as index:
+        assert index._bloom_maybe_contains(added).all() # A lost bit is a false negative: the duplicate skips SQLite
+        assert index.contains(added).all()
+        assert index.count() == 200_000 - 1 + len(added)
@@ -0,0 +1,36 @@
+import json
+import llm_stub
+import main
+import prompts
+
+# --- Offline LLM stub ---
+
+
+def test_schema_analysis_reads_the_filled_in_table_and_file():
+    prompt = prompts.get_schema_analysis_prompt(
+        db_schema={"CustomerID": {"type": "TEXT"}, "Quantity": {"type": "INTEGER"}},
+        file_schema={"columns": {"customer_id": {}, "Quantity": {}, "notes": {}}},
+        raw_comparison={"missing": ["CustomerID"], "extra": ["customer_id", "notes"]},
+        target_table_name="customer_orders",
+        source_file_name="new_order.csv",
+    )
+
+    analysis = json.loads(llm_stub.respond(prompt))
+
+    assert analysis["target_table"] == "customer_orders"
+    assert analysis["source_file"] == "new_order.csv"
+    assert analysis["naming_mismatches"] == {"customer_id": "CustomerID"}
+    assert analysis["columns_extra_in_file"] == ["notes"]
+
+
+def test_stubbed_calls_skip_tiktoken(monkeypatch, capsys):
+    def no_download(name):
+        raise AssertionError("tiktoken must not be used with the stub")
+    monkeypatch.setattr(main.tiktoken, "get_encoding", no_download)
+    monkeypatch.setattr(main, "client", llm_stub.StubOpenAIClient())
+
+    response = main.get_llm_streaming_response("system", "Return *ONLY* a single JSON list of rule objects.")
+
+    assert json.loads(response) == []
+    assert main.count_tokens("system", "user", response) == (0, 0, 0)
+    assert capsys.readouterr().out == ""
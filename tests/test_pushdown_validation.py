@@ -0,0 +1,93 @@
+from datetime import datetime
+import pandas as pd
+import pytest
+import sqlalchemy
+from sqlalchemy.pool import StaticPool
+import pushdown_validation
+import tools
+
+# --- Push-down checks against the same checks in pandas on the downloaded table ---
+
+REFERENCE_TIME = datetime(2025, 1, 1)
+
+
+@pytest.fixture
+def engine():
+    engine = sqlalchemy.create_engine("sqlite://", poolclass=StaticPool)
+    with engine.begin() as conn:
+        for statement in [
+            "CREATE TABLE customers (customer_id INTEGER PRIMARY KEY)",
+            "INSERT INTO customers VALUES (1), (2), (3)",
+            "CREATE TABLE orders (order_id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers(customer_id), "
+            "amount REAL CHECK (amount >= 0), status TEXT NOT NULL, order_date DATE)",
+            "CREATE TABLE orders_staging (order_id INTEGER, customer_id INTEGER, amount REAL, status TEXT, order_date DATE)",
+            "CREATE TABLE orders_text_staging (order_id INTEGER, customer_id INTEGER, amount TEXT, status TEXT, order_date DATE)",
+        ]:
+            conn.execute(sqlalchemy.text(statement))
+    yield engine
+    engine.dispose()
+
+
+def _staging_frame(**overrides) -> pd.DataFrame:
+    data = {
+        "order_id": [1, 2, 3, 3, 4, 5, 6, 7],
+        "customer_id": [1, 2, 9, 3, 9, 1, 2, 3],
+        "amount": [10.0, -5.0, 3.0, 4.0, 8.0, -1.0, 7.0, 2.0],
+        "status": ["new", "new", None, "paid", "paid", None, "new", "paid"],
+        "order_date": ["2024-01-05", "2024-02-01", "1899-12-31", "2024-03-01", "2999-01-01", "2024-03-02", "2024-03-03", "2024-03-04"],
+    }
+    data.update(overrides)
+    return pd.DataFrame(data)
+
+
+def _counts(violations):
+    return {(v["check"], v["column"]): v.get("count", v.get("total_duplicate_records")) for v in violations}
+
+
+def _in_memory_counts(engine, source_table):
+    downloaded = pd.read_sql_table(source_table, engine)
+    db_schema = tools.get_db_schema(engine, "orders")
+    in_memory = tools.run_data_quality_checks(downloaded, db_schema, engine, "orders")
+    in_memory += tools.validate_dates(downloaded, db_schema, reference_time=REFERENCE_TIME)
+    return _counts(in_memory)
+
+
+def test_pushdown_matches_in_memory_checks(engine):
+    _staging_frame().to_sql("orders_staging", engine, if_exists="append", index=False)
+
+    result = pushdown_validation.run_pushdown_checks(engine, "orders_staging", "orders", reference_time=REFERENCE_TIME)
+
+    assert result["total_rows"] == 8
+    assert _counts(result["dq_violations"]) == _in_memory_counts(engine, "orders_staging")
+    assert _counts(result["dq_violations"])[("check_constraint_violation", "amount")] == 2
+    assert result["skipped_checks"] == []
+
+
+def test_check_skipped_when_column_has_nulls(engine):
+    _staging_frame(amount=[10.0, -5.0, None, 4.0, 8.0, -1.0, 7.0, 2.0]).to_sql("orders_staging", engine, if_exists="append", index=False)
+
+    result = pushdown_validation.run_pushdown_checks(engine, "orders_staging", "orders", reference_time=REFERENCE_TIME)
+
+    assert ("check_constraint_violation", "amount") not in _counts(result["dq_violations"])
+    assert _counts(result["dq_violations"]) == _in_memory_counts(engine, "orders_staging")
+    assert [(s["column"], s["sqltext"]) for s in result["skipped_checks"]] == [("amount", "amount >= 0")]
+
+
+def test_check_skipped_for_non_numeric_column_type(engine):
+    _staging_frame(amount=["10", "-5", "abc", "4", "8", "-1", "7", "2"]).to_sql("orders_text_staging", engine, if_exists="append", index=False)
+
+    result = pushdown_validation.run_pushdown_checks(engine, "orders_text_staging", "orders", reference_time=REFERENCE_TIME)
+
+    assert _counts(result["dq_violations"]) == _in_memory_counts(engine, "orders_text_staging")
+    assert len(result["skipped_checks"]) == 1 and "not numeric" in result["skipped_checks"][0]["reason"]
+
+
+def test_column_mapping(engine):
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text("CREATE TABLE raw_orders (id INTEGER, customer_id INTEGER, amount REAL, status TEXT, order_date DATE)"))
+    _staging_frame().rename(columns={"order_id": "id"}).to_sql("raw_orders", engine, if_exists="append", index=False)
+
+    result = pushdown_validation.run_pushdown_checks(engine, "raw_orders", "orders", column_mapping={"id": "order_id"}, reference_time=REFERENCE_TIME)
+
+    duplicates = [v for v in result["dq_violations"] if v["check"] == "primary_key_violation"]
+    assert len(duplicates) == 1 and duplicates[0]["sample_duplicate_values"] == ["3"]
@@ -0,0 +1,46 @@
+import json
+import numpy as np
+import pandas as pd
+import prompts
+import rule_engine
+
+# --- Dynamic rule execution ---
+
+
+def _execution(df, rule):
+    return rule_engine.run_dynamic_rules(df, [rule])[0]["execution"]
+
+
+def test_prompt_example_is_valid_json_and_compiles():
+    prompt = prompts.get_dynamic_rules_prompt({"columns": {}})
+    example = json.loads(prompt[prompt.index("[\n  {"):])
+    compiled = [rule_engine.compile_rule(rule) for rule in example]
+
+    assert [c["rule_type"] for c in compiled] == ["format_check", "enum_check", "range_check"]
+    df = pd.DataFrame({"OrderCode": ["ABC1234", "AB12345"]})
+    assert _execution(df, example[0])["violation_count"] == 1
+
+
+def test_integral_float_column_renders_without_decimal_point():
+    df = pd.DataFrame({"qty": [5, 10, np.nan, 3]}) # An int column read as float because of a null
+    assert df["qty"].dtype == float
+
+    format_execution = _execution(df, {"column": "qty", "rule_type": "format_check", "pattern": r"\d+"})
+    enum_execution = _execution(df, {"column": "qty", "rule_type": "enum_check", "allowed_values": ["3", "5", "10"]})
+
+    assert format_execution["violation_count"] == 0 and format_execution["checked_rows"] == 3
+    assert enum_execution["violation_count"] == 0
+
+
+def test_runtime_failure_is_an_execution_error(monkeypatch):
+    def fail(column_data, compiled):
+        raise TypeError("unsupported column data")
+    monkeypatch.setattr(rule_engine, "_violation_mask", fail)
+    df = pd.DataFrame({"code": ["A1"]})
+
+    rules = rule_engine.run_dynamic_rules(df, [{"column": "code", "rule_type": "format_check", "pattern": "[A-Z]\\d"},
+                                               {"column": "code", "rule_type": "format_check"}])
+
+    assert rules[0]["execution"]["status"] == "execution_error"
+    assert "unsupported column data" in rules[0]["execution"]["error"]
+    assert rules[1]["execution"]["status"] == "compile_error"
@@ -0,0 +1,26 @@
+import sqlite3
+import pytest
+import setup_database
+
+# --- Scaled reference database ---
+
+
+def test_extra_tables_are_filled_with_typed_values(tmp_path):
+    db_path = str(tmp_path / "sample_data.db")
+    setup_database.setup_database(db_path, extra_tables=5, extra_table_rows=50)
+
+    conn = sqlite3.connect(db_path)
+    tables = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE '%\\_000_' ESCAPE '\\'")]
+    assert len(tables) == 5
+    for table in tables:
+        assert conn.execute(f"SELECT COUNT(*), MIN(id), MAX(id) FROM {table}").fetchone() == (50, 1, 50)
+        for _, column, sql_type, *_ in conn.execute(f"PRAGMA table_info({table})"):
+            expected = {"INTEGER": {"integer"}, "BOOLEAN": {"integer"}, "REAL": {"real"},
+                        "NUMERIC": {"integer", "real"}}.get(sql_type.split("(")[0], {"text"}) # NUMERIC stores 12.0 as 12
+            assert {r[0] for r in conn.execute(f"SELECT DISTINCT typeof({column}) FROM {table}")} <= expected
+    conn.close()
+
+
+def test_failed_setup_raises(tmp_path):
+    with pytest.raises(ValueError, match="--order-items needs"):
+        setup_database.setup_database(str(tmp_path / "sample_data.db"), order_items=10)
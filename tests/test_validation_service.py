@@ -0,0 +1,114 @@
+import os
+import json
+import time
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+import pytest
+import main
+import setup_database
+import validation_service
+
+# --- The validation service over HTTP, with llm_stub workers ---
+# Workers are forked from the test process, so the patched main.run_multi_sheet_validation
+# (which hangs on 'hang.csv' and kills its worker on 'crash.csv') is what they run.
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JOB_TIMEOUT_SECONDS = 2
+
+
+_run_multi_sheet_validation = main.run_multi_sheet_validation
+
+
+def _validate_or_hang(file_path, **options):
+    if os.path.basename(file_path) == "hang.csv":
+        time.sleep(3600)
+    if os.path.basename(file_path) == "crash.csv":
+        os._exit(1)
+    return _run_multi_sheet_validation(file_path, **options)
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path) # Schema history and key indexes are written to the working directory
+    monkeypatch.setattr(main, "run_multi_sheet_validation", _validate_or_hang)
+    db_path = str(tmp_path / "sample_data.db")
+    setup_database.setup_database(db_path)
+    job_queue = validation_service.JobQueue(workers=1, db_url=f"sqlite:///{db_path}", stub_llm=True, job_timeout=JOB_TIMEOUT_SECONDS)
+    validation_service.ValidationRequestHandler.job_queue = job_queue
+    server = ThreadingHTTPServer(("127.0.0.1", 0), validation_service.ValidationRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    job_queue.close()
+
+
+def _request(url, body=None):
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"}, method="POST" if data else "GET")
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def _wait_for(service, job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status, job = _request(f"{service}/jobs/{job_id}")
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.2)
+    raise AssertionError(f"Job {job_id} did not finish within {timeout}s")
+
+
+def test_job_runs_offline_and_returns_its_report(service):
+    status, job = _request(f"{service}/jobs", {"file_path": os.path.join(REPO_ROOT, "new_order.csv"), "table": "customer_orders", "fast": "false"})
+    assert status == 202 and job["options"] == {"fast": False}
+
+    assert _wait_for(service, job["job_id"])["status"] == "done"
+    status, result = _request(f"{service}/jobs/{job['job_id']}/result")
+    assert status == 200
+    assert result["report"]["row_summary"]["checks"]["not_null_violation:OrderID"]["count"] == 1
+    assert _request(f"{service}/health")[1]["jobs"] == {"done": 1}
+
+
+def test_invalid_requests_are_rejected(service, tmp_path):
+    assert _request(f"{service}/jobs", {"file_path": str(tmp_path / "missing.csv")})[0] == 400
+    status, body = _request(f"{service}/jobs", {"file_path": os.path.join(REPO_ROOT, "new_order.csv"), "fast": "maybe"})
+    assert status == 400 and "'fast'" in body["error"]
+    assert _request(f"{service}/jobs/unknown")[0] == 404
+
+
+def test_hung_job_times_out_without_failing_the_next_one(service, tmp_path):
+    hang = tmp_path / "hang.csv"
+    hang.write_text("OrderID\nORD1\n")
+    _, hung_job = _request(f"{service}/jobs", {"file_path": str(hang), "table": "customer_orders"})
+    _, next_job = _request(f"{service}/jobs", {"file_path": os.path.join(REPO_ROOT, "new_order.csv"), "table": "customer_orders"})
+
+    hung_job = _wait_for(service, hung_job["job_id"])
+    assert hung_job["status"] == "failed" and "did not finish" in hung_job["error"]
+    # The next job waited behind the hung one for the whole timeout, but its own clock starts when it starts
+    assert _wait_for(service, next_job["job_id"])["status"] == "done"
+
+
+def test_crashing_job_fails_and_the_pool_recovers(service, tmp_path):
+    crash = tmp_path / "crash.csv"
+    crash.write_text("OrderID\nORD1\n")
+    _, crash_job = _request(f"{service}/jobs", {"file_path": str(crash), "table": "customer_orders"})
+
+    crash_job = _wait_for(service, crash_job["job_id"])
+    assert crash_job["status"] == "failed" and crash_job["error"] == "Worker process crashed."
+    _, next_job = _request(f"{service}/jobs", {"file_path": os.path.join(REPO_ROOT, "new_order.csv"), "table": "customer_orders"})
+    assert _wait_for(service, next_job["job_id"])["status"] == "done"
+
+
+def test_parse_job_options():
+    assert validation_service.parse_job_options({"fast": "false", "compact": "TRUE", "incremental": 0, "feed": "orders",
+                                                 "memory_budget_mb": "512", "table": "ignored"}) == \
+        {"fast": False, "compact": True, "incremental": False, "feed": "orders", "memory_budget_mb": 512}
+    with pytest.raises(ValueError):
+        validation_service.parse_job_options({"memory_budget_mb": -1})
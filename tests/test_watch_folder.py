@@ -0,0 +1,47 @@
+import os
+import time
+import pytest
+import main
+import watch_folder
+
+# --- Worker crashes in the watch-folder daemon ---
+# The pool forks its workers, so the patched main.run_multi_sheet_validation below is what they run.
+
+
+def _validate_or_crash(file_path, **options):
+    if "crash" in os.path.basename(file_path):
+        time.sleep(0.2) # Let the other files queue up behind this one
+        os._exit(1)
+    return {"User_file_name": os.path.basename(file_path), "schema_analysis_report": {}}
+
+
+@pytest.fixture
+def landing(tmp_path):
+    directory = tmp_path / "landing"
+    directory.mkdir()
+    for name in ["crash.csv", "a.csv", "b.csv", "c.csv"]:
+        (directory / name).write_text(f"id,name\n1,{name}\n")
+    return directory
+
+
+def test_crash_is_charged_only_to_the_started_file(landing, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "run_multi_sheet_validation", _validate_or_crash)
+    daemon = watch_folder.WatchFolderDaemon([str(landing)], output_dir=str(tmp_path / "out"), workers=1, force_polling=True)
+    try:
+        for name in ["crash.csv", "a.csv", "b.csv", "c.csv"]: # The crashing file first, the others queued behind it
+            path = str(landing / name)
+            daemon._dispatch(path, os.path.getsize(path))
+        deadline = time.monotonic() + 60
+        while daemon.in_flight and time.monotonic() < deadline:
+            time.sleep(0.05)
+            daemon._collect()
+        assert not daemon.in_flight
+    finally:
+        daemon.pool.shutdown(wait=True, cancel_futures=True)
+        daemon.ledger.close()
+
+    statuses = {os.path.basename(path): entry["status"] for path, entry in daemon.ledger.entries.items()}
+    assert statuses == {"crash.csv": "failed", "a.csv": "done", "b.csv": "done", "c.csv": "done"}
+    assert daemon.ledger.entries[str(landing / "crash.csv")]["error"] == "Worker process crashed."
+    snapshot = daemon.metrics_snapshot()
+    assert snapshot["validated"] == 3 and snapshot["failed"] == 1
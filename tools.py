@@ -1,4 +1,5 @@
 import pandas as pd
+import numpy as np
 import sqlalchemy
 from sqlalchemy import create_engine, inspect, MetaData
 import logging
@@ -7,13 +8,29 @@ import config
 from pandas import DataFrame
 from datetime import datetime
 import re
-
+import sys
+import uuid
+from collections import OrderedDict
+import key_index
+import violation_matrix
+import tracing
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError: # pyarrow is optional; pandas fallbacks are used without it
+    pa = None
+    pc = None
+
+@tracing.traced()
 def get_db_schema(engine: sqlalchemy.engine.Engine, table_name: str) -> Optional[Dict[str, Any]]:
     """
     Fetches the schema for a specific table from the database.
 
     Returns a dictionary with column names as keys and their details
-    (type, nullable, primary_key) as values.
+    (type, nullable, primary_key, unique_constraints) as values.
+    A composite primary key is marked on every one of its columns; use
+    get_key_constraints() to get the key column groups back.
     """
     try:
         inspector = inspect(engine)
@@ -25,13 +42,15 @@ def get_db_schema(engine: sqlalchemy.engine.Engine, table_name: str) -> Optional
         columns = inspector.get_columns(table_name)
         pk_constraint = inspector.get_pk_constraint(table_name)
         primary_keys = pk_constraint.get('constrained_columns', [])
+        unique_constraints = _get_unique_constraints(inspector, table_name, primary_keys)
 
         schema_info = {}
         for col in columns:
             schema_info[col['name']] = {
                 'type': str(col['type']),
                 'nullable': col['nullable'],
-                'primary_key': col['name'] in primary_keys
+                'primary_key': col['name'] in primary_keys,
+                'unique_constraints': [name for name, cols in unique_constraints.items() if col['name'] in cols]
             }
 
         logging.info(f"Successfully fetched schema for table: {table_name}")
@@ -41,6 +60,280 @@ def get_db_schema(engine: sqlalchemy.engine.Engine, table_name: str) -> Optional
         logging.error(f"Error fetching DB schema for table '{table_name}': {e}")
         raise
 
+def _get_unique_constraints(inspector, table_name: str, primary_keys: List[str]) -> Dict[str, List[str]]:
+    """
+    Reflects UNIQUE constraints and unique indexes as {name: [columns]}.
+
+    Unnamed constraints (e.g. inline UNIQUE in SQLite) get a synthetic 'uq_<cols>' name,
+    and constraints that just repeat the primary key are dropped.
+    """
+    unique_constraints = {}
+    reflected = []
+    try:
+        reflected.extend(inspector.get_unique_constraints(table_name))
+    except Exception as e:
+        logging.warning(f"Could not fetch UNIQUE constraints for table '{table_name}': {e}")
+    try:
+        reflected.extend(
+            {"name": idx.get('name'), "column_names": idx.get('column_names', [])}
+            for idx in inspector.get_indexes(table_name) if idx.get('unique')
+        )
+    except Exception as e:
+        logging.warning(f"Could not fetch unique indexes for table '{table_name}': {e}")
+
+    for uc in reflected:
+        cols = [c for c in uc.get('column_names', []) if c is not None]
+        if not cols or set(cols) == set(primary_keys) or cols in unique_constraints.values():
+            continue
+        name = uc.get('name') or "uq_" + "_".join(cols)
+        unique_constraints[name] = cols
+    return unique_constraints
+
+
+def get_key_constraints(db_schema: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Rebuilds the key column groups (primary key + UNIQUE constraints) from a get_db_schema() result.
+
+    Returns a list of {"name", "type" ('primary_key' | 'unique'), "columns"} dicts.
+    """
+    key_constraints = []
+    pk_columns = [col for col, details in db_schema.items() if details.get('primary_key')]
+    if pk_columns:
+        key_constraints.append({"name": "primary_key", "type": "primary_key", "columns": pk_columns})
+
+    unique_groups: Dict[str, List[str]] = {}
+    for col, details in db_schema.items():
+        for name in details.get('unique_constraints', []):
+            unique_groups.setdefault(name, []).append(col)
+    for name, cols in unique_groups.items():
+        key_constraints.append({"name": name, "type": "unique", "columns": cols})
+    return key_constraints
+
+
+# --- Type inference for object columns ---
+TYPE_INFERENCE_SAMPLE_SIZE = 1000
+TYPE_SUGGESTION_THRESHOLD = 0.9
+DATETIME_CANDIDATE_FORMATS = [
+    "%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M", "%Y/%m/%d", "%Y%m%d",
+    "%d/%m/%Y", "%m/%d/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d/%m/%Y %H:%M:%S", "%m/%d/%Y %H:%M:%S",
+]
+_BOOL_VALUES = frozenset(["true", "false", "yes", "no", "y", "n", "t", "f"])
+_INT_REGEX = re.compile(r"[+-]?\d+(\.0*)?")
+_FLOAT_REGEX = re.compile(r"[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?")
+_EMAIL_REGEX = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+_UUID_REGEX = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+
+# cache_key -> detected datetime format, least recently used first. Only detected formats are
+# cached: a column that matched no format is re-detected next time (its next file may be fine).
+# Bounded, since keys are per feed/file and the service and watch daemon run for days.
+DATETIME_FORMAT_CACHE_SIZE = 4096
+_datetime_format_cache: "OrderedDict[Any, str]" = OrderedDict()
+
+
+def _is_text_dtype(column_data: pd.Series) -> bool:
+    dtype = column_data.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        dtype = dtype.categories.dtype
+    return pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype)
+
+
+def _dtype_category(dtype: Any) -> str:
+    """
+    Maps any pandas dtype to the base names used by validate_data_types.
+
+    Compact dtypes (int8/int32, float32, category, Arrow strings) map to the same
+    category as their default counterparts, so a compact load is not reported as a type mismatch.
+    """
+    if isinstance(dtype, pd.CategoricalDtype):
+        dtype = dtype.categories.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'bool'
+    if pd.api.types.is_integer_dtype(dtype):
+        return 'int64'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'float64'
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'datetime64[ns]'
+    if pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+        return 'object'
+    return str(dtype)
+
+
+def parse_datetimes(values: pd.Series, fmt: str) -> pd.Series:
+    """
+    Parses a text Series with one explicit strftime format. Unparseable values become NaT.
+
+    Uses Arrow's vectorized strptime when pyarrow is installed, pandas otherwise.
+    """
+    if pc is not None:
+        try:
+            text = values if _is_text_dtype(values) else values.astype(str)
+            parsed = pc.strptime(pa.array(text, type=pa.string(), from_pandas=True), format=fmt, unit='us', error_is_null=True)
+            return pd.Series(parsed.to_numpy(zero_copy_only=False), index=values.index)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError, TypeError) as e:
+            logging.debug(f"Arrow strptime failed for format '{fmt}', falling back to pandas: {e}")
+    return pd.to_datetime(values, format=fmt, errors='coerce')
+
+
+def detect_datetime_format(values: pd.Series, cache_key: Any = None) -> Optional[str]:
+    """
+    Detects the strftime format of a date/datetime text column from a sample.
+
+    Candidate formats are tried with an explicit format (no per-element inference) and the
+    best one is kept if it parses at least half of the sample. With a cache_key a detected
+    format is remembered (LRU, DATETIME_FORMAT_CACHE_SIZE keys), so the detection runs once per key.
+    """
+    if cache_key is not None and cache_key in _datetime_format_cache:
+        tracing.count(cache_hits=1)
+        _datetime_format_cache.move_to_end(cache_key)
+        return _datetime_format_cache[cache_key]
+    tracing.count(cache_misses=1)
+
+    sample = values.dropna().astype(str).str.strip().head(TYPE_INFERENCE_SAMPLE_SIZE)
+    best_format, best_rate = None, 0.0
+    if not sample.empty:
+        for fmt in DATETIME_CANDIDATE_FORMATS:
+            rate = float(parse_datetimes(sample, fmt).notna().mean())
+            if rate > best_rate:
+                best_format, best_rate = fmt, rate
+            if rate == 1.0:
+                break
+    detected = best_format if best_rate >= 0.5 else None
+
+    if cache_key is not None and detected is not None:
+        _datetime_format_cache[cache_key] = detected
+        if len(_datetime_format_cache) > DATETIME_FORMAT_CACHE_SIZE:
+            _datetime_format_cache.popitem(last=False)
+    return detected
+
+
+def infer_column_types(column_data: pd.Series, cache_key: Any = None, sample_size: int = TYPE_INFERENCE_SAMPLE_SIZE) -> Dict[str, Any]:
+    """
+    Measures how well an object (text) column parses as bool, int, float, datetime, UUID and email.
+
+    Each type is first tested on a sample: a type that parses nothing is ruled out, a type that
+    parses everything is confirmed and ends the sweep (types are tried from most to least specific).
+    Otherwise the parse success rate is measured on the full column, vectorized.
+    Returns parse rates per type, the suggested type and how many values fail to parse as it.
+    """
+    if not _is_text_dtype(column_data):
+        return {}
+
+    values = column_data.dropna().astype(str).str.strip()
+    values = values[values != ""]
+    non_null_count = len(values)
+    if non_null_count == 0:
+        return {"non_null_count": 0, "parse_rates": {}, "suggested_type": None}
+
+    sampled = non_null_count > sample_size
+    sample = values.sample(sample_size, random_state=0) if sampled else values
+    datetime_format = detect_datetime_format(sample, cache_key)
+
+    def fullmatch(regex: re.Pattern) -> Any:
+        return lambda v: v.str.fullmatch(regex).fillna(False).astype(bool)
+
+    parsers = {
+        "bool": lambda v: v.str.lower().isin(_BOOL_VALUES),
+        "int": fullmatch(_INT_REGEX),
+        "float": fullmatch(_FLOAT_REGEX),
+        "datetime": lambda v: parse_datetimes(v, datetime_format).notna() if datetime_format else pd.Series(False, index=v.index),
+        "uuid": fullmatch(_UUID_REGEX),
+        "email": fullmatch(_EMAIL_REGEX),
+    }
+
+    parse_counts: Dict[str, int] = {}
+    for type_name, parser in parsers.items():
+        sample_successes = int(parser(sample).sum())
+        if sample_successes == 0:
+            parse_counts[type_name] = 0 # Ruled out on the sample
+            continue
+        if sample_successes == len(sample) or not sampled:
+            # Confirmed on the sample (or the sample is the whole column)
+            parse_counts[type_name] = int(parser(values).sum()) if sampled else sample_successes
+            if sample_successes == len(sample):
+                break
+        else:
+            parse_counts[type_name] = int(parser(values).sum())
+
+    parse_rates = {t: round(c / non_null_count, 6) for t, c in parse_counts.items()}
+    suggested_type = next((t for t in parsers if parse_rates.get(t, 0) >= TYPE_SUGGESTION_THRESHOLD), None)
+    return {
+        "non_null_count": non_null_count,
+        "parse_rates": parse_rates,
+        "suggested_type": suggested_type,
+        "unparseable_count": non_null_count - parse_counts[suggested_type] if suggested_type else None,
+        "datetime_format": datetime_format,
+        "sampled": sampled,
+    }
+
+
+def drop_all_null_rows(df: DataFrame) -> DataFrame:
+    """
+    Returns df without the rows that are entirely null.
+
+    The common case (no such rows) returns the same object, so no copy is made.
+    """
+    all_null = np.ones(len(df), dtype=bool)
+    for position in range(df.shape[1]):
+        all_null &= df.iloc[:, position].isna().to_numpy()
+        if not all_null.any():
+            return df
+    return df[~all_null]
+
+
+def _sample_unique_values(column_data: pd.Series, n: int) -> List[Any]:
+    """First n distinct non-null values, scanning only as much of the column as needed."""
+    size = 1000
+    while True:
+        head = column_data.iloc[:size]
+        values = pd.unique(head[head.notna().to_numpy()])
+        if len(values) >= n or size >= len(column_data):
+            return list(values[:n].tolist())
+        size *= 10
+
+
+class ColumnMappedFrame:
+    """
+    Read-only view of a DataFrame with renamed columns. No column data is copied.
+
+    Supports what the validation tools use: .columns, .index, len(), [column] and
+    [list of columns]. Returned Series keep their original name. A name that several
+    source columns map to returns a DataFrame, exactly like df.rename(columns=...) would.
+    """
+
+    def __init__(self, df: DataFrame, column_mapping: Optional[Dict[str, str]] = None):
+        column_mapping = column_mapping or {}
+        self._df = df
+        self.columns = pd.Index([column_mapping.get(col, col) for col in df.columns])
+        self.index = df.index
+
+    def __len__(self) -> int:
+        return len(self._df)
+
+    @property
+    def shape(self) -> tuple:
+        return self._df.shape
+
+    @property
+    def empty(self) -> bool:
+        return self._df.empty
+
+    def __getitem__(self, key: Any) -> Any:
+        keys = key if isinstance(key, list) else [key]
+        positions = []
+        for k in keys:
+            matches = np.flatnonzero(self.columns == k)
+            if len(matches) == 0:
+                raise KeyError(k)
+            positions.extend(matches.tolist())
+        if not isinstance(key, list) and len(positions) == 1:
+            return self._df.iloc[:, positions[0]]
+        subset = self._df.iloc[:, positions]
+        subset.columns = self.columns[positions]
+        return subset
+
+
+@tracing.traced()
 def extract_schema_from_df(df: pd.DataFrame, file_name: str, sheet_name: Optional[str]) -> Dict[str, Any]:
     """
     Extracts schema information directly from a pandas DataFrame.
@@ -48,8 +341,8 @@ def extract_schema_from_df(df: pd.DataFrame, file_name: str, sheet_name: Optiona
     Returns a dictionary containing metadata, column details, and sample data.
     """
     try:
-        
-        df.dropna(how='all', inplace=True)
+        # Rows that are entirely null are ignored (without mutating or copying the caller's frame)
+        df = drop_all_null_rows(df)
         if df.empty:
             logging.warning(f"DataFrame for '{file_name}' - sheet '{sheet_name}' is empty or contains only null rows.")
             return {"file_name": file_name, "sheet_name": sheet_name, "total_rows": 0, "columns": {}}
@@ -58,16 +351,19 @@ def extract_schema_from_df(df: pd.DataFrame, file_name: str, sheet_name: Optiona
         column_details = {}
         for col in df.columns:
             # Get 5 unique, non-null sample values
-            sample_values = df[col].dropna().unique().tolist()
+            sample_values = _sample_unique_values(df[col], 5)
             # Ensure samples are JSON serializable (convert timestamps/dates to strings)
             sample_values = [str(s) if isinstance(s, (pd.Timestamp, datetime)) else s for s in sample_values]
-            sample_values = sample_values[:5]
 
             column_details[str(col)] = {
                 'inferred_type': str(df[col].dtype),
                 'sample_values': sample_values,
                 'null_count': int(df[col].isnull().sum())
             }
+            # Object columns: measure what they really contain (e.g. ints with one stray 'one')
+            type_inference = infer_column_types(df[col], cache_key=(file_name, sheet_name, str(col)))
+            if type_inference:
+                column_details[str(col)]['type_inference'] = type_inference
 
         schema_summary = {
             "file_name": file_name, # Keep original file name for context
@@ -88,9 +384,11 @@ def extract_schema_from_df(df: pd.DataFrame, file_name: str, sheet_name: Optiona
 # --- [END NEW] ---
 
 
+@tracing.traced()
 def extract_file_schema(file_path: str, sheet_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
     """
     Reads a CSV or a specific Excel sheet and extracts its schema using extract_schema_from_df.
+    Parquet/Feather/Arrow files are described from their metadata instead (see columnar_input).
 
     If sheet_name is None for Excel, reads the first sheet.
     Returns a dictionary containing metadata, column details, and sample data.
@@ -131,6 +429,10 @@ def extract_file_schema(file_path: str, sheet_name: Optional[str] = None) -> Opt
                  logging.error(f"Could not read sheet '{sheet_name if sheet_name is not None else '0 (first sheet)'}' from Excel file '{file_path}': {e}")
                  # Return error info consistent with extract_schema_from_df
                  return {"file_name": file_path, "sheet_name": sheet_name, "total_rows": 0, "columns": {}, "error": f"Failed to read sheet: {e}"}
+        elif file_path.lower().endswith(('.parquet', '.pq', '.feather', '.arrow', '.ipc', '.arrows')):
+            # Columnar files: the schema comes from the file metadata, no data is read
+            import columnar_input # Imported here because columnar_input itself imports tools
+            return columnar_input.read_columnar_schema(file_path)
         else:
             logging.error(f"Unsupported file type: {file_path}")
             return None # Or raise ValueError
@@ -150,6 +452,103 @@ def extract_file_schema(file_path: str, sheet_name: Optional[str] = None) -> Opt
         return {"file_name": file_path, "sheet_name": sheet_name, "total_rows": 0, "columns": {}, "error": f"General read error: {e}"}
 
 
+# --- Compact DataFrame loading ---
+COMPACT_SAMPLE_ROWS = 10_000
+CATEGORY_MAX_UNIQUE_RATIO = 0.5 # Text columns at or below this unique/rows ratio (in the sample) become categoricals
+
+try:
+    import resource
+except ImportError: # Not available on Windows; peak RSS is then reported as None
+    resource = None
+
+
+def get_peak_rss_bytes() -> Optional[int]:
+    """Returns the peak resident set size of this process so far, in bytes."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024 # Linux reports KiB
+
+
+def _compact_text_dtype(sample: pd.Series) -> Any:
+    non_null = sample.dropna()
+    if len(non_null) and non_null.nunique() / len(non_null) <= CATEGORY_MAX_UNIQUE_RATIO:
+        return 'category'
+    return pd.ArrowDtype(pa.string()) if pa is not None else object
+
+
+def _downcast_numeric(column_data: pd.Series) -> pd.Series:
+    if pd.api.types.is_bool_dtype(column_data.dtype):
+        return column_data
+    if pd.api.types.is_integer_dtype(column_data.dtype):
+        return pd.to_numeric(column_data, downcast='integer')
+    if pd.api.types.is_float_dtype(column_data.dtype):
+        as_float32 = column_data.astype('float32')
+        # Only keep float32 when it round-trips exactly (prices like 19.99 usually do not)
+        if ((as_float32.astype('float64') == column_data) | column_data.isna()).all():
+            return as_float32
+    return column_data
+
+
+@tracing.traced()
+def compact_dataframe(df: DataFrame, sample_rows: int = COMPACT_SAMPLE_ROWS) -> DataFrame:
+    """
+    Converts a default-dtype DataFrame to a compact representation.
+
+    Low-cardinality text columns (detected on the first sample_rows rows) become categoricals,
+    other text columns Arrow-backed strings (when pyarrow is installed), and numerics are downcast.
+    """
+    compact = {}
+    for col in df.columns:
+        column_data = df[col]
+        if _is_text_dtype(column_data) and not isinstance(column_data.dtype, pd.CategoricalDtype):
+            compact[col] = column_data.astype(_compact_text_dtype(column_data.head(sample_rows)))
+        else:
+            compact[col] = _downcast_numeric(column_data)
+    return pd.DataFrame(compact, index=df.index)
+
+
+@tracing.traced()
+def read_csv_compact(file_path: str, sample_rows: int = COMPACT_SAMPLE_ROWS, **read_kwargs) -> DataFrame:
+    """
+    Reads a CSV straight into a compact representation.
+
+    The text column dtypes are decided from the first sample_rows rows and passed to read_csv,
+    so the large Python-object string columns are never materialized; numerics are downcast after loading.
+    """
+    sample = pd.read_csv(file_path, nrows=sample_rows, **read_kwargs)
+    dtypes = {col: _compact_text_dtype(sample[col]) for col in sample.columns if _is_text_dtype(sample[col])}
+    df = pd.read_csv(file_path, dtype=dtypes, **read_kwargs)
+    for col in df.columns:
+        if col not in dtypes:
+            df[col] = _downcast_numeric(df[col])
+    return df
+
+
+def build_memory_report(df: DataFrame, peak_rss_before_bytes: Optional[int]) -> Dict[str, Any]:
+    """
+    Summarizes the memory footprint of a loaded sheet.
+
+    Returns the DataFrame's deep memory usage, per-dtype totals and the process
+    peak RSS before and after the sheet was loaded.
+    """
+    usage = df.memory_usage(deep=True, index=False)
+    by_dtype: Dict[str, int] = {}
+    for col, nbytes in usage.items():
+        dtype_name = str(df[col].dtype) if not isinstance(df[col], pd.DataFrame) else 'duplicate_column'
+        by_dtype[dtype_name] = by_dtype.get(dtype_name, 0) + int(nbytes)
+    peak_rss_after_bytes = get_peak_rss_bytes()
+    return {
+        "rows": len(df),
+        "columns": len(df.columns),
+        "dataframe_bytes": int(usage.sum()),
+        "bytes_by_dtype": by_dtype,
+        "peak_rss_before_bytes": peak_rss_before_bytes,
+        "peak_rss_after_bytes": peak_rss_after_bytes,
+    }
+
+
+@tracing.traced()
 def compare_schemas(file_schema: Dict[str, Any], db_schema: Dict[str, Any]) -> Dict[str, List[str]]:
     """
     Compares file and database schema columns *by name only*.
@@ -181,11 +580,13 @@ def compare_schemas(file_schema: Dict[str, Any], db_schema: Dict[str, Any]) -> D
         return {"columns_missing_from_file": db_keys, "columns_extra_in_file": []}
 
 
-def validate_data_types(df: DataFrame, db_schema: Dict[str, Any]) -> List[Dict[str, Any]]:
+@tracing.traced()
+def validate_data_types(df: DataFrame, db_schema: Dict[str, Any], matrix: Optional[violation_matrix.ViolationMatrix] = None) -> List[Dict[str, Any]]:
     """
     Validates DataFrame dtypes against the database schema.
 
-    Provides a 'raw report' of mismatches for the LLM to analyze.
+    Provides a 'raw report' of mismatches for the LLM to analyze. If a violation matrix is
+    given, the rows whose value does not parse as the expected numeric type are recorded in it.
     """
     type_violations = []
 
@@ -218,7 +619,7 @@ def validate_data_types(df: DataFrame, db_schema: Dict[str, Any]) -> List[Dict[s
                             f"Skipping type validation for this column.")
 
             continue 
-        file_dtype = str(df[db_col_name].dtype)
+        file_dtype = _dtype_category(df[db_col_name].dtype)
         db_type_base = str(db_col_details['type']).split('(')[0].upper()
         expected_pd_type_category = sql_to_pandas_map.get(db_type_base)
         mismatch = False
@@ -234,27 +635,21 @@ def validate_data_types(df: DataFrame, db_schema: Dict[str, Any]) -> List[Dict[s
 
         if mismatch:
             sample_invalid_values = []
+            parse_rate = None
             # Improved sample finding for common mismatches
             try:
-                if expected_pd_type_category == 'int64' and file_dtype == 'object':
-                    # Find non-integer strings
-                    for val in df[db_col_name].dropna().unique():
-                        try:
-                            pd.to_numeric(val, errors='raise') 
-                            if float(val) != int(float(val)): 
-                                sample_invalid_values.append(str(val))
-                        except (ValueError, TypeError): 
-                             sample_invalid_values.append(str(val))
-                        if len(sample_invalid_values) >= 5: break
-                elif expected_pd_type_category == 'float64' and file_dtype == 'object':
-                     # Find non-numeric strings
-                    for val in df[db_col_name].dropna().unique():
-                        try:
-                            pd.to_numeric(val, errors='raise')
-                        except (ValueError, TypeError):
-                             sample_invalid_values.append(str(val))
-                        if len(sample_invalid_values) >= 5: break
-                
+                if expected_pd_type_category in ('int64', 'float64') and file_dtype == 'object':
+                    # Find non-integer / non-numeric strings (vectorized)
+                    values = df[db_col_name].dropna()
+                    numeric_values = pd.to_numeric(values, errors='coerce')
+                    invalid = numeric_values.isna()
+                    if expected_pd_type_category == 'int64':
+                        invalid |= numeric_values % 1 != 0
+                    sample_invalid_values = [str(v) for v in pd.unique(values[invalid])[:5]]
+                    parse_rate = round(1 - float(invalid.mean()), 6) if len(values) else None
+                    if matrix is not None:
+                        matrix.add_positions("type_mismatch", db_col_name, np.flatnonzero(df[db_col_name].notna().to_numpy())[invalid.to_numpy()], "high")
+
                 elif file_dtype == 'object': 
                      sample_invalid_values = [str(v) for v in df[db_col_name].dropna().unique()[:5]]
 
@@ -266,22 +661,474 @@ def validate_data_types(df: DataFrame, db_schema: Dict[str, Any]) -> List[Dict[s
             violation = {
                 "column": db_col_name,
                 "expected_db_type": db_type_base, # Use base type
-                "found_file_type": file_dtype,
+                "found_file_type": str(df[db_col_name].dtype),
                 "sample_invalid_values": sample_invalid_values[:5]
             }
+            if parse_rate is not None:
+                violation["parse_rate"] = parse_rate # Share of values that do parse as the expected type
             type_violations.append(violation)
 
     logging.info(f"Data type validation complete. Found {len(type_violations)} mismatches.")
     return type_violations
 
 
-def run_data_quality_checks(df: DataFrame, db_schema: Dict[str, Any], engine: sqlalchemy.engine.Engine, table_name: str) -> List[Dict[str, Any]]:
+def hash_key_columns(df: DataFrame, key_columns: List[str], as_text: bool = False) -> pd.Series:
+    """
+    Hashes the key tuple of every row into a single uint64 value (vectorized).
+
+    With as_text=True the key values are hashed by their string form, so the same
+    key hashes identically across chunks or files even if pandas inferred a
+    different dtype for them (e.g. 5 vs 5.0 vs '5').
+    """
+    keys = df[key_columns]
+    if as_text:
+        keys = keys.apply(values_as_text)
+    return pd.util.hash_pandas_object(keys, index=False)
+
+
+def values_as_text(column: pd.Series) -> pd.Series:
+    """Values as text, with integral floats (an int column that picked up NaNs) rendered as '5', not '5.0'."""
+    if pd.api.types.is_float_dtype(column.dtype):
+        finite = column.dropna()
+        if np.isfinite(finite).all() and (finite == finite.round()).all():
+            return column.astype('Int64').astype(str)
+    return column.astype(str)
+
+
+def parse_simple_check_constraint(sqltext: str, db_col_name: str) -> Optional[tuple]:
+    """
+    Parses a CHECK constraint of the form '<column> <op> <number>' (op one of > >= < <= != =).
+
+    Returns (operator, value) or None for anything more complex.
+    """
+    match = re.match(rf'["`]?{re.escape(db_col_name)}["`]?\s*(>=|<=|>|<|!=|=)\s*(-?\d+(\.\d+)?)', sqltext.strip(), re.IGNORECASE)
+    return (match.group(1), float(match.group(2))) if match else None
+
+
+def find_check_constraint_violations(column_data: pd.Series, db_col_name: str, check_constraints: List[Dict[str, Any]], matrix: Optional[violation_matrix.ViolationMatrix] = None) -> List[Dict[str, Any]]:
     """
-    Runs basic data quality checks based on DB schema constraints (NULL, UNIQUE/PK, CHECK).
+    Evaluates the simple numeric CHECK constraints that reference a single column.
+
+    Violating rows are recorded in 'matrix' (a new one over column_data's rows if not given).
+    Returns a list of 'check_constraint_violation' dicts (same shape as run_data_quality_checks).
+    """
+    dq_violations = []
+    col_check_constraints = [
+        c for c in check_constraints if db_col_name in c.get('sqltext', '')
+    ]
+    if not col_check_constraints:
+        return dq_violations
+
+    numeric_col = pd.to_numeric(column_data, errors='coerce')
+    is_numeric = numeric_col.notna().all()
+    matrix = matrix if matrix is not None else violation_matrix.ViolationMatrix(column_data.index)
+
+    for constraint in col_check_constraints:
+        sqltext = constraint.get('sqltext', '').strip()
+        parsed_check = parse_simple_check_constraint(sqltext, db_col_name)
+
+        if parsed_check and is_numeric:
+            operator, value = parsed_check
+            constraint_name = constraint.get('name')
+            violated_rows = pd.Series(False, index=column_data.index) # Initialize
+
+            try:
+                if operator == '>': violated_rows = numeric_col <= value
+                elif operator == '>=': violated_rows = numeric_col < value
+                elif operator == '<': violated_rows = numeric_col >= value
+                elif operator == '<=': violated_rows = numeric_col > value
+                elif operator == '!=': violated_rows = numeric_col == value
+                elif operator == '=': violated_rows = numeric_col != value
+
+                # Important: Only consider rows where the original value was numeric
+                # Ignore rows where coercion to numeric failed (NaN)
+                violated_rows = violated_rows & numeric_col.notna()
+
+                check_id = matrix.add("check_constraint_violation", db_col_name, violated_rows.to_numpy(), "medium", constraint_name)
+                violation_count = matrix.count(check_id)
+                if violation_count > 0:
+                    sample_positions = matrix.positions(check_id, 5)
+                    affected_indices = column_data.index[sample_positions].tolist()
+                    sample_violating_values = column_data.iloc[sample_positions].tolist()
+                    dq_violations.append({
+                        "column": db_col_name,
+                        "check": "check_constraint_violation",
+                        "check_id": check_id,
+                        "constraint_name": constraint_name,
+                        "sqltext": sqltext,
+                        "count": violation_count,
+                        "affected_rows_sample_indices": affected_indices,
+                        "sample_violating_values": [str(v) for v in sample_violating_values], # Ensure JSON serializable
+                        "severity": "medium", # Default severity, could be adjusted
+                        "details": f"{violation_count} values violate CHECK constraint '{sqltext}'."
+                    })
+            except Exception as check_err:
+                 logging.warning(f"Could not evaluate check constraint '{sqltext}' for column '{db_col_name}': {check_err}")
+
+        else:
+             logging.info(f"Skipping CHECK constraint for column '{db_col_name}' as it was complex, non-numeric, or did not match simple patterns: '{sqltext}'")
+
+    return dq_violations
+
+
+def _row_key_codes(df: DataFrame, key_columns: List[str]) -> (np.ndarray, bool):
+    """
+    Builds one int64 code per row so that equal key tuples get equal codes (frame-local).
+
+    Every key column is factorized and the codes are combined positionally while the combined
+    cardinality fits in 63 bits, which is exact. Wider keys fall back to hash mixing.
+    Returns (codes, exact).
+    """
+    combined = np.zeros(len(df), dtype=np.int64)
+    capacity = 1
+    exact = True
+    for col in key_columns:
+        codes, uniques = pd.factorize(df[col])
+        cardinality = len(uniques) + 1 # +1 for the NULL code (-1)
+        if exact and capacity * cardinality < 2 ** 63:
+            combined = combined * cardinality + (codes + 1)
+            capacity *= cardinality
+        else:
+            exact = False
+            mixed = combined.view(np.uint64) * np.uint64(0x9E3779B97F4A7C15) ^ (codes + 1).astype(np.uint64)
+            combined = pd.util.hash_array(mixed).view(np.int64)
+    return combined, exact
+
+
+@tracing.traced()
+def find_duplicate_keys(df: DataFrame, key_constraint: Dict[str, Any], matrix: Optional[violation_matrix.ViolationMatrix] = None) -> List[Dict[str, Any]]:
+    """
+    Finds rows that share the same (possibly composite) key.
+
+    The full key tuple is reduced to one int64 code per row and duplicates are found on those
+    codes in a single vectorized pass. If the codes had to be hashed, the candidate rows are
+    re-compared on their real values, so a hash collision is never reported as a duplicate.
+    Rows with a NULL in any key column are ignored, as in SQL. All rows of a duplicated key
+    are recorded in 'matrix' if given.
+    Returns a list with at most one 'primary_key_violation' / 'unique_constraint_violation' dict.
+    """
+    key_columns = key_constraint["columns"]
+    if any(col not in df.columns for col in key_columns):
+        return []
+    if any(isinstance(df[col], pd.DataFrame) for col in key_columns):
+        logging.warning(f"Duplicate column name found for key {key_columns}. Skipping uniqueness check for this key.")
+        return []
+
+    not_null = np.ones(len(df), dtype=bool)
+    for col in key_columns:
+        not_null &= df[col].notna().to_numpy()
+    positions = np.flatnonzero(not_null)
+
+    codes, exact = _row_key_codes(df, key_columns)
+    codes = codes[positions]
+    is_duplicated = pd.Series(codes).duplicated(keep=False).to_numpy()
+    if not is_duplicated.any():
+        return []
+    duplicate_positions = positions[is_duplicated]
+    duplicate_codes = codes[is_duplicated]
+
+    if not exact:
+        # Confirm on the candidate rows only
+        candidates = pd.DataFrame({col: df[col].iloc[duplicate_positions].to_numpy() for col in key_columns})
+        confirmed = candidates.duplicated(keep=False).to_numpy()
+        duplicate_positions = duplicate_positions[confirmed]
+        duplicate_codes = duplicate_codes[confirmed]
+
+    duplicate_record_count = len(duplicate_positions) # Total number of records involved in duplication
+    distinct_codes, first_seen = np.unique(duplicate_codes, return_index=True)
+    distinct_keys_duplicated = len(distinct_codes)
+    if distinct_keys_duplicated == 0:
+        return []
+
+    sample_positions = duplicate_positions[np.sort(first_seen)[:5]]
+    sample_duplicates = ["|".join(str(df[col].iloc[pos]) for col in key_columns) for pos in sample_positions] # Ensure JSON serializable
+    is_primary_key = key_constraint["type"] == "primary_key"
+    key_label = "Primary key" if is_primary_key else f"UNIQUE constraint '{key_constraint['name']}'"
+    check = "primary_key_violation" if is_primary_key else "unique_constraint_violation"
+    violation = {
+        "column": ", ".join(key_columns),
+        "columns": key_columns,
+        "check": check,
+        "check_id": violation_matrix.make_check_id(check, ", ".join(key_columns), key_constraint["name"]),
+        "constraint_name": key_constraint["name"],
+        "distinct_keys_duplicated": distinct_keys_duplicated,
+        "total_duplicate_records": duplicate_record_count,
+        "sample_duplicate_values": sample_duplicates,
+        "affected_rows_sample_indices": df.index[duplicate_positions[:5]].tolist(),
+        "severity": "high",
+        "details": f"{key_label} contains duplicates for {distinct_keys_duplicated} unique key(s), affecting {duplicate_record_count} records total."
+    }
+    if matrix is not None:
+        matrix.add_positions(check, violation["column"], duplicate_positions, "high", key_constraint["name"])
+    return [violation]
+
+
+# --- Foreign key checks ---
+# Referenced tables up to this many rows are fetched once (streamed in chunks) and checked
+# with a vectorized isin; larger ones are checked with a temp-table semi-join in the database.
+FK_ISIN_MAX_ROWS = 5_000_000
+FK_FETCH_CHUNK_SIZE = 500_000
+
+# (engine url, schema, table, columns) -> referenced key info, shared by all sheets of a run
+_referenced_key_cache: Dict[tuple, Dict[str, Any]] = {}
+
+
+def clear_referenced_key_cache() -> None:
+    """Drops the cached referenced key sets (call once at the start of every validation run)."""
+    _referenced_key_cache.clear()
+
+
+def _get_referenced_keys(engine: sqlalchemy.engine.Engine, fk: Dict[str, Any], isin_max_rows: int) -> Dict[str, Any]:
+    """
+    Returns the referenced key set for a foreign key, from the cache when possible.
+
+    Small referenced tables: {"mode": "isin", "hashes": sorted unique uint64 key hashes}.
+    Large referenced tables: {"mode": "semi_join", "row_count": n} (the keys stay in the database).
+    """
+    referred_schema = fk.get('referred_schema')
+    referred_table = fk['referred_table']
+    referred_columns = fk['referred_columns']
+    cache_key = (str(engine.url), referred_schema, referred_table, tuple(referred_columns))
+    if cache_key in _referenced_key_cache:
+        tracing.count(cache_hits=1)
+        return _referenced_key_cache[cache_key]
+    tracing.count(cache_misses=1)
+
+    ref = sqlalchemy.Table(referred_table, MetaData(), autoload_with=engine, schema=referred_schema)
+    with engine.connect() as conn:
+        row_count = conn.execute(sqlalchemy.select(sqlalchemy.func.count()).select_from(ref)).scalar() or 0
+
+        if row_count > isin_max_rows:
+            referenced = {"mode": "semi_join", "row_count": row_count}
+        else:
+            query = sqlalchemy.select(*[ref.c[c] for c in referred_columns]).distinct()
+            hash_parts = []
+            for chunk in pd.read_sql(query, conn, chunksize=FK_FETCH_CHUNK_SIZE):
+                chunk = chunk.dropna()
+                if not chunk.empty:
+                    hash_parts.append(hash_key_columns(chunk, list(chunk.columns), as_text=True).to_numpy())
+            hashes = np.unique(np.concatenate(hash_parts)) if hash_parts else np.empty(0, dtype=np.uint64)
+            referenced = {"mode": "isin", "hashes": hashes, "row_count": row_count}
+
+    logging.info(f"Loaded referenced keys for '{referred_table}' ({referenced['mode']}, {row_count} rows).")
+    _referenced_key_cache[cache_key] = referenced
+    return referenced
+
+
+def _find_orphan_keys_semi_join(engine: sqlalchemy.engine.Engine, fk: Dict[str, Any], distinct_keys: DataFrame) -> DataFrame:
+    """Uploads the distinct file keys into a temp table and returns those with no match in the referenced table."""
+    metadata = MetaData()
+    ref = sqlalchemy.Table(fk['referred_table'], metadata, autoload_with=engine, schema=fk.get('referred_schema'))
+    key_columns = list(distinct_keys.columns)
+    tmp = sqlalchemy.Table(
+        f"tmp_fk_keys_{uuid.uuid4().hex[:12]}", metadata,
+        *[sqlalchemy.Column(col, ref.c[ref_col].type) for col, ref_col in zip(key_columns, fk['referred_columns'])],
+        prefixes=["TEMPORARY"]
+    )
+    with engine.connect() as conn:
+        tmp.create(conn)
+        try:
+            records = distinct_keys.astype(object).to_dict(orient="records")
+            for start in range(0, len(records), FK_FETCH_CHUNK_SIZE):
+                conn.execute(tmp.insert(), records[start:start + FK_FETCH_CHUNK_SIZE])
+            match = sqlalchemy.and_(*[ref.c[ref_col] == tmp.c[col] for col, ref_col in zip(key_columns, fk['referred_columns'])])
+            query = sqlalchemy.select(*tmp.c).where(~sqlalchemy.exists().where(match))
+            orphans = pd.DataFrame(conn.execute(query).fetchall(), columns=key_columns)
+        finally:
+            tmp.drop(conn)
+            conn.commit()
+    return orphans
+
+
+@tracing.traced()
+def check_foreign_keys(df: DataFrame, engine: sqlalchemy.engine.Engine, table_name: str, isin_max_rows: int = FK_ISIN_MAX_ROWS, matrix: Optional[violation_matrix.ViolationMatrix] = None) -> List[Dict[str, Any]]:
+    """
+    Checks every FOREIGN KEY of the target table against the referenced table.
+
+    The referenced key set is fetched once per run (cached across sheets) and matched with a
+    vectorized isin on key hashes; very large referenced tables are checked with a temp-table
+    semi-join instead. Rows with a NULL in any FK column are not checked, as in SQL.
+    Orphan rows are recorded in 'matrix' if given.
+    Returns a list of 'foreign_key_violation' dicts with orphan counts and samples.
+    """
+    dq_violations = []
+    try:
+        foreign_keys = inspect(engine).get_foreign_keys(table_name)
+        logging.info(f"Fetched {len(foreign_keys)} FOREIGN KEY constraints for table '{table_name}'.")
+    except Exception as e:
+        logging.warning(f"Could not fetch FOREIGN KEY constraints for table '{table_name}': {e}. Skipping foreign key validation.")
+        return dq_violations
+
+    for fk in foreign_keys:
+        key_columns = fk.get('constrained_columns', [])
+        if not key_columns or any(col not in df.columns for col in key_columns):
+            continue
+        if any(isinstance(df[col], pd.DataFrame) for col in key_columns):
+            logging.warning(f"Duplicate column name found for foreign key {key_columns}. Skipping this foreign key.")
+            continue
+
+        try:
+            not_null = np.ones(len(df), dtype=bool)
+            for col in key_columns:
+                not_null &= df[col].notna().to_numpy()
+            keys = pd.DataFrame({col: df[col].to_numpy()[not_null] for col in key_columns}, index=df.index[not_null])
+            if keys.empty:
+                continue
+            hashes = hash_key_columns(keys, key_columns, as_text=True).to_numpy()
+
+            referenced = _get_referenced_keys(engine, fk, isin_max_rows)
+            if referenced["mode"] == "isin":
+                ref_hashes = referenced["hashes"]
+                pos = np.searchsorted(ref_hashes, hashes)
+                pos[pos == len(ref_hashes)] = 0
+                orphan = ref_hashes[pos] != hashes if len(ref_hashes) else np.ones(len(hashes), dtype=bool)
+            else:
+                orphan_keys = _find_orphan_keys_semi_join(engine, fk, keys.drop_duplicates())
+                orphan_hashes = hash_key_columns(orphan_keys, key_columns, as_text=True).to_numpy() if not orphan_keys.empty else np.empty(0, dtype=np.uint64)
+                orphan = np.isin(hashes, orphan_hashes)
+
+            orphan_count = int(orphan.sum())
+            if orphan_count == 0:
+                continue
+
+            orphan_rows = keys[orphan]
+            distinct_orphans = orphan_rows.drop_duplicates()
+            referenced_label = f"{fk['referred_table']}({', '.join(fk['referred_columns'])})"
+            check_id = violation_matrix.make_check_id("foreign_key_violation", ", ".join(key_columns), fk.get('name'))
+            if matrix is not None:
+                matrix.add_positions("foreign_key_violation", ", ".join(key_columns), np.flatnonzero(not_null)[orphan], "high", fk.get('name'))
+            dq_violations.append({
+                "column": ", ".join(key_columns),
+                "columns": key_columns,
+                "check": "foreign_key_violation",
+                "check_id": check_id,
+                "constraint_name": fk.get('name'),
+                "referenced_table": fk['referred_table'],
+                "referenced_columns": fk['referred_columns'],
+                "count": orphan_count,
+                "distinct_orphan_keys": len(distinct_orphans),
+                "affected_rows_sample_indices": orphan_rows.index.tolist()[:5],
+                "sample_orphan_values": ["|".join(row) for row in distinct_orphans.head(5).apply(values_as_text).itertuples(index=False)],
+                "severity": "high",
+                "details": f"{orphan_count} rows reference {len(distinct_orphans)} key(s) that do not exist in {referenced_label}."
+            })
+        except Exception as fk_err:
+            logging.warning(f"Could not evaluate foreign key {key_columns} -> '{fk.get('referred_table')}': {fk_err}")
+
+    return dq_violations
+
+
+# --- Date validation ---
+DATE_DB_TYPES = ('DATE', 'DATETIME', 'TIMESTAMP')
+TEXT_DB_TYPES = ('TEXT', 'VARCHAR', 'CHAR', 'STRING') # Checked as dates when their values are dates (see validate_dates)
+DEFAULT_MIN_DATE = "1900-01-01"
+
+
+@tracing.traced()
+def validate_dates(
+    df: DataFrame,
+    db_schema: Dict[str, Any],
+    feed: Optional[str] = None,
+    min_date: str = DEFAULT_MIN_DATE,
+    max_date: Optional[str] = None,
+    max_future_days: int = 0,
+    reference_time: Optional[datetime] = None,
+    matrix: Optional[violation_matrix.ViolationMatrix] = None
+) -> List[Dict[str, Any]]:
+    """
+    Validates every DATE/DATETIME/TIMESTAMP column: unparseable, future and out-of-window dates.
+    TEXT/VARCHAR columns whose values infer_column_types suggests are dates get the future and
+    window checks too (values that are not dates are valid text and are not reported).
+
+    Text columns are parsed with one explicit format, detected once from a sample and cached
+    per (feed, column), instead of per-element inference. Dates later than reference_time
+    (default: now) plus max_future_days are 'future'; dates outside [min_date, max_date] are
+    out of window. Violating rows are recorded in 'matrix' (a new one over df's rows if not given).
+    Returns violation dicts in the same format as run_data_quality_checks.
+    """
+    dq_violations = []
+    matrix = matrix if matrix is not None else violation_matrix.ViolationMatrix(df.index)
+    now = pd.Timestamp(reference_time or datetime.now())
+    future_limit = now.normalize() + pd.Timedelta(days=max_future_days + 1) # Whole of the last allowed day
+    window_start = pd.Timestamp(min_date)
+    window_end = pd.Timestamp(max_date) if max_date else None
+
+    for db_col_name, db_col_details in db_schema.items():
+        db_type_base = str(db_col_details['type']).split('(')[0].upper()
+        is_date_type = db_type_base in DATE_DB_TYPES
+        if not (is_date_type or db_type_base in TEXT_DB_TYPES) or db_col_name not in df.columns:
+            continue
+        column_data = df[db_col_name]
+        if isinstance(column_data, pd.DataFrame):
+            logging.warning(f"Duplicate column name found for '{db_col_name}' (in date validation). Skipping this column.")
+            continue
+        if not is_date_type and infer_column_types(column_data, (feed, db_col_name) if feed else None).get("suggested_type") != "datetime":
+            continue # Text that is not dates
+
+        not_null = column_data.notna().to_numpy()
+        date_format = None
+        if pd.api.types.is_datetime64_any_dtype(column_data.dtype):
+            parsed = column_data
+        else:
+            cache_key = (feed, db_col_name) if feed else None
+            date_format = detect_datetime_format(column_data, cache_key)
+            if date_format and cache_key is not None:
+                # A cached format that no longer fits this file's sample is re-detected
+                sample = column_data.dropna().head(TYPE_INFERENCE_SAMPLE_SIZE)
+                if parse_datetimes(sample, date_format).notna().mean() < 0.5:
+                    _datetime_format_cache.pop(cache_key, None)
+                    date_format = detect_datetime_format(column_data, cache_key)
+            if date_format is None:
+                parsed = pd.Series(pd.NaT, index=column_data.index, dtype='datetime64[us]')
+            else:
+                parsed = parse_datetimes(column_data, date_format)
+        if getattr(parsed.dt, 'tz', None) is not None:
+            parsed = parsed.dt.tz_localize(None)
+
+        parsed_values = parsed.to_numpy()
+        is_parsed = ~pd.isna(parsed_values)
+        checks = [
+            ("date_parse_violation", not_null & ~is_parsed & is_date_type, "high",
+             "values could not be parsed as dates" + (f" with detected format '{date_format}'" if date_format else " (no known date format matched)")),
+            ("future_date_violation", is_parsed & (parsed_values >= future_limit.to_datetime64()), "medium",
+             f"dates are later than {(future_limit - pd.Timedelta(days=1)).date()}"),
+            ("date_out_of_window_violation", is_parsed & ((parsed_values < window_start.to_datetime64()) | ((parsed_values > window_end.to_datetime64()) if window_end is not None else False)), "medium",
+             f"dates fall outside the allowed window [{window_start.date()}, {window_end.date() if window_end is not None else 'open'}]"),
+        ]
+        for check_name, violated, severity, description in checks:
+            if not violated.any():
+                continue
+            check_id = matrix.add(check_name, db_col_name, violated, severity)
+            violation_count = matrix.count(check_id)
+            sample_positions = matrix.positions(check_id, 5)
+            dq_violations.append({
+                "column": db_col_name,
+                "check": check_name,
+                "check_id": check_id,
+                "count": violation_count,
+                "date_format": date_format,
+                "affected_rows_sample_indices": column_data.index[sample_positions].tolist(),
+                "sample_violating_values": [str(v) for v in column_data.iloc[sample_positions].tolist()],
+                "severity": severity,
+                "details": f"{violation_count} {description}."
+            })
+
+    logging.info(f"Date validation complete. Found {len(dq_violations)} violations.")
+    return dq_violations
+
+
+@tracing.traced()
+def run_data_quality_checks(df: DataFrame, db_schema: Dict[str, Any], engine: sqlalchemy.engine.Engine, table_name: str, matrix: Optional[violation_matrix.ViolationMatrix] = None) -> List[Dict[str, Any]]:
+    """
+    Runs basic data quality checks based on DB schema constraints (NULL, UNIQUE/PK, CHECK, FOREIGN KEY).
+    Primary keys and UNIQUE constraints are checked on their full (possibly composite) key.
     Adds severity level.
     Requires the database engine and table name to fetch check constraints.
+    Every check records its violating rows in 'matrix' (a new one over df's rows if not given);
+    counts and sample indices are read back from it.
     """
     dq_violations = []
+    matrix = matrix if matrix is not None else violation_matrix.ViolationMatrix(df.index)
     inspector = inspect(engine)
 
     try:
@@ -315,100 +1162,157 @@ def run_data_quality_checks(df: DataFrame, db_schema: Dict[str, Any], engine: sq
                     null_count += empty_string_count # Treat empty strings as nulls for non-text columns
 
             if null_count > 0:
-                affected_rows_sample_indices = df[column_data.isnull() | ((column_data.dtype == 'object') & (column_data == ''))].index.tolist()[:5]
+                null_mask = column_data.isnull()
+                if column_data.dtype == 'object':
+                    null_mask |= column_data == ''
+                check_id = matrix.add("not_null_violation", db_col_name, null_mask.to_numpy(), "high")
                 dq_violations.append({
                     "column": db_col_name,
                     "check": "not_null_violation",
+                    "check_id": check_id,
                     "count": null_count,
-                    "affected_rows_sample_indices": affected_rows_sample_indices,
+                    "affected_rows_sample_indices": matrix.sample_indices(check_id),
                     "severity": "high",
                     "details": f"Column is non-nullable but contains {null_count} nulls (or empty strings treated as nulls)."
                 })
 
-        # --- 2. Uniqueness Check (based on 'primary_key' constraint) ---
-        if db_col_details['primary_key']:
-            # Drop rows where PK is null before checking duplicates, as nulls aren't typically considered duplicates of each other
-            non_null_pk_df = df.dropna(subset=[db_col_name])
-            duplicates_df = non_null_pk_df[non_null_pk_df.duplicated(subset=[db_col_name], keep=False)]
-            distinct_duplicate_values = duplicates_df[db_col_name].unique()
-            duplicate_record_count = len(duplicates_df) # Total number of records involved in duplication
-            distinct_keys_duplicated = len(distinct_duplicate_values)
-
-            if distinct_keys_duplicated > 0:
-                sample_duplicates = [str(v) for v in distinct_duplicate_values[:5]] # Ensure JSON serializable
-                dq_violations.append({
-                    "column": db_col_name,
-                    "check": "primary_key_violation",
-                    "distinct_keys_duplicated": distinct_keys_duplicated,
-                    "total_duplicate_records": duplicate_record_count,
-                    "sample_duplicate_values": sample_duplicates,
-                    "severity": "high",
-                    "details": f"Primary key column contains duplicates for {distinct_keys_duplicated} unique key(s), affecting {duplicate_record_count} records total."
-                })
-
         # --- 3. [NEW] Check Constraints ---
-        col_check_constraints = [
-            c for c in check_constraints if db_col_name in c.get('sqltext', '')
-        ]
+        dq_violations.extend(find_check_constraint_violations(column_data, db_col_name, check_constraints, matrix))
 
-        if col_check_constraints:
-            
-            numeric_col = pd.to_numeric(column_data, errors='coerce')
-            is_numeric = numeric_col.notna().all() 
-
-            for constraint in col_check_constraints:
-                sqltext = constraint.get('sqltext', '').strip()
-                
-                match = re.match(rf'["`]?{re.escape(db_col_name)}["`]?\s*(>=|<=|>|<|!=|=)\s*(-?\d+(\.\d+)?)', sqltext, re.IGNORECASE)
-
-                if match and is_numeric:
-                    operator = match.group(1)
-                    value = float(match.group(2))
-                    constraint_name = constraint.get('name')
-                    violated_rows = pd.Series(False, index=df.index) # Initialize
-
-                    try:
-                        if operator == '>': violated_rows = numeric_col <= value
-                        elif operator == '>=': violated_rows = numeric_col < value
-                        elif operator == '<': violated_rows = numeric_col >= value
-                        elif operator == '<=': violated_rows = numeric_col > value
-                        elif operator == '!=': violated_rows = numeric_col == value
-                        elif operator == '=': violated_rows = numeric_col != value
-
-                        # Important: Only consider rows where the original value was numeric
-                        # Ignore rows where coercion to numeric failed (NaN)
-                        violated_rows = violated_rows & numeric_col.notna()
-
-                        violation_count = int(violated_rows.sum())
-                        if violation_count > 0:
-                            affected_indices = df[violated_rows].index.tolist()[:5]
-                            sample_violating_values = df.loc[affected_indices, db_col_name].tolist()[:5]
-                            dq_violations.append({
-                                "column": db_col_name,
-                                "check": "check_constraint_violation",
-                                "constraint_name": constraint_name,
-                                "sqltext": sqltext,
-                                "count": violation_count,
-                                "affected_rows_sample_indices": affected_indices,
-                                "sample_violating_values": [str(v) for v in sample_violating_values], # Ensure JSON serializable
-                                "severity": "medium", # Default severity, could be adjusted
-                                "details": f"{violation_count} values violate CHECK constraint '{sqltext}'."
-                            })
-                    except Exception as check_err:
-                         logging.warning(f"Could not evaluate check constraint '{sqltext}' for column '{db_col_name}': {check_err}")
-
-                else:
-                     logging.info(f"Skipping CHECK constraint for column '{db_col_name}' as it was complex, non-numeric, or did not match simple patterns: '{sqltext}'")
+    # --- 2. Uniqueness Checks (primary key and UNIQUE constraints, composite keys included) ---
+    for key_constraint in get_key_constraints(db_schema):
+        dq_violations.extend(find_duplicate_keys(df, key_constraint, matrix))
 
+    # --- 3. Foreign Key (referential integrity) Checks ---
+    dq_violations.extend(check_foreign_keys(df, engine, table_name, matrix=matrix))
 
     logging.info(f"Data quality checks complete. Found {len(dq_violations)} violations.")
     return dq_violations
 
+# --- Merging results of chunked / sampled runs ---
+def merge_violations(merged: Dict[tuple, Dict[str, Any]], violations: List[Dict[str, Any]]) -> None:
+    """
+    Merges the data quality violations of one chunk into 'merged' (keyed by column, check and constraint).
+
+    Counts are added up and sample lists are topped up to 5 entries. Only meaningful for row-local
+    checks; duplicate-key checks need the whole key set (see incremental_validation.ValidationState).
+    """
+    for violation in violations:
+        key = (violation.get("column"), violation.get("check"), violation.get("constraint_name"))
+        entry = merged.get(key)
+        if entry is None:
+            merged[key] = {k: list(v) if isinstance(v, list) else v for k, v in violation.items()}
+            continue
+        entry["count"] = entry.get("count", 0) + violation.get("count", 0)
+        if "distinct_orphan_keys" in violation:
+            entry["distinct_orphan_keys"] += violation["distinct_orphan_keys"] # Upper bound across chunks
+        for field, values in violation.items():
+            if isinstance(values, list) and (field.startswith("sample_") or field == "affected_rows_sample_indices"):
+                room = 5 - len(entry[field])
+                if room > 0:
+                    entry[field].extend(values[:room])
+        # Details start with the row count; keep them in line with the merged count
+        entry["details"] = re.sub(r"^\d+", str(entry["count"]), entry.get("details", ""))
+        if "distinct_orphan_keys" in violation:
+            entry["details"] = re.sub(r"reference \d+ key", f"reference {entry['distinct_orphan_keys']} key", entry["details"])
+
+
+def merge_type_violations(merged: Dict[str, Dict[str, Any]], violations: List[Dict[str, Any]], rows: int) -> None:
+    """Merges the type violations of one chunk of 'rows' rows into 'merged'. Call finalize_type_violations() at the end."""
+    for violation in violations:
+        entry = merged.get(violation["column"])
+        if entry is None:
+            entry = merged[violation["column"]] = {**violation, "sample_invalid_values": [], "_rate_sum": 0.0, "_rate_rows": 0}
+        for value in violation.get("sample_invalid_values", []):
+            if len(entry["sample_invalid_values"]) < 5 and value not in entry["sample_invalid_values"]:
+                entry["sample_invalid_values"].append(value)
+        if violation.get("parse_rate") is not None:
+            entry["_rate_sum"] += violation["parse_rate"] * rows
+            entry["_rate_rows"] += rows
+
+
+def finalize_type_violations(merged: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Returns the merged type violations, with parse_rate averaged over the chunks (weighted by rows)."""
+    type_violations = []
+    for entry in merged.values():
+        entry = dict(entry)
+        rate_sum, rate_rows = entry.pop("_rate_sum"), entry.pop("_rate_rows")
+        if rate_rows:
+            entry["parse_rate"] = round(rate_sum / rate_rows, 6)
+        type_violations.append(entry)
+    return type_violations
+
+
+@tracing.traced()
+def check_cross_batch_duplicates(df: DataFrame, db_schema: Dict[str, Any], feed: str, table_name: str, index_dir: str = key_index.KEY_INDEX_DIR, matrix: Optional[violation_matrix.ViolationMatrix] = None) -> List[Dict[str, Any]]:
+    """
+    Checks the primary key of every row against the keys accepted from earlier files of the same feed.
+
+    Uses the persistent per-(feed, table) key index instead of querying the production table.
+    Rows re-sending an accepted key are recorded in 'matrix' if given.
+    Returns a list with at most one 'cross_batch_duplicate_key' violation.
+    """
+    key_columns = [col for col, details in db_schema.items() if details['primary_key']]
+    if not key_columns or any(col not in df.columns for col in key_columns):
+        logging.info(f"Skipping cross-batch duplicate check for feed '{feed}': primary key columns not present.")
+        return []
+
+    keys = df[key_columns]
+    not_null = keys.notna().all(axis=1).to_numpy()
+    keys = keys[not_null]
+    if keys.empty:
+        return []
+    hashes = hash_key_columns(keys, key_columns, as_text=True).to_numpy()
+
+    with key_index.KeyIndex(feed, table_name, index_dir) as index:
+        seen = index.contains(hashes)
+
+    seen_count = int(seen.sum())
+    if seen_count == 0:
+        logging.info(f"Cross-batch duplicate check complete for feed '{feed}'. No previously accepted keys found.")
+        return []
+
+    seen_rows = keys[seen]
+    sample_values = ["|".join(row) for row in seen_rows.head(5).astype(str).itertuples(index=False)]
+    logging.info(f"Cross-batch duplicate check complete for feed '{feed}'. {seen_count} rows re-send accepted keys.")
+    check_id = violation_matrix.make_check_id("cross_batch_duplicate_key", ", ".join(key_columns))
+    if matrix is not None:
+        matrix.add_positions("cross_batch_duplicate_key", ", ".join(key_columns), np.flatnonzero(not_null)[seen], "high")
+    return [{
+        "column": ", ".join(key_columns),
+        "check": "cross_batch_duplicate_key",
+        "check_id": check_id,
+        "count": seen_count,
+        "affected_rows_sample_indices": seen_rows.index.tolist()[:5],
+        "sample_duplicate_values": sample_values,
+        "severity": "high",
+        "details": f"{seen_count} rows have primary keys that were already accepted from an earlier file of feed '{feed}'."
+    }]
+
+
+@tracing.traced()
+def record_accepted_keys(df: DataFrame, db_schema: Dict[str, Any], feed: str, table_name: str, index_dir: str = key_index.KEY_INDEX_DIR) -> int:
+    """
+    Adds the primary keys of a validated DataFrame to the feed's key index.
+
+    Returns the number of keys that were not in the index before.
+    """
+    key_columns = [col for col, details in db_schema.items() if details['primary_key']]
+    if not key_columns or any(col not in df.columns for col in key_columns):
+        return 0
+    keys = df[key_columns].dropna()
+    hashes = hash_key_columns(keys, key_columns, as_text=True).to_numpy()
+    with key_index.KeyIndex(feed, table_name, index_dir) as index:
+        added = index.add(hashes)
+    logging.info(f"Recorded {added} new accepted keys for feed '{feed}', table '{table_name}'.")
+    return added
+
+
+@tracing.traced()
 def get_all_table_schemas(engine: sqlalchemy.engine.Engine) -> Dict[str, Any]:
     """
     Fetches the schema (column names and types) for all tables in the database.
     """
-    # (This function content remains exactly the same as the version you provided)
     logging.info("Fetching all table schemas from the database...")
     all_schemas = {}
     try:
@@ -419,11 +1323,18 @@ def get_all_table_schemas(engine: sqlalchemy.engine.Engine) -> Dict[str, Any]:
             logging.warning("No tables found in the database.")
             return {}
 
+        try:
+            # One batched reflection query per catalog instead of several per table
+            multi_columns = inspector.get_multi_columns()
+            columns_by_table = {table: columns for (_, table), columns in multi_columns.items()}
+        except (AttributeError, NotImplementedError):
+            columns_by_table = {table_name: inspector.get_columns(table_name) for table_name in table_names}
+
         for table_name in table_names:
-            schema = get_db_schema(engine, table_name) # Reuse existing detailed function
-            if schema:
+            columns = columns_by_table.get(table_name)
+            if columns:
                 # Store only names and base types for the inference prompt
-                all_schemas[table_name] = {col: str(details['type']).split('(')[0].upper() for col, details in schema.items()}
+                all_schemas[table_name] = {col['name']: str(col['type']).split('(')[0].upper() for col in columns}
 
         logging.info(f"Successfully fetched schemas for {len(all_schemas)} tables.")
         return all_schemas
@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import functools
+import threading
+import contextlib
+from typing import Dict, Any, List, Optional, Callable
+
+# --- Per-stage spans for the validation pipeline ---
+# run_multi_sheet_validation starts a Tracer; the pipeline stages, the LLM calls and the tool
+# functions (decorated with @traced) open spans on it. Each span records wall time, CPU time
+# of its thread and counters: rows, bytes, tokens_in / tokens_out and cache_hits /
+# cache_misses. count() adds to every open span of the calling thread, so a stage includes
+# the tokens and cache hits of the calls made inside it, like its wall time does.
+# The trace is written in the Chrome trace event format (chrome://tracing, Perfetto) and a
+# per-stage summary goes into the final report. Without an active tracer span() and count()
+# do nothing, so the tools stay usable on their own.
+# One traced run per process at a time: the active tracer is process-wide, so that the zip
+# members validated on worker threads report into their file's trace.
+
+COUNTERS = ("rows", "bytes", "tokens_in", "tokens_out", "cache_hits", "cache_misses")
+
+_active: Optional["Tracer"] = None
+
+
+class Span:
+    __slots__ = ("name", "category", "args", "counters")
+
+    def __init__(self, name: str, category: str, args: Dict[str, Any]):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.counters: Dict[str, int] = {}
+
+    def add(self, **counters: int) -> None:
+        """Adds to this span's counters only (e.g. the rows it processed)."""
+        for key, value in counters.items():
+            if value:
+                self.counters[key] = self.counters.get(key, 0) + int(value)
+
+    def set(self, **args: Any) -> None:
+        self.args.update(args)
+
+
+class _NullSpan:
+    def add(self, **counters: int) -> None:
+        pass
+
+    def set(self, **args: Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Collects the spans of one run as Chrome trace 'complete' events."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pid = os.getpid()
+        self.origin_ns = time.perf_counter_ns()
+        self.started_at = time.time()
+        self.events: List[Dict[str, Any]] = []
+        self.thread_names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str = "stage", **args: Any):
+        span = Span(name, category, args)
+        stack = self._stack()
+        stack.append(span)
+        start_ns, cpu_start_ns = time.perf_counter_ns(), time.thread_time_ns()
+        try:
+            yield span
+        except BaseException as e:
+            span.args["error"] = type(e).__name__
+            raise
+        finally:
+            wall_ns, cpu_ns = time.perf_counter_ns() - start_ns, time.thread_time_ns() - cpu_start_ns
+            stack.pop()
+            thread = threading.current_thread()
+            event = {
+                "name": name, "cat": category, "ph": "X", "pid": self.pid, "tid": thread.ident,
+                "ts": (start_ns - self.origin_ns) / 1000, "dur": wall_ns / 1000,
+                "args": {**span.args, **span.counters, "cpu_ms": round(cpu_ns / 1e6, 3)},
+            }
+            with self._lock:
+                self.events.append(event)
+                self.thread_names.setdefault(thread.ident, thread.name)
+
+    def count(self, **counters: int) -> None:
+        for span in self._stack():
+            span.add(**counters)
+
+    def current(self) -> Optional[Span]:
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    # --- Output ---
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        with self._lock:
+            events = sorted(self.events, key=lambda e: e["ts"])
+            thread_names = dict(self.thread_names)
+        metadata = [{"name": "process_name", "ph": "M", "pid": self.pid, "args": {"name": self.name}}]
+        metadata += [{"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}} for tid, name in thread_names.items()]
+        return {"traceEvents": metadata + events, "displayTimeUnit": "ms",
+                "otherData": {"trace_name": self.name, "started_at": self.started_at}}
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f, default=str)
+
+    def summary(self) -> Dict[str, Any]:
+        """Spans aggregated by (category, name), slowest first. Times are inclusive of nested spans."""
+        with self._lock:
+            events = list(self.events)
+        stages: Dict[tuple, Dict[str, Any]] = {}
+        for event in events:
+            entry = stages.setdefault((event["cat"], event["name"]), {"name": event["name"], "category": event["cat"], "calls": 0, "wall_ms": 0.0, "cpu_ms": 0.0})
+            entry["calls"] += 1
+            entry["wall_ms"] += event["dur"] / 1000
+            entry["cpu_ms"] += event["args"]["cpu_ms"]
+            for counter in COUNTERS:
+                if counter in event["args"]:
+                    entry[counter] = entry.get(counter, 0) + event["args"][counter]
+        for entry in stages.values():
+            entry["wall_ms"] = round(entry["wall_ms"], 3)
+            entry["cpu_ms"] = round(entry["cpu_ms"], 3)
+        wall_ms = (max(e["ts"] + e["dur"] for e in events) - min(e["ts"] for e in events)) / 1000 if events else 0.0
+        return {"wall_ms": round(wall_ms, 3), "spans": len(events),
+                "stages": sorted(stages.values(), key=lambda entry: entry["wall_ms"], reverse=True)}
+
+
+# --- Module-level API used by the pipeline ---
+def start_trace(name: str) -> Tracer:
+    """Makes a new tracer the active one for this process and returns it."""
+    global _active
+    _active = Tracer(name)
+    return _active
+
+
+def stop_trace(tracer: Tracer) -> None:
+    global _active
+    if _active is tracer:
+        _active = None
+
+
+def active_tracer() -> Optional[Tracer]:
+    return _active
+
+
+def span(name: str, category: str = "stage", **args: Any):
+    """Context manager yielding a Span (or a no-op stand-in when nothing is being traced)."""
+    tracer = _active
+    if tracer is None:
+        return contextlib.nullcontext(_NULL_SPAN)
+    return tracer.span(name, category, **args)
+
+
+def count(**counters: int) -> None:
+    """Adds counters (tokens_in, cache_hits, ...) to every open span of the calling thread."""
+    tracer = _active
+    if tracer is not None:
+        tracer.count(**counters)
+
+
+def traced(name: Optional[str] = None, category: str = "tool") -> Callable:
+    """Decorator: runs the function in a span; the row count of a DataFrame first argument is recorded."""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = _active
+            if tracer is None:
+                return func(*args, **kwargs)
+            with tracer.span(span_name, category) as current:
+                shape = getattr(args[0], "shape", None) if args else None
+                if isinstance(shape, tuple) and shape:
+                    current.add(rows=shape[0])
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,386 @@
+import os
+import json
+import time
+import uuid
+import queue
+import signal
+import logging
+import argparse
+import threading
+import multiprocessing
+import socketserver
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Tuple
+import batch_validation
+
+# --- Warm validation service ---
+# A long-running local HTTP service (TCP or Unix socket) that keeps a pool of worker processes
+# warm: every worker imports pandas/SQLAlchemy/the pipeline once, builds the LLM client, the
+# tokenizer, the pooled database engine and the table-match index in its initializer, so a
+# job only pays for its own parsing, checks and LLM calls instead of a cold interpreter start.
+# Jobs wait in a bounded queue; when it is full, POST /jobs answers 429 with Retry-After so
+# callers back off instead of piling up work. Status and results are kept in memory for the
+# last MAX_FINISHED_JOBS jobs.
+# A job's timeout counts from the moment a worker starts it. A job that overruns it has its
+# worker killed; the broken pool is replaced, and the other jobs it was running are
+# resubmitted (up to batch_validation.MAX_CRASH_RETRIES times, as for a worker that dies).
+# With --stub-llm the workers use llm_stub.StubOpenAIClient, so the service runs (and can be
+# tested) offline.
+#
+#   POST /jobs                {"file_path": ..., "table": ..., "fast": ..., ...} -> 202 {"job_id": ...}
+#   GET  /jobs                list of job statuses
+#   GET  /jobs/<id>           status of one job
+#   GET  /jobs/<id>/result    the validation report (409 while the job is not finished)
+#   GET  /health              workers, queue depth and job counts
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_QUEUED_JOBS = 100
+MAX_FINISHED_JOBS = 1000
+JOB_TIMEOUT_SECONDS = 3600 # A job whose worker hangs or dies is failed after this long
+RETRY_AFTER_SECONDS = 5
+JOB_OPTIONS = ("fast", "escalate", "compact", "incremental", "feed", "memory_budget_mb")
+BOOLEAN_JOB_OPTIONS = ("fast", "escalate", "compact", "incremental")
+TRUE_STRINGS = ("true", "1", "yes", "on")
+FALSE_STRINGS = ("false", "0", "no", "off", "")
+WAIT_POLL_SECONDS = 0.5 # How often a dispatcher checks its running job against the timeout
+
+
+# --- Worker process ---
+_worker_db_url: Optional[str] = None
+_job_starts = None # Queue of (job id, worker pid, start time), so timeouts count from the start
+
+
+def _init_worker(db_url: Optional[str], stub_llm: bool, job_starts=None) -> None:
+    """Loads everything a validation needs once per worker process."""
+    global _worker_db_url, _job_starts
+    _job_starts = job_starts
+    if stub_llm:
+        # main builds its client at import time from these; the stub replaces it right after
+        os.environ.setdefault("AZURE_ENDPOINT", "http://127.0.0.1:9")
+        os.environ.setdefault("API_KEY", "stub")
+        os.environ.setdefault("DEPLOYMENT_NAME", "stub")
+    import main
+    import engine_registry
+    import table_matcher
+    if stub_llm:
+        import llm_stub
+        main.client = llm_stub.StubOpenAIClient()
+    _worker_db_url = db_url or main.DB_URL
+    if not stub_llm: # Stubbed calls are not counted with tiktoken (see main.count_tokens)
+        try:
+            import tiktoken
+            tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logging.warning(f"Worker {os.getpid()}: could not preload the tokenizer ({e}).")
+    try:
+        engine = engine_registry.get_engine(_worker_db_url, verify=True)
+        table_matcher.get_table_match_index(engine)
+    except Exception as e:
+        logging.warning(f"Worker {os.getpid()}: could not warm the database engine ({e}).")
+
+
+def _run_job(job_id: str, file_path: str, table: Optional[str], options: Dict[str, Any]) -> Dict[str, Any]:
+    import main
+    if _job_starts is not None:
+        _job_starts.put((job_id, os.getpid(), time.time()))
+    return main.run_multi_sheet_validation(file_path, db_url=_worker_db_url, user_provided_table_name=table,
+                                           report_path=None, print_report=False, **options)
+
+
+# --- Job queue ---
+class QueueFullError(Exception):
+    pass
+
+
+class JobTimeoutError(Exception):
+    pass
+
+
+def parse_job_options(body: Dict[str, Any]) -> Dict[str, Any]:
+    """The JOB_OPTIONS of a request body, type-checked (booleans also as 'true'/'false' strings). Raises ValueError."""
+    options = {}
+    for key in JOB_OPTIONS:
+        value = body.get(key)
+        if value is None:
+            continue
+        if key in BOOLEAN_JOB_OPTIONS:
+            if isinstance(value, str) and value.strip().lower() in TRUE_STRINGS + FALSE_STRINGS:
+                value = value.strip().lower() in TRUE_STRINGS
+            elif not isinstance(value, bool) and value not in (0, 1):
+                raise ValueError(f"'{key}' must be true or false, not {value!r}.")
+            value = bool(value)
+        elif key == "memory_budget_mb":
+            if isinstance(value, bool) or not str(value).strip().isdigit() or int(value) <= 0:
+                raise ValueError(f"'memory_budget_mb' must be a positive integer, not {value!r}.")
+            value = int(value)
+        elif not isinstance(value, str):
+            raise ValueError(f"'{key}' must be a string, not {value!r}.")
+        options[key] = value
+    return options
+
+
+class JobQueue:
+    """Bounded FIFO of validation jobs, dispatched to a warm process pool."""
+
+    def __init__(self, workers: int, max_queued: int = MAX_QUEUED_JOBS, db_url: Optional[str] = None, stub_llm: bool = False,
+                 job_timeout: float = JOB_TIMEOUT_SECONDS):
+        self.workers = workers
+        self.job_timeout = job_timeout
+        self.context = multiprocessing.get_context()
+        self.job_starts = self.context.SimpleQueue()
+        self.pool_args = (db_url, stub_llm, self.job_starts)
+        self.pool = self._new_pool()
+        self.running: Dict[str, Tuple[int, float]] = {} # job id -> (worker pid, start time)
+        self.pending: "queue.Queue[str]" = queue.Queue(maxsize=max_queued)
+        self.jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.results: Dict[str, Any] = {}
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        # One dispatcher thread per worker keeps every worker busy without over-committing the pool
+        self.dispatchers = [threading.Thread(target=self._dispatch, daemon=True) for _ in range(workers)]
+        for thread in self.dispatchers:
+            thread.start()
+
+    def submit(self, file_path: str, table: Optional[str], options: Dict[str, Any]) -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex
+        job = {"job_id": job_id, "file_path": file_path, "table": table, "options": options, "status": "queued",
+               "submitted_at": datetime.now(timezone.utc).isoformat(), "started_at": None, "finished_at": None,
+               "elapsed_s": None, "error": None}
+        with self.lock:
+            self.jobs[job_id] = job
+            try:
+                self.pending.put_nowait(job_id)
+            except queue.Full:
+                del self.jobs[job_id]
+                raise QueueFullError(f"{self.pending.maxsize} jobs are already queued.")
+            self._trim()
+        return dict(job)
+
+    def _trim(self) -> None:
+        finished = [job_id for job_id, job in self.jobs.items() if job["status"] in ("done", "failed")]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+            self.results.pop(job_id, None)
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=self.context, initializer=_init_worker, initargs=self.pool_args)
+
+    def _replace_pool(self, broken: ProcessPoolExecutor) -> None:
+        with self.lock:
+            if self.pool is not broken: # Another dispatcher replaced it already
+                return
+            logging.warning("Worker pool broke. Starting a new one.")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.pool = self._new_pool()
+
+    def _drain_job_starts(self) -> None:
+        # Called with self.lock held
+        while not self.job_starts.empty():
+            started_id, pid, started_at = self.job_starts.get()
+            self.running[started_id] = (pid, started_at)
+
+    def _wait(self, job_id: str, future, pool: ProcessPoolExecutor) -> Any:
+        """The job's result; kills its worker and raises JobTimeoutError once it has run longer than job_timeout."""
+        while True:
+            try:
+                return future.result(timeout=WAIT_POLL_SECONDS)
+            except FutureTimeoutError:
+                pass
+            with self.lock:
+                self._drain_job_starts()
+                pid, started_at = self.running.get(job_id, (None, None))
+            if started_at is not None and time.time() - started_at > self.job_timeout:
+                try:
+                    os.kill(pid, signal.SIGKILL) # The only way to free the slot of a hung job
+                except ProcessLookupError:
+                    pass
+                self._replace_pool(pool)
+                raise JobTimeoutError(f"Job did not finish within {self.job_timeout}s.")
+
+    def _dispatch(self) -> None:
+        while True:
+            job_id = self.pending.get()
+            with self.lock:
+                job = self.jobs.get(job_id)
+                if job is None:
+                    continue
+                job["status"] = "running"
+                job["started_at"] = datetime.now(timezone.utc).isoformat()
+            started = time.perf_counter()
+            result, error, crashes = None, None, 0
+            while True:
+                pool = self.pool
+                try:
+                    future = pool.submit(_run_job, job_id, job["file_path"], job["table"], job["options"])
+                except RuntimeError: # Broken or shut down by another dispatcher; not this job's doing
+                    self._replace_pool(pool)
+                    continue
+                try:
+                    result = self._wait(job_id, future, pool)
+                    errors = batch_validation.report_errors(result) # Same rule as the batch journal: any errored sheet fails the job
+                    if errors:
+                        error = errors[0]
+                except BrokenProcessPool:
+                    # A worker died (out of memory, or killed for another job's timeout): retry on a new pool
+                    self._replace_pool(pool)
+                    with self.lock:
+                        self._drain_job_starts()
+                        self.running.pop(job_id, None) # The retry's timeout counts from its own start
+                    crashes += 1
+                    if crashes <= batch_validation.MAX_CRASH_RETRIES:
+                        continue
+                    error = "Worker process crashed."
+                except Exception as e:
+                    error = str(e)
+                break
+            with self.lock:
+                self._drain_job_starts()
+                self.running.pop(job_id, None)
+                job["status"] = "failed" if error else "done"
+                job["error"] = error
+                job["finished_at"] = datetime.now(timezone.utc).isoformat()
+                job["elapsed_s"] = round(time.perf_counter() - started, 3)
+                if result is not None:
+                    self.results[job_id] = result
+            logging.info(f"Job {job_id} {job['status']} in {job['elapsed_s']}s: {job['file_path']}")
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def result(self, job_id: str) -> Tuple[Optional[Dict[str, Any]], Any]:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return (dict(job) if job else None), self.results.get(job_id)
+
+    def health(self) -> Dict[str, Any]:
+        with self.lock:
+            counts: Dict[str, int] = {}
+            for job in self.jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {"status": "ok", "workers": self.workers, "queued": self.pending.qsize(),
+                "max_queued": self.pending.maxsize, "jobs": counts, "uptime_s": round(time.time() - self.started_at, 1)}
+
+    def close(self) -> None:
+        with self.lock:
+            self._drain_job_starts()
+            pids = [pid for pid, _ in self.running.values()]
+        for pid in pids: # Do not wait for running jobs
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+# --- HTTP interface ---
+class ValidationRequestHandler(BaseHTTPRequestHandler):
+    server_version = "ValidationService/1.0"
+    job_queue: JobQueue = None # Set by serve()
+
+    def _send_json(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        payload = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def address_string(self) -> str:
+        # Unix-socket clients have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) and self.client_address else "unix"
+
+    def log_message(self, format: str, *args) -> None:
+        logging.info(f"{self.address_string()} - {format % args}")
+
+    def do_GET(self) -> None:
+        parts = [p for p in self.path.split("?")[0].split("/") if p]
+        if parts == ["health"]:
+            return self._send_json(200, self.job_queue.health())
+        if parts == ["jobs"]:
+            with self.job_queue.lock:
+                jobs = [dict(job) for job in self.job_queue.jobs.values()]
+            return self._send_json(200, jobs)
+        if len(parts) == 2 and parts[0] == "jobs":
+            job = self.job_queue.status(parts[1])
+            return self._send_json(200, job) if job else self._send_json(404, {"error": "Unknown job."})
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "result":
+            job, result = self.job_queue.result(parts[1])
+            if job is None:
+                return self._send_json(404, {"error": "Unknown job."})
+            if job["status"] not in ("done", "failed"):
+                return self._send_json(409, {"error": f"Job is {job['status']}.", "job": job})
+            return self._send_json(200, {"job": job, "report": result})
+        self._send_json(404, {"error": "Not found."})
+
+    def do_POST(self) -> None:
+        if self.path.split("?")[0].rstrip("/") != "/jobs":
+            return self._send_json(404, {"error": "Not found."})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        except (ValueError, json.JSONDecodeError):
+            return self._send_json(400, {"error": "Request body must be JSON."})
+        file_path = body.get("file_path") if isinstance(body, dict) else None
+        if not file_path or not os.path.isfile(file_path):
+            return self._send_json(400, {"error": f"File not found: {file_path}"})
+        try:
+            options = parse_job_options(body)
+        except ValueError as e:
+            return self._send_json(400, {"error": str(e)})
+        try:
+            job = self.job_queue.submit(os.path.abspath(file_path), body.get("table"), options)
+        except QueueFullError as e:
+            return self._send_json(429, {"error": str(e)}, {"Retry-After": str(RETRY_AFTER_SECONDS)})
+        self._send_json(202, job, {"Location": f"/jobs/{job['job_id']}"})
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: Optional[int] = None, max_queued: int = MAX_QUEUED_JOBS,
+          db_url: Optional[str] = None, stub_llm: bool = False, unix_socket: Optional[str] = None) -> None:
+    """Starts the worker pool and serves requests until interrupted."""
+    workers = workers or os.cpu_count() or 1
+    job_queue = JobQueue(workers, max_queued, db_url, stub_llm)
+    ValidationRequestHandler.job_queue = job_queue
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = ThreadingUnixHTTPServer(unix_socket, ValidationRequestHandler)
+        address = f"unix:{unix_socket}"
+    else:
+        server = ThreadingHTTPServer((host, port), ValidationRequestHandler)
+        address = f"http://{host}:{server.server_address[1]}"
+    logging.info(f"Validation service listening on {address} with {workers} warm worker(s), queue limit {max_queued}.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        job_queue.close()
+        if unix_socket and os.path.exists(unix_socket):
+            os.remove(unix_socket)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', force=True)
+    parser = argparse.ArgumentParser(description="Serve validation jobs from a pool of warm worker processes.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix-socket", default=None, help="Listen on this Unix socket path instead of TCP.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--max-queued", type=int, default=MAX_QUEUED_JOBS, help="Jobs that may wait before POST /jobs answers 429.")
+    parser.add_argument("--db-url", default=None, help="Database URL (default: main.DB_URL).")
+    parser.add_argument("--stub-llm", action="store_true", help="Answer LLM prompts with llm_stub (offline, deterministic).")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.max_queued, args.db_url, args.stub_llm, args.unix_socket)
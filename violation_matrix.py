@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from typing import Dict, Any, List, Optional
+
+# --- Row-level violation matrix ---
+# Every row-level check writes its violation mask into one shared matrix: one bit-packed
+# NumPy array (n_rows / 8 bytes) per check id. Counts, sample indices, per-row reason codes,
+# "rows failing any high-severity check" and the clean subset of the sheet are all derived
+# from these bits, so no check has to be re-run (or its mask kept as a bool array) to answer
+# a different question about the same rows.
+
+SEVERITY_LEVELS = {"low": 0, "medium": 1, "high": 2}
+SAMPLE_SIZE = 5
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def make_check_id(check: str, column: str, constraint_name: Optional[str] = None) -> str:
+    """Stable id of one check on one column (or key), e.g. 'not_null_violation:email'."""
+    return f"{check}:{column}" + (f":{constraint_name}" if constraint_name else "")
+
+
+class ViolationMatrix:
+    """
+    Bit-packed violation masks of one sheet, keyed by check id.
+
+    Rows are addressed by position; 'index' maps positions back to the row labels that are
+    reported in 'affected_rows_sample_indices'.
+    """
+
+    def __init__(self, index: pd.Index):
+        self.index = index
+        self.n_rows = len(index)
+        self.bits: Dict[str, np.ndarray] = {}
+        self.checks: Dict[str, Dict[str, Any]] = {}
+
+    # --- Writing ---
+    def add(self, check: str, column: str, mask: Any, severity: str, constraint_name: Optional[str] = None) -> str:
+        """Records the violation mask (one bool per row) of a check. Returns its check id."""
+        mask = np.asarray(mask, dtype=bool)
+        if len(mask) != self.n_rows:
+            raise ValueError(f"Mask of '{check}' on '{column}' has {len(mask)} rows, expected {self.n_rows}.")
+        check_id = make_check_id(check, column, constraint_name)
+        packed = np.packbits(mask)
+        if check_id in self.bits:
+            self.bits[check_id] |= packed
+        else:
+            self.bits[check_id] = packed
+            self.checks[check_id] = {"check": check, "column": column, "constraint_name": constraint_name, "severity": severity}
+        return check_id
+
+    def add_positions(self, check: str, column: str, positions: Any, severity: str, constraint_name: Optional[str] = None) -> str:
+        """Like add(), for checks that produce the positions of the violating rows."""
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[positions] = True
+        return self.add(check, column, mask, severity, constraint_name)
+
+    # --- Per-check queries ---
+    def mask(self, check_id: str) -> np.ndarray:
+        return np.unpackbits(self.bits[check_id], count=self.n_rows).astype(bool)
+
+    def count(self, check_id: str) -> int:
+        return int(_POPCOUNT[self.bits[check_id]].sum(dtype=np.int64))
+
+    def positions(self, check_id: str, limit: Optional[int] = None) -> np.ndarray:
+        """Positions of the violating rows, in row order; only the first 'limit' are unpacked."""
+        if limit is None:
+            return np.flatnonzero(self.mask(check_id))
+        return _first_set_bits(self.bits[check_id], limit)
+
+    def sample_indices(self, check_id: str, k: int = SAMPLE_SIZE) -> List[Any]:
+        return self.index[self.positions(check_id, k)].tolist()
+
+    # --- Row-level queries ---
+    def _packed_any(self, min_severity: Optional[str] = None) -> np.ndarray:
+        combined = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+        threshold = SEVERITY_LEVELS.get(min_severity, 0) if min_severity else 0
+        for check_id, packed in self.bits.items():
+            if SEVERITY_LEVELS.get(self.checks[check_id]["severity"], 0) >= threshold:
+                combined |= packed
+        return combined
+
+    def failing_mask(self, min_severity: Optional[str] = None) -> np.ndarray:
+        """Rows that fail at least one check (of at least min_severity)."""
+        return np.unpackbits(self._packed_any(min_severity), count=self.n_rows).astype(bool)
+
+    def failing_count(self, min_severity: Optional[str] = None) -> int:
+        return int(_POPCOUNT[self._packed_any(min_severity)].sum(dtype=np.int64))
+
+    def clean_rows(self, df: DataFrame, min_severity: Optional[str] = None) -> DataFrame:
+        """The rows of df (the frame the matrix was built on) that pass every check (of at least min_severity)."""
+        failing = self.failing_mask(min_severity)
+        return df if not failing.any() else df.iloc[np.flatnonzero(~failing)]
+
+    def reasons_at(self, position: int) -> List[str]:
+        """Check ids failed by the row at 'position'."""
+        byte, bit = position >> 3, 7 - (position & 7) # packbits is big-endian within a byte
+        return [check_id for check_id, packed in self.bits.items() if (packed[byte] >> bit) & 1]
+
+    def reason_codes(self, min_severity: Optional[str] = None) -> pd.Series:
+        """Per failing row (by label): its failed check ids joined with ';'."""
+        ids, positions = [], []
+        threshold = SEVERITY_LEVELS.get(min_severity, 0) if min_severity else 0
+        for check_id in self.bits:
+            if SEVERITY_LEVELS.get(self.checks[check_id]["severity"], 0) >= threshold:
+                check_positions = self.positions(check_id)
+                positions.append(check_positions)
+                ids.append(np.full(len(check_positions), check_id, dtype=object))
+        if not positions or not sum(len(p) for p in positions):
+            return pd.Series([], dtype=object)
+        codes = pd.Series(np.concatenate(ids), index=np.concatenate(positions)).groupby(level=0, sort=True).agg(";".join)
+        codes.index = self.index[codes.index.to_numpy()]
+        return codes
+
+    def summary(self, sample_size: int = SAMPLE_SIZE) -> Dict[str, Any]:
+        """JSON-serializable row-level summary for the sheet report."""
+        failing = self._packed_any()
+        sample_positions = _first_set_bits(failing, sample_size)
+        rows_with_violations = int(_POPCOUNT[failing].sum(dtype=np.int64))
+        return {
+            "total_rows": self.n_rows,
+            "rows_with_violations": rows_with_violations,
+            "rows_failing_high_severity": self.failing_count("high"),
+            "clean_rows": self.n_rows - rows_with_violations,
+            "checks": {check_id: {**meta, "count": self.count(check_id)} for check_id, meta in self.checks.items()},
+            "sample_reason_codes": [
+                {"row": label, "checks": self.reasons_at(int(pos))}
+                for pos, label in zip(sample_positions, self.index[sample_positions].tolist())
+            ]
+        }
+
+
+def _first_set_bits(packed: np.ndarray, limit: int) -> np.ndarray:
+    """Positions of the first 'limit' set bits of a packbits array, without unpacking all of it."""
+    nonzero_bytes = np.flatnonzero(packed)[:limit] # Each non-zero byte holds at least one set bit
+    if not len(nonzero_bytes):
+        return np.empty(0, dtype=np.int64)
+    bits = np.unpackbits(packed[nonzero_bytes]).reshape(-1, 8).astype(bool)
+    positions = (nonzero_bytes[:, None] * 8 + np.arange(8))[bits]
+    return positions[:limit]
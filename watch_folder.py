@@ -0,0 +1,495 @@
+import os
+import sys
+import json
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import hashlib
+import logging
+import argparse
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+import batch_validation
+
+# --- Watch-folder ingestion daemon ---
+# Watches landing directories and validates every new file once. Changes are picked up with
+# Linux inotify (through libc, no extra dependency) or, elsewhere or with --poll, by an
+# efficient polling scan that only looks at file size / mtime. A file is dispatched once it
+# has been quiet (same size and mtime) for DEBOUNCE_SECONDS, so files that are still being
+# written or copied are not picked up half-way.
+# Before dispatch the file's SHA-256 is checked against a ledger of validated contents, so the
+# same data is never validated twice even if it is dropped again under another name; an
+# unchanged file (same path, size and mtime) is skipped without hashing. Files are validated
+# by the batch_validation workers in a process pool, with the same shared LLM concurrency cap.
+# When a worker dies, the crash is charged only to the files that had started (retried up to
+# batch_validation.MAX_CRASH_RETRIES times); files still queued in the broken pool are re-queued.
+# Queue latency (ready -> worker start), processing time, throughput and worker utilization
+# are written to watch_metrics.json, logged periodically and optionally served over HTTP, to
+# size the worker pool.
+
+LEDGER_FILE = "watch_ledger.jsonl"
+METRICS_FILE = "watch_metrics.json"
+DEFAULT_OUTPUT_DIR = "watch_reports"
+DEBOUNCE_SECONDS = 2.0
+POLL_INTERVAL_SECONDS = 1.0
+METRICS_INTERVAL_SECONDS = 30
+THROUGHPUT_WINDOW_SECONDS = 300
+LATENCY_SAMPLES = 1000
+IGNORED_SUFFIXES = ('.tmp', '.part', '.partial', '.crdownload', '.swp')
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def is_candidate(path: str) -> bool:
+    """Validatable file that is not a hidden or in-progress temporary file."""
+    name = os.path.basename(path)
+    return (not name.startswith(('.', '~')) and not name.lower().endswith(IGNORED_SUFFIXES)
+            and name.lower().endswith(batch_validation.BATCH_EXTENSIONS))
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stat_key(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None # Deleted or moved away before we got to it
+    return stat.st_size, stat.st_mtime_ns
+
+
+# --- Watchers: both return paths that may have changed since the last call ---
+class PollingWatcher:
+    """Portable fallback: rescans the directories and reports files whose size or mtime changed."""
+
+    def __init__(self, directories: List[str], interval: float = POLL_INTERVAL_SECONDS):
+        self.directories = directories
+        self.interval = interval
+        self.snapshot: Dict[str, Tuple[int, int]] = {}
+
+    def scan(self) -> List[str]:
+        current: Dict[str, Tuple[int, int]] = {}
+        stack = list(self.directories)
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif entry.is_file() and is_candidate(entry.path):
+                                stat = entry.stat()
+                                current[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+        changed = [path for path, key in current.items() if self.snapshot.get(path) != key]
+        self.snapshot = current
+        return changed
+
+    def events(self, timeout: float) -> List[str]:
+        time.sleep(min(timeout, self.interval))
+        return self.scan()
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Linux inotify on every directory of the tree; new subdirectories are watched as they appear."""
+    IN_MODIFY, IN_CLOSE_WRITE, IN_MOVED_TO, IN_CREATE = 0x2, 0x8, 0x80, 0x100
+    IN_Q_OVERFLOW, IN_ISDIR = 0x4000, 0x40000000
+    WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, directories: List[str]):
+        self.directories = directories
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches: Dict[int, str] = {}
+        for directory in directories:
+            self._watch_tree(directory)
+
+    def _watch_tree(self, directory: str) -> None:
+        for root, _, _ in os.walk(directory):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(root), self.WATCH_MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {root}")
+            self.watches[wd] = root
+
+    def scan(self) -> List[str]:
+        return PollingWatcher(self.directories).scan()
+
+    def events(self, timeout: float) -> List[str]:
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return []
+            raise
+        paths, offset = [], 0
+        while offset < len(data):
+            wd, mask, _, name_length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + name_length].rstrip(b"\0"))
+            offset += name_length
+            if mask & self.IN_Q_OVERFLOW:
+                logging.warning("inotify event queue overflowed. Rescanning the watched directories.")
+                return self.scan()
+            if wd not in self.watches or not name:
+                continue
+            path = os.path.join(self.watches[wd], name)
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    self._watch_tree(path)
+                    paths.extend(PollingWatcher([path]).scan()) # Files copied in before the watch existed
+            elif is_candidate(path):
+                paths.append(path)
+        return paths
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def make_watcher(directories: List[str], force_polling: bool = False, poll_interval: float = POLL_INTERVAL_SECONDS):
+    if not force_polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(directories)
+        except (OSError, AttributeError) as e:
+            logging.warning(f"inotify is not available ({e}). Falling back to polling every {poll_interval}s.")
+    return PollingWatcher(directories, poll_interval)
+
+
+# --- Ledger of validated contents ---
+class HashLedger(batch_validation.CheckpointJournal):
+    """The batch checkpoint journal, additionally indexed by content hash."""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.done_hashes = {e["sha256"] for e in self.entries.values() if e.get("status") == "done" and e.get("sha256")}
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        super().record(entry)
+        if entry.get("status") == "done" and entry.get("sha256"):
+            self.done_hashes.add(entry["sha256"])
+
+
+# --- Metrics ---
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 3)
+
+
+class WatchMetrics:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.started = time.time()
+        self.counters = {"files_detected": 0, "duplicates_skipped": 0, "unchanged_skipped": 0, "dispatched": 0, "validated": 0, "failed": 0}
+        self.queue_latency: deque = deque(maxlen=LATENCY_SAMPLES)
+        self.settle_time: deque = deque(maxlen=LATENCY_SAMPLES)
+        self.processing_time: deque = deque(maxlen=LATENCY_SAMPLES)
+        self.completions: deque = deque() # (finished_at, elapsed_s, bytes)
+        self.lock = threading.Lock()
+
+    def increment(self, counter: str) -> None:
+        with self.lock:
+            self.counters[counter] += 1
+
+    def record_completion(self, ok: bool, queue_latency: float, elapsed: float, size: int) -> None:
+        now = time.time()
+        with self.lock:
+            self.counters["validated" if ok else "failed"] += 1
+            self.queue_latency.append(queue_latency)
+            self.processing_time.append(elapsed)
+            self.completions.append((now, elapsed, size))
+            while self.completions and now - self.completions[0][0] > THROUGHPUT_WINDOW_SECONDS:
+                self.completions.popleft()
+
+    def snapshot(self, in_flight: int, pending_settle: int) -> Dict[str, Any]:
+        now = time.time()
+        with self.lock:
+            window = min(THROUGHPUT_WINDOW_SECONDS, max(now - self.started, 1e-9))
+            recent = [c for c in self.completions if now - c[0] <= window]
+            busy = sum(c[1] for c in recent)
+            return {
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+                "uptime_s": round(now - self.started, 1),
+                "workers": self.workers,
+                **self.counters,
+                "in_flight": in_flight,
+                "waiting_to_settle": pending_settle,
+                "queue_latency_s": {"p50": _percentile(list(self.queue_latency), 0.5), "p95": _percentile(list(self.queue_latency), 0.95),
+                                    "max": round(max(self.queue_latency), 3) if self.queue_latency else None},
+                "settle_time_s": {"p50": _percentile(list(self.settle_time), 0.5), "p95": _percentile(list(self.settle_time), 0.95)},
+                "processing_time_s": {"p50": _percentile(list(self.processing_time), 0.5), "p95": _percentile(list(self.processing_time), 0.95)},
+                "throughput_window_s": round(window, 1),
+                "throughput_files_per_min": round(len(recent) * 60 / window, 2),
+                "throughput_mb_per_s": round(sum(c[2] for c in recent) / window / 1e6, 3),
+                # Near 1.0 with a growing queue latency means more workers would help
+                "worker_utilization": round(min(1.0, busy / (window * self.workers)), 3),
+            }
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    daemon: "WatchFolderDaemon" = None
+
+    def do_GET(self) -> None:
+        payload = json.dumps(self.daemon.metrics_snapshot()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+# --- Daemon ---
+class WatchFolderDaemon:
+    def __init__(
+        self,
+        directories: List[str],
+        output_dir: str = DEFAULT_OUTPUT_DIR,
+        workers: Optional[int] = None,
+        llm_concurrency: int = batch_validation.DEFAULT_LLM_CONCURRENCY,
+        debounce_seconds: float = DEBOUNCE_SECONDS,
+        force_polling: bool = False,
+        poll_interval: float = POLL_INTERVAL_SECONDS,
+        **validation_options
+    ):
+        self.directories = [os.path.abspath(d) for d in directories]
+        for directory in self.directories:
+            if not os.path.isdir(directory):
+                raise ValueError(f"Not a directory: {directory}")
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        self.workers = workers or os.cpu_count() or 1
+        self.debounce_seconds = debounce_seconds
+        self.watcher = make_watcher(self.directories, force_polling, poll_interval)
+        self.poll_interval = poll_interval
+        self.ledger = HashLedger(os.path.join(output_dir, LEDGER_FILE))
+        self.metrics = WatchMetrics(self.workers)
+        self.context = multiprocessing.get_context()
+        self.started_files = self.context.SimpleQueue()
+        self.pool_args = (self.context.BoundedSemaphore(llm_concurrency), validation_options, self.started_files)
+        self.pool = self._new_pool()
+        # path -> (stat key, last change, first seen); files wait here until they settle
+        self.settling: Dict[str, Tuple[Tuple[int, int], float, float]] = {}
+        self.in_flight: Dict[Any, Dict[str, Any]] = {}
+        self.in_flight_hashes: set = set()
+        self.crashes: Dict[str, int] = {} # sha256 -> worker crashes while validating it
+        self.stopped = threading.Event()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=self.context,
+                                   initializer=batch_validation.init_worker, initargs=self.pool_args)
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        return self.metrics.snapshot(len(self.in_flight), len(self.settling))
+
+    def _write_metrics(self) -> Dict[str, Any]:
+        snapshot = self.metrics_snapshot()
+        with open(os.path.join(self.output_dir, METRICS_FILE), "w") as f:
+            json.dump(snapshot, f, indent=2)
+        return snapshot
+
+    # --- Pickup ---
+    def _observe(self, paths: List[str]) -> None:
+        now = time.monotonic()
+        for path in paths:
+            key = _stat_key(path)
+            if key is None:
+                self.settling.pop(path, None)
+                continue
+            previous = self.settling.get(path)
+            if previous is None:
+                self.settling[path] = (key, now, now)
+                self.metrics.increment("files_detected")
+            elif previous[0] != key:
+                self.settling[path] = (key, now, previous[2])
+
+    def _dispatch_settled(self) -> None:
+        now = time.monotonic()
+        for path, (key, last_change, first_seen) in list(self.settling.items()):
+            current = _stat_key(path)
+            if current is None:
+                del self.settling[path]
+            elif current != key:
+                self.settling[path] = (current, now, first_seen)
+            elif now - last_change >= self.debounce_seconds:
+                del self.settling[path]
+                with self.metrics.lock:
+                    self.metrics.settle_time.append(now - first_seen)
+                self._dispatch(path, key[0])
+
+    def _dispatch(self, path: str, size: int) -> None:
+        if self.ledger.is_done(path):
+            self.metrics.increment("unchanged_skipped")
+            return
+        try:
+            digest = file_sha256(path)
+        except OSError as e:
+            logging.warning(f"Could not read {path}: {e}")
+            return
+        if digest in self.ledger.done_hashes or digest in self.in_flight_hashes:
+            self.metrics.increment("duplicates_skipped")
+            logging.info(f"Skipping {path}: identical content was already validated.")
+            return
+        report_path = os.path.join(self.output_dir, f"{digest[:12]}__{os.path.basename(path)}.report.json")
+        self._submit({"path": path, "sha256": digest, "size": size, "report_path": report_path, "enqueued_at": time.time()})
+        self.metrics.increment("dispatched")
+        logging.info(f"Dispatched {path} ({len(self.in_flight)} in flight).")
+
+    def _submit(self, job: Dict[str, Any]) -> None:
+        job.update(pool=self.pool, started=False)
+        future = self.pool.submit(batch_validation.validate_file, job["path"], job["report_path"])
+        self.in_flight[future] = job
+        self.in_flight_hashes.add(job["sha256"])
+
+    def _mark_started(self) -> None:
+        for path in batch_validation.drain_started_files(self.started_files):
+            for job in self.in_flight.values():
+                if job["path"] == path and job["pool"] is self.pool:
+                    job["started"] = True
+
+    def _collect(self) -> None:
+        self._mark_started()
+        crashed = []
+        for future in [f for f in self.in_flight if f.done()]:
+            job = self.in_flight.pop(future)
+            self.in_flight_hashes.discard(job["sha256"])
+            try:
+                entry = future.result()
+            except BrokenProcessPool:
+                crashed.append(job)
+                continue
+            except Exception as e:
+                entry = {"file": os.path.abspath(job["path"]), "status": "failed", "error": str(e)}
+            self._record(job, entry)
+        if not crashed:
+            return
+
+        if any(job["pool"] is self.pool for job in crashed):
+            self._mark_started() # A worker posts its start before it can die, so the queue now holds it
+            for job in self.in_flight.values():
+                if job["pool"] is self.pool and not job["started"]:
+                    crashed.append(job) # Its future is about to fail too
+            logging.warning("Worker pool crashed. Starting a new one.")
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = self._new_pool()
+            self.in_flight = {f: job for f, job in self.in_flight.items() if job not in crashed}
+            self.in_flight_hashes = {job["sha256"] for job in self.in_flight.values()}
+        # Only files that had started are charged the crash (all of them if none had, i.e. the pool itself failed)
+        charged = [job for job in crashed if job["started"]] or crashed
+        for job in crashed:
+            if any(job is c for c in charged):
+                self.crashes[job["sha256"]] = self.crashes.get(job["sha256"], 0) + 1
+                if self.crashes[job["sha256"]] > batch_validation.MAX_CRASH_RETRIES:
+                    self._record(job, {"file": os.path.abspath(job["path"]), "status": "failed", "error": "Worker process crashed."})
+                    continue
+            self._submit(job)
+
+    def _record(self, job: Dict[str, Any], entry: Dict[str, Any]) -> None:
+        self.crashes.pop(job["sha256"], None)
+        entry["sha256"] = job["sha256"]
+        entry.setdefault("finished_at", datetime.now(timezone.utc).isoformat())
+        elapsed = entry.get("elapsed_s") or 0.0
+        queue_latency = max(0.0, time.time() - elapsed - job["enqueued_at"])
+        self.ledger.record(entry)
+        self.metrics.record_completion(entry["status"] == "done", queue_latency, elapsed, job["size"])
+        logging.info(f"{entry['status']}: {job['path']} (queued {queue_latency:.2f}s, validated in {elapsed}s)")
+
+    # --- Main loop ---
+    def run(self, once: bool = False, metrics_interval: float = METRICS_INTERVAL_SECONDS) -> Dict[str, Any]:
+        """
+        Watches until stop() or Ctrl+C. Files already in the directories are picked up first.
+        With once=True the daemon exits as soon as those existing files are validated.
+        """
+        logging.info(f"Watching {', '.join(self.directories)} with {type(self.watcher).__name__} and {self.workers} worker(s).")
+        self._observe(PollingWatcher(self.directories).scan())
+        next_metrics = time.monotonic() + metrics_interval
+        try:
+            while not self.stopped.is_set():
+                timeout = min(self.poll_interval, self.debounce_seconds / 2) if self.settling or self.in_flight else self.poll_interval
+                if once:
+                    time.sleep(timeout)
+                else:
+                    self._observe(self.watcher.events(timeout))
+                self._dispatch_settled()
+                self._collect()
+                if time.monotonic() >= next_metrics:
+                    snapshot = self._write_metrics()
+                    logging.info(f"Watch metrics: {snapshot['validated']} validated, {snapshot['in_flight']} in flight, "
+                                 f"queue latency p95 {snapshot['queue_latency_s']['p95']}s, utilization {snapshot['worker_utilization']}")
+                    next_metrics = time.monotonic() + metrics_interval
+                if once and not self.settling and not self.in_flight:
+                    break
+        except KeyboardInterrupt:
+            logging.info("Stopping watch-folder daemon.")
+        finally:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.watcher.close()
+            self.ledger.close()
+        return self._write_metrics()
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+
+def serve_metrics(daemon: WatchFolderDaemon, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serves the live metrics snapshot as JSON on http://host:port/ from a background thread."""
+    _MetricsHandler.daemon = daemon
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', force=True)
+    parser = argparse.ArgumentParser(description="Watch landing folders and validate every new file once.")
+    parser.add_argument("directories", nargs="+", help="Directories to watch (recursively).")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="Where reports, the ledger and metrics are written.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--llm-concurrency", type=int, default=batch_validation.DEFAULT_LLM_CONCURRENCY, help="Maximum LLM calls in flight across all workers.")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE_SECONDS, help="Seconds a file must stay unchanged before it is validated.")
+    parser.add_argument("--poll", action="store_true", help="Use polling instead of inotify.")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL_SECONDS)
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve live metrics as JSON on this port.")
+    parser.add_argument("--once", action="store_true", help="Validate the files already present, then exit.")
+    parser.add_argument("--table", default=None, help="Target table for every file (default: matched per sheet).")
+    parser.add_argument("--db-url", default=None, help="Database URL (default: main.DB_URL).")
+    parser.add_argument("--fast", action="store_true", help="Validate a random row sample of every sheet.")
+    parser.add_argument("--escalate", action="store_true", help="With --fast: fully validate sheets whose sample fails.")
+    parser.add_argument("--compact", action="store_true", help="Load sheets with compact dtypes.")
+    args = parser.parse_args()
+
+    options = {"user_provided_table_name": args.table, "fast": args.fast, "escalate": args.escalate, "compact": args.compact}
+    if args.db_url:
+        options["db_url"] = args.db_url
+    daemon = WatchFolderDaemon(args.directories, args.output_dir, args.workers, args.llm_concurrency,
+                               args.debounce, args.poll, args.poll_interval, **options)
+    if args.metrics_port:
+        serve_metrics(daemon, args.metrics_port)
+    summary = daemon.run(once=args.once)
+    sys.exit(1 if summary["failed"] else 0)